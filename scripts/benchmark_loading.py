@@ -0,0 +1,66 @@
+"""Benchmark loading SSSOM TSV files with and without validation.
+
+Run with:
+
+.. code-block:: sh
+
+    $ python scripts/benchmark_loading.py --rows 5000000
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from biomappings.resources import _load_table, _PredictedTuple
+from biomappings.utils import POSITIVES_SSSOM_PATH
+
+
+def _write_synthetic_predictions(path: Path, rows: int) -> None:
+    """Write a synthetic predictions file with the given number of rows."""
+    with path.open("w") as file:
+        print(*_PredictedTuple._fields, sep="\t", file=file)
+        for i in range(rows):
+            print(
+                f"chebi:{i}",
+                f"chemical {i}",
+                "skos:exactMatch",
+                f"mesh:C{i:06}",
+                f"Chemical {i}",
+                "semapv:LexicalMatching",
+                "0.95",
+                "generate_chebi_mappings.py",
+                sep="\t",
+                file=file,
+            )
+
+
+def _time(path: Path, *, trusted: bool) -> float:
+    start = time.perf_counter()
+    _load_table(path, standardize=False, trusted=trusted)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option("--rows", type=int, default=5_000_000, show_default=True)
+def main(rows: int) -> None:
+    """Compare validated and trusted loading."""
+    with tempfile.TemporaryDirectory() as directory:
+        predictions_path = Path(directory).joinpath("predictions.sssom.tsv")
+        click.echo(f"writing {rows:,} synthetic predictions to {predictions_path}")
+        _write_synthetic_predictions(predictions_path, rows)
+        for label, path in [
+            ("positive.sssom.tsv", POSITIVES_SSSOM_PATH),
+            ("synthetic predictions", predictions_path),
+        ]:
+            validated = _time(path, trusted=False)
+            trusted = _time(path, trusted=True)
+            click.echo(
+                f"{label}: validated={validated:.2f}s trusted={trusted:.2f}s "
+                f"speedup={validated / trusted:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
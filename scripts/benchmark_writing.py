@@ -0,0 +1,72 @@
+"""Benchmark writing SSSOM TSV files with the atomic writer.
+
+Run with:
+
+.. code-block:: sh
+
+    $ python scripts/benchmark_writing.py --rows 1000000
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from benchmark_loading import _write_synthetic_predictions
+
+from biomappings.resources import (
+    _get_writer,
+    _open_atomic,
+    _PredictedTuple,
+    mapping_sort_key,
+)
+from biomappings.resources.table import MappingTable
+
+
+def _write_print(path: Path, rows: list[_PredictedTuple]) -> None:
+    """Write rows like the original implementation, with one print per row."""
+    with path.open("w") as file:
+        print(*_PredictedTuple._fields, sep="\t", file=file)
+        for row in rows:
+            print(*row, sep="\t", file=file)
+
+
+def _write_atomic(path: Path, rows: list[_PredictedTuple]) -> None:
+    """Write rows with a CSV writer to a temporary file, then rename it."""
+    with _open_atomic(path) as file:
+        writer = _get_writer(file)
+        writer.writerow(_PredictedTuple._fields)
+        writer.writerows(rows)
+
+
+@click.command()
+@click.option("--rows", type=int, default=1_000_000, show_default=True)
+def main(rows: int) -> None:
+    """Compare writing with print and with the atomic writer."""
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = Path(directory).joinpath("source.sssom.tsv")
+        click.echo(f"writing {rows:,} synthetic predictions to {source_path}")
+        _write_synthetic_predictions(source_path, rows)
+        mappings = MappingTable.from_path(source_path, trusted=True)
+        tuples = [mapping.as_predicted_row() for mapping in sorted(mappings, key=mapping_sort_key)]
+        del mappings
+
+        results = {}
+        for label, func in [("print", _write_print), ("atomic", _write_atomic)]:
+            path = Path(directory).joinpath(f"{label}.sssom.tsv")
+            start = time.perf_counter()
+            func(path, tuples)
+            results[label] = time.perf_counter() - start
+            click.echo(f"{label}: {results[label]:.2f}s ({rows / results[label]:,.0f} rows/s)")
+
+        same = (
+            Path(directory).joinpath("print.sssom.tsv").read_bytes()
+            == Path(directory).joinpath("atomic.sssom.tsv").read_bytes()
+        )
+        click.echo(f"speedup={results['print'] / results['atomic']:.1f}x identical={same}")
+        if not same:
+            raise click.ClickException("outputs differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 """Community curated mappings between biomedical entities."""
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
 from .graph import get_false_graph, get_predictions_graph, get_true_graph
 from .resources import (
     SemanticMapping,
+    iter_false_mappings,
+    iter_mappings,
+    iter_predictions,
+    iter_unsure,
     load_false_mappings,
     load_mappings,
     load_mappings_subset,
@@ -10,14 +18,31 @@ from .resources import (
     load_unsure,
 )
 
+if TYPE_CHECKING:
+    from .resources.parallel import load_all
+
 __all__ = [
     "SemanticMapping",
     "get_false_graph",
     "get_predictions_graph",
     "get_true_graph",
+    "iter_false_mappings",
+    "iter_mappings",
+    "iter_predictions",
+    "iter_unsure",
+    "load_all",
     "load_false_mappings",
     "load_mappings",
     "load_mappings_subset",
     "load_predictions",
     "load_unsure",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # parallel loading pulls in the table cache, so it's only imported when it's used
+    if name == "load_all":
+        from .resources.parallel import load_all
+
+        return load_all
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
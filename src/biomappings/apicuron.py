@@ -17,7 +17,7 @@ from collections.abc import Iterable
 import click
 from apicuron_client import Description, Report, Submission, resubmit_curations
 
-from biomappings import load_mappings
+from biomappings import iter_mappings
 
 NOW = datetime.datetime.now()
 START = datetime.datetime(year=2020, month=12, day=15)
@@ -78,7 +78,7 @@ def get_curation_payload() -> Submission:
 
 def iter_reports() -> Iterable[Report]:
     """Generate reports from the Biomappings for APICURON."""
-    for mapping in load_mappings():
+    for mapping in iter_mappings():
         if not mapping.author or mapping.author.prefix != "orcid":
             continue
 
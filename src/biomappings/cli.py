@@ -32,12 +32,19 @@ if get_git_hash() is not None:
     @click.option("--positives-path", type=click.Path(), help="A positives curation TSV file path")
     @click.option("--negatives-path", type=click.Path(), help="A negatives curation TSV file path")
     @click.option("--unsure-path", type=click.Path(), help="An unsure curation TSV file path")
+    @click.option(
+        "--prefix",
+        "prefixes",
+        multiple=True,
+        help="Only curate predictions with this subject or object prefix. Can be repeated.",
+    )
     @resolver_base_option
     def web(
         predictions_path: Path,
         positives_path: Path,
         negatives_path: Path,
         unsure_path: Path,
+        prefixes: tuple[str, ...],
         resolver_base: str | None,
     ) -> None:
         """Run the biomappings web app."""
@@ -48,6 +55,7 @@ if get_git_hash() is not None:
             positives_path=positives_path,
             negatives_path=negatives_path,
             unsure_path=unsure_path,
+            prefixes=prefixes or None,
             resolver_base=resolver_base,
         )
         run_app(app, with_gunicorn=False)
@@ -100,14 +108,48 @@ def update(ctx: click.Context) -> None:
 
 
 @main.command()
-def lint() -> None:
+@click.option(
+    "--memory-budget",
+    type=int,
+    help="Lint predictions out-of-core, buffering about this many bytes of rows at a time",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Don't write anything, but exit with an error if any file would change",
+)
+@click.option(
+    "--changed",
+    is_flag=True,
+    help="Only lint rows that changed since the last commit, assuming the rest are linted",
+)
+def lint(memory_budget: int | None, check: bool, changed: bool) -> None:
     """Sort files and remove duplicates."""
-    from . import resources
+    from .resources.incremental import lint_changed
+    from .resources.lint import lint_all
+
+    if changed and (check or memory_budget is not None):
+        raise click.UsageError("--changed can't be combined with --check or --memory-budget")
+    try:
+        if changed:
+            paths = lint_changed(standardize=True)
+        else:
+            paths = lint_all(standardize=True, check=check, memory_budget=memory_budget)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from None
+    for path in paths:
+        click.echo(f"{'would change' if check else 'changed'} {path}")
+    if check and paths:
+        sys.exit(1)
+
+
+@main.command()
+def compact() -> None:
+    """Merge predictions staged by concurrent jobs into the predictions file."""
+    from .resources.pending import compact_predictions
 
-    resources.lint_true_mappings(standardize=True)
-    resources.lint_false_mappings(standardize=True)
-    resources.lint_unsure_mappings(standardize=True)
-    resources.lint_predictions(standardize=True)
+    count = compact_predictions()
+    click.echo(f"compacted {count:,} staged predictions")
 
 
 @main.command()
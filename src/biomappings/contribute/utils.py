@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from biomappings import SemanticMapping, load_mappings
+from biomappings import SemanticMapping
+from biomappings.resources.store import get_store
 
 __all__ = [
     "get_curated_mappings",
@@ -12,7 +13,7 @@ __all__ = [
 def get_curated_mappings(prefix: str) -> list[SemanticMapping]:
     """Get mappings for a given prefix."""
     mappings = []
-    for mapping in load_mappings():
+    for mapping in get_store().by_prefix(prefix, kinds=["positive"]):
         if mapping.subject.prefix == prefix:
             mappings.append(mapping)
         elif mapping.object.prefix == prefix:
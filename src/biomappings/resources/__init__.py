@@ -4,12 +4,19 @@ from __future__ import annotations
 
 import csv
 import getpass
+import heapq
 import itertools as itt
 import logging
+import os
+import stat
+import sys
+import tempfile
 from collections import defaultdict
-from collections.abc import Iterable, Mapping, Sequence
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence
+from contextlib import contextmanager, suppress
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Callable, NamedTuple, overload
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, TextIO, TypeVar, cast, overload
 
 from bioregistry import NormalizedNamableReference, NormalizedNamedReference
 from curies import NamableReference
@@ -23,12 +30,16 @@ from biomappings.utils import (
     POSITIVES_SSSOM_PATH,
     PREDICTIONS_SSSOM_PATH,
     UNSURE_SSSOM_PATH,
+    CMapping,
     get_canonical_tuple,
+    get_record_id,
 )
 
 if TYPE_CHECKING:
     import semra
 
+    from .table import MappingTable
+
 __all__ = [
     "SemanticMapping",
     "append_false_mappings",
@@ -40,6 +51,10 @@ __all__ = [
     "filter_predictions",
     "get_curated_filter",
     "get_current_curator",
+    "iter_false_mappings",
+    "iter_mappings",
+    "iter_predictions",
+    "iter_unsure",
     "load_curators",
     "load_false_mappings",
     "load_mappings",
@@ -56,6 +71,9 @@ __all__ = [
 
 logger = logging.getLogger(__name__)
 
+M = TypeVar("M", bound=BaseModel)
+X = TypeVar("X")
+
 
 class _CuratedTuple(NamedTuple):
     """A tuple for writing manual curations to SSSOM TSV."""
@@ -140,6 +158,23 @@ class SemanticMapping(BaseModel):
     """,
     )
 
+    @cached_property
+    def record_id(self) -> str:
+        """Get a stable ID for the mapping. See :func:`biomappings.utils.get_record_id`.
+
+        The ID is computed on first access and kept in the instance's ``__dict__``, next
+        to (but not among) the fields, so indexing and looking up records hashes each
+        mapping only once.
+        """
+        return get_record_id(self)
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False) -> Self:
+        """Copy the mapping, dropping a cached :attr:`record_id` if fields are updated."""
+        rv = super().model_copy(update=update, deep=deep)
+        if update:
+            rv.__dict__.pop("record_id", None)
+        return rv
+
     def flip(self) -> Self:
         """Flip the mapping, if it's an exact match."""
         if self.predicate.curie != "skos:exactMatch":
@@ -177,9 +212,9 @@ class SemanticMapping(BaseModel):
                 raise TypeError
             k2 = f"{k}_label"
             # type ignore because properly typing the dict i/o is a pain
-            row[k] = reference_cls.from_curie(v1, name=row.pop(k2, None))  # type:ignore[assignment]
+            row[k] = _from_curie(reference_cls, v1, name=row.pop(k2, None))  # type:ignore[assignment]
         for k in ["mapping_justification"]:
-            row[k] = reference_cls.from_curie(row.pop(k))  # type:ignore[assignment]
+            row[k] = _from_curie(reference_cls, row.pop(k))  # type:ignore[assignment]
         return cls.model_validate(row)
 
     def as_predicted_row(self) -> _PredictedTuple:
@@ -196,25 +231,221 @@ class SemanticMapping(BaseModel):
         )
 
 
-def _load_table(path: str | Path, *, standardize: bool) -> list[SemanticMapping]:
+def _from_curie(
+    reference_cls: type[NamableReference], curie: str, name: str | None = None
+) -> NamableReference:
+    """Construct a reference from a CURIE, memoizing normalization against the Bioregistry.
+
+    The same prefixes, predicates, justifications, and authors appear on many rows, so
+    each validated :class:`bioregistry.NormalizedNamableReference` is memoized by its
+    CURIE and name. References are immutable, so they can be shared between mappings.
+    Other reference classes are constructed directly.
+    """
+    if reference_cls is not NormalizedNamableReference:
+        return reference_cls.from_curie(curie, name=name)
+    return _get_normalized_reference(curie, name)
+
+
+@lru_cache(maxsize=1 << 16)
+def _get_normalized_reference(curie: str, name: str | None) -> NormalizedNamableReference:
+    return NormalizedNamableReference.from_curie(curie, name=name)
+
+
+def _log_cache_info(path: Path, before: Sequence[Any]) -> None:
+    """Log the hit rates of the normalization caches since the given snapshot."""
+    for func, info_before in zip((_get_normalized_reference,), before):
+        info = func.cache_info()
+        hits = info.hits - info_before.hits
+        total = hits + info.misses - info_before.misses
+        logger.debug(
+            "[%s] %s cache hit rate %.1f%% (%d/%d, size %d/%d)",
+            path.name,
+            func.__name__.lstrip("_"),
+            100 * hits / total if total else 0.0,
+            hits,
+            total,
+            info.currsize,
+            info.maxsize,
+        )
+
+
+def _load_table(
+    path: str | Path, *, standardize: bool, trusted: bool = False, cache: bool = False
+) -> list[SemanticMapping]:
+    """Load a SSSOM TSV file.
+
+    :param path: The path to a SSSOM TSV file
+    :param standardize: Should references be standardized against the Bioregistry?
+        This is ignored when ``trusted`` is true.
+    :param trusted: Should validation be skipped? This is several times faster, but
+        should only be used for files that have already been checked with
+        ``biomappings lint``, since these are already standardized.
+    :param cache: Should the parsed table be cached on disk? See
+        :mod:`biomappings.resources.cache`.
+
+    :returns: A list of semantic mappings
+    """
+    path = Path(path).expanduser().resolve()
+    if not cache:
+        return _parse_table(path, standardize=standardize, trusted=trusted)
+
+    from .cache import load_cached_table
+
+    table = load_cached_table(
+        path,
+        mode=_get_load_mode(standardize=standardize, trusted=trusted),
+        func=lambda: _parse_table(path, standardize=standardize, trusted=trusted),
+    )
+    return table if isinstance(table, list) else list(table)
+
+
+def _load_mapping_table(
+    path: str | Path, *, standardize: bool, trusted: bool = False, cache: bool = False
+) -> MappingTable:
+    """Load a SSSOM TSV file as a mapping table, without materializing its rows.
+
+    The parameters are the same as for :func:`_load_table`, which shares its cache.
+    """
+    from .table import MappingTable
+
+    path = Path(path).expanduser().resolve()
+    if not cache:
+        return MappingTable.from_path(path, standardize=standardize, trusted=trusted)
+
+    from .cache import load_cached_table
+
+    return cast(
+        MappingTable,
+        load_cached_table(
+            path,
+            mode=_get_load_mode(standardize=standardize, trusted=trusted),
+            func=lambda: MappingTable.from_path(path, standardize=standardize, trusted=trusted),
+        ),
+    )
+
+
+def _get_load_mode(
+    *, standardize: bool, trusted: bool
+) -> Literal["trusted", "validated", "standardized"]:
+    if trusted:
+        return "trusted"
+    elif standardize:
+        return "standardized"
+    else:
+        return "validated"
+
+
+def _parse_table(path: Path, *, standardize: bool, trusted: bool) -> list[SemanticMapping]:
+    return list(_iter_table(path, standardize=standardize, trusted=trusted))
+
+
+def _iter_table(
+    path: str | Path, *, standardize: bool, trusted: bool = False
+) -> Iterable[SemanticMapping]:
+    """Parse and yield mappings from a SSSOM TSV file one at a time.
+
+    The parameters are the same as for :func:`_load_table`, but this never uses the
+    cache, so memory stays constant no matter how big the file is.
+    """
+    path = Path(path).expanduser().resolve()
+    cache_info = (_get_normalized_reference.cache_info(),)
+    with _open_table(path) as file:
+        yield from _iter_records(
+            csv.DictReader(file, delimiter="\t"), standardize=standardize, trusted=trusted
+        )
+    if standardize and not trusted and logger.isEnabledFor(logging.DEBUG):
+        _log_cache_info(path, cache_info)
+
+
+def _iter_records(
+    records: Iterable[dict[str, str]], *, standardize: bool, trusted: bool
+) -> Iterable[SemanticMapping]:
+    """Parse mappings from the records of a SSSOM TSV file."""
     reference_cls: type[NamableReference]
-    if standardize:
+    if standardize and not trusted:
         reference_cls = NormalizedNamableReference
     else:
         reference_cls = NamableReference
 
-    with Path(path).expanduser().resolve().open() as file:
-        return [
-            SemanticMapping.from_row(
-                {
-                    key: value_stripped
-                    for key, value in record.items()
-                    if value and (value_stripped := value.strip()) and value_stripped != "."
-                },
-                reference_cls,
-            )
-            for record in csv.DictReader(file, delimiter="\t")
-        ]
+    cleaned_records = (_clean_record(record) for record in records)
+    if trusted:
+        yield from _iter_constructed(cleaned_records, reference_cls)
+    else:
+        for record in cleaned_records:
+            yield SemanticMapping.from_row(record, reference_cls)
+
+
+def _clean_record(record: dict[str, str]) -> dict[str, str]:
+    return {
+        key: value_stripped
+        for key, value in record.items()
+        if value and (value_stripped := value.strip()) and value_stripped != "."
+    }
+
+
+def _iter_constructed(
+    records: Iterable[dict[str, str]], reference_cls: type[NamableReference]
+) -> Iterable[SemanticMapping]:
+    """Construct mappings from records without running validation.
+
+    Since predicates, justifications, and authors are shared by many rows, these
+    references are interned such that each is constructed only once.
+    """
+    references: dict[tuple[str, str | None], NamableReference] = {}
+
+    def _new_reference(curie: str, name: str | None = None) -> NamableReference:
+        prefix, _, identifier = curie.partition(":")
+        return _construct(reference_cls, {"prefix": prefix, "identifier": identifier, "name": name})
+
+    def _get_reference(curie: str, name: str | None = None) -> NamableReference:
+        reference = references.get((curie, name))
+        if reference is None:
+            reference = references[curie, name] = _new_reference(curie, name)
+        return reference
+
+    for record in records:
+        author_curie = record.get("author_id")
+        confidence = record.get("confidence")
+        values = {
+            "subject": _new_reference(record["subject_id"], record.get("subject_label")),
+            "predicate": _get_reference(record["predicate_id"], record.get("predicate_label")),
+            "object": _new_reference(record["object_id"], record.get("object_label")),
+            "mapping_justification": _get_reference(record["mapping_justification"]),
+            "author": _get_reference(author_curie, record.get("author_label"))
+            if author_curie is not None
+            else None,
+            "mapping_tool": record.get("mapping_tool"),
+            "predicate_modifier": record.get("predicate_modifier"),
+            "confidence": float(confidence) if confidence is not None else None,
+        }
+        # like validation, only the columns that have values count as set
+        fields_set = {key for key, value in values.items() if value is not None}
+        yield _construct(SemanticMapping, values, fields_set=fields_set)
+
+
+def _construct(cls: type[M], values: dict[str, Any], *, fields_set: set[str] | None = None) -> M:
+    """Construct a model without validation.
+
+    This is a leaner version of :meth:`pydantic.BaseModel.model_construct`, which is
+    itself the main cost of loading a trusted file. It assumes that a value is given for
+    every field and that the model has neither private attributes nor extra fields, which
+    holds for :class:`SemanticMapping` and for references. Since it sets pydantic's
+    internal state directly, the tests check that it gives the same state as validating
+    the shipped files.
+
+    :param cls: The model class
+    :param values: A value for every field
+    :param fields_set: The fields that were explicitly set. Defaults to all of them.
+    :returns: An instance of the model
+    """
+    rv = cls.__new__(cls)
+    object.__setattr__(rv, "__dict__", values)
+    object.__setattr__(
+        rv, "__pydantic_fields_set__", set(values) if fields_set is None else fields_set
+    )
+    object.__setattr__(rv, "__pydantic_extra__", None)
+    object.__setattr__(rv, "__pydantic_private__", None)
+    return rv
 
 
 def _write_helper(
@@ -222,22 +453,452 @@ def _write_helper(
     path: str | Path,
     mode: Literal["w", "a"],
     t: Literal["curated", "predicted"],
+    record_ids: bool | None = None,
 ) -> None:
     mappings = sorted(set(mappings), key=mapping_sort_key)
+    path = Path(path).expanduser().resolve()
+    _recover_journal(path)
+    if record_ids is None:
+        record_ids = _has_record_ids(path)
+    header, to_row = _get_columns(t, record_ids=record_ids)
+    stat_before = _get_stat(path)
+    with _open_atomic(path) if mode == "w" else _open_journaled(path) as file:
+        writer = _get_writer(file)
+        if mode == "w":
+            writer.writerow(header)
+        writer.writerows(map(to_row, mappings))
+
+    from .index import invalidate_index, update_index
+
+    if mode == "w":
+        # re-indexing is deferred to the next lookup, so writing doesn't pay for it
+        invalidate_index(path)
+    else:
+        update_index(path, mappings, stat_before=stat_before)
+
+
+#: The optional last column with :attr:`SemanticMapping.record_id`
+RECORD_ID_COLUMN = "record_id"
+
+
+def _get_columns(
+    t: Literal["curated", "predicted"], *, record_ids: bool = False
+) -> tuple[Sequence[str], Callable[[SemanticMapping], Sequence[str]]]:
+    """Get the header and a function that gets a row from a mapping for a kind of file.
+
+    :param t: The kind of file
+    :param record_ids: Should the last column have the record ID of each mapping?
+    """
     header: Sequence[str]
-    to_row: Callable[[SemanticMapping], _PredictedTuple | _CuratedTuple]
+    to_row: Callable[[SemanticMapping], Sequence[str]]
     if t == "curated":
-        header = _CuratedTuple._fields
-        to_row = SemanticMapping.as_curated_row
+        header, to_row = _CuratedTuple._fields, SemanticMapping.as_curated_row
     else:
-        header = _PredictedTuple._fields
-        to_row = SemanticMapping.as_predicted_row
+        header, to_row = _PredictedTuple._fields, SemanticMapping.as_predicted_row
+    if not record_ids:
+        return header, to_row
+    return (*header, RECORD_ID_COLUMN), lambda mapping: (*to_row(mapping), mapping.record_id)
+
+
+def _has_record_ids(path: Path) -> bool:
+    """Check if an existing file has a record ID column, which should be kept."""
+    return path.is_file() and _read_raw_header(path)[-1] == RECORD_ID_COLUMN
+
+
+def _get_writer(file: TextIO) -> Any:
+    """Get a writer for SSSOM TSV rows.
+
+    Values are written as-is, so this gives the same output as joining them with tabs,
+    but raises an error if a value contains a tab or newline that would corrupt the file.
+    """
+    return csv.writer(
+        file, delimiter="\t", lineterminator="\n", quoting=csv.QUOTE_NONE, quotechar=None
+    )
+
+
+#: Compression formats, by file extension
+Compression = Literal["gzip", "xz", "zstd"]
+COMPRESSION_SUFFIXES: dict[str, Compression] = {".gz": "gzip", ".xz": "xz", ".zst": "zstd"}
+
+
+def _get_compression(path: str | Path) -> Compression | None:
+    """Get the compression format of a file from its extension, if it has one."""
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix)
+
+
+def _open_table(
+    path: str | Path,
+    mode: Literal["r", "w", "a"] = "r",
+    *,
+    compression: Compression | None = None,
+) -> TextIO:
+    """Open a SSSOM TSV file for reading or writing text, streaming (de)compression.
+
+    :param path: The path to the file
+    :param mode: Whether to read, write, or append
+    :param compression: The compression format. Only needed if it can't be inferred
+        from the extension of the path, e.g., for temporary files.
+
+    :returns: A text file. When writing, lines aren't translated, like for
+        :func:`csv.writer`.
+    """
+    if compression is None:
+        compression = _get_compression(path)
+    newline = None if mode == "r" else ""
+    if compression is None:
+        return open(path, mode, newline=newline)
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(path, f"{mode}t", newline=newline)
+    if compression == "xz":
+        import lzma
+
+        return lzma.open(path, f"{mode}t", newline=newline)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                f"reading and writing {path} requires zstandard. Install it with "
+                f"`pip install biomappings[zstd]`"
+            ) from None
+        return zstandard.open(path, f"{mode}t", newline=newline)  # type:ignore[no-any-return]
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def _fsync(path: str | Path) -> None:
+    """Flush a closed file to disk, since compressed files only finish writing on close."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _open_atomic(path: Path) -> Iterator[TextIO]:
+    """Open a temporary file that replaces the given path once it's completely written.
+
+    The temporary file is in the same directory, so renaming it is atomic and the path
+    either has its old contents or its new ones, even if writing is interrupted. It's
+    compressed based on the extension of the path, like :func:`_open_table`.
+    """
+    fd, temporary_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        # mkstemp() only gives read and write permissions to the owner
+        os.chmod(temporary_path, stat.S_IMODE(path.stat().st_mode) if path.exists() else 0o644)
+        with _open_table(temporary_path, "w", compression=_get_compression(path)) as file:
+            yield file
+        _fsync(temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        Path(temporary_path).unlink(missing_ok=True)
+        raise
+
+
+def _get_journal_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}-journal")
+
+
+@contextmanager
+def _open_journaled(path: Path) -> Iterator[TextIO]:
+    """Open a file for appending, which is rolled back if writing is interrupted.
+
+    The original size of the file is recorded in a journal next to it before appending,
+    and the journal is locked until appending is done. If appending fails, the file is
+    truncated back to that size right away. If the process dies before it can do that,
+    the lock is released by the operating system, and :func:`_recover_journal` rolls
+    back the file before it's written again. Appending to a compressed file adds a new
+    compressed stream, so truncating it leaves the earlier streams intact.
+    """
+    journal_path = _get_journal_path(path)
+    with _open_journal(journal_path) as journal:
+        size = path.stat().st_size if path.exists() else 0
+        journal.truncate(0)
+        journal.write(str(size))
+        journal.flush()
+        os.fsync(journal.fileno())
+        try:
+            with _open_table(path, "a") as file:
+                yield file
+            _fsync(path)
+        except BaseException:
+            _roll_back(path, size)
+            raise
+        finally:
+            _release_journal(journal, journal_path)
+
+
+def _open_journal(journal_path: Path) -> TextIO:
+    """Open and lock a journal, waiting for an append that's still running to finish."""
+    while True:
+        # opening for writing would empty the journal of an append that's still running
+        journal = journal_path.open("a+")
+        _lock_journal(journal, blocking=True)
+        # the append that held the lock removes the journal once it's done
+        with suppress(FileNotFoundError):
+            if os.path.samestat(os.fstat(journal.fileno()), journal_path.stat()):
+                return journal
+        journal.close()
+
+
+def _lock_journal(journal: TextIO, *, blocking: bool) -> bool:
+    """Take an exclusive lock on a journal, which is released when it's closed.
+
+    :param journal: The open journal
+    :param blocking: Should this wait for the lock, rather than giving up?
+    :returns: If the lock was taken. If not, another process is still appending.
+    """
+    if sys.platform == "win32":
+        import msvcrt
+
+        # locks are on byte ranges on Windows, so the first byte stands for the file
+        journal.seek(0)
+        try:
+            msvcrt.locking(journal.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+
+    import fcntl
+
+    try:
+        fcntl.flock(journal.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _release_journal(journal: TextIO, journal_path: Path) -> None:
+    """Empty, remove, and unlock a journal whose append is done or was rolled back.
+
+    It's emptied first, so a process that was waiting for the lock on the same file
+    doesn't roll back the file again.
+    """
+    journal.truncate(0)
+    journal.flush()
+    if sys.platform == "win32":
+        journal.close()
+        # open files can't be removed on Windows, and another process might have
+        # opened it in the meantime, in which case the empty journal is left behind
+        with suppress(OSError):
+            journal_path.unlink(missing_ok=True)
+    else:
+        journal_path.unlink(missing_ok=True)
+        journal.close()
+
+
+def _recover_journal(path: Path) -> None:
+    """Roll back an append to the given file whose process died before finishing.
+
+    This is only called before writing, since truncating the file while reading it
+    could race with an append that's still running. Readers see the rows of an
+    interrupted append until the file is written again.
+    """
+    journal_path = _get_journal_path(path)
+    try:
+        journal = journal_path.open("r+")
+    except FileNotFoundError:
+        return
+    with journal:
+        if not _lock_journal(journal, blocking=False):
+            # the process that's appending is still running
+            return
+        # the journal is only used once it's completely written, and it's empty once
+        # the append is done. journals from older versions also have a process ID.
+        size = journal.read().split(" ")[0]
+        if not size:
+            return
+        _roll_back(path, int(size))
+        _release_journal(journal, journal_path)
+
+
+def _roll_back(path: Path, size: int) -> None:
+    if path.is_file() and path.stat().st_size != size:
+        logger.warning("rolling back interrupted write to %s", path)
+        os.truncate(path, size)
+
+
+def _get_stat(path: Path) -> tuple[int, int] | None:
+    if path.is_dir():
+        # a directory of shards, whose manifest is rewritten whenever a shard is
+        from .shards import get_manifest_path
+
+        path = get_manifest_path(path)
+    if not path.is_file():
+        return None
+    file_stat = path.stat()
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def _merge_helper(
+    mappings: Iterable[SemanticMapping],
+    path: str | Path,
+    *,
+    t: Literal["curated", "predicted"] = "curated",
+    exclude_lines: Collection[str] = frozenset(),
+    exclude_tuples: Collection[tuple[str, str, str, str]] = frozenset(),
+) -> bool:
+    """Merge mappings into an already linted file in a single streaming pass.
+
+    This gives the same result as appending then linting without standardization, but
+    only holds the new mappings in memory rather than the whole file. It relies on the
+    file already being sorted by :func:`mapping_sort_key` and free of redundant rows.
+
+    :param mappings: The new mappings
+    :param path: The path to the file
+    :param t: The kind of file
+    :param exclude_lines: Lines to drop from the file, e.g., because they're replaced
+        by the new mappings
+    :param exclude_tuples: Canonical tuples to drop from both the file and the new
+        mappings, e.g., predictions that have been curated
+
+    :returns: If the file was changed
+    """
     path = Path(path).expanduser().resolve()
-    with path.open(mode) as file:
-        if mode == "w":
-            print(*header, sep="\t", file=file)
-        for mapping in mappings:
-            print(*to_row(mapping), sep="\t", file=file)
+    _recover_journal(path)
+    header, to_row = _get_columns(t, record_ids=_has_record_ids(path))
+    if not path.is_file() or _read_raw_header(path) != list(header):
+        if exclude_lines or exclude_tuples:
+            raise ValueError(f"can't exclude rows from {path} without a matching header")
+        _write_helper(mappings, path, mode="a" if path.is_file() else "w", t=t)
+        if t == "curated":
+            _lint_curated_mappings(path, standardize=False)
+        else:
+            _lint_predictions(path=path, standardize=False)
+        return True
+
+    new_mappings = {
+        canonical_tuple: mapping
+        for mapping in _remove_redundant(mappings)
+        if (canonical_tuple := get_canonical_tuple(mapping)) not in exclude_tuples
+    }
+
+    def _keep(row: _RawRow) -> bool:
+        return row.line not in exclude_lines and row.canonical_tuple not in exclude_tuples
+
+    # first pass: decide whether the new mapping or the existing row wins each conflict.
+    # like _remove_redundant(), the existing row wins unless the new one is strictly better
+    replaced = set()
+    changed = bool(new_mappings)
+    for row in _iter_raw_rows(path):
+        if not _keep(row):
+            changed = True
+            continue
+        new_mapping = new_mappings.get(row.canonical_tuple)
+        if new_mapping is None:
+            continue
+        if _pick_best(new_mapping) > row.best:
+            replaced.add(row.canonical_tuple)
+        else:
+            del new_mappings[row.canonical_tuple]
+    if not changed:
+        return False
+
+    # second pass: stream the existing rows and the new rows into their sorted positions
+    new_rows = sorted(
+        (
+            _RawRow(
+                line="\t".join(to_row(mapping)) + "\n",
+                sort_key=mapping_sort_key(mapping),
+                canonical_tuple=key,
+                best=_pick_best(mapping),
+            )
+            for key, mapping in new_mappings.items()
+        ),
+        key=_get_raw_sort_key,
+    )
+    stat_before = _get_stat(path)
+    existing_rows = (
+        row for row in _iter_raw_rows(path) if _keep(row) and row.canonical_tuple not in replaced
+    )
+    with _open_atomic(path) as file:
+        _get_writer(file).writerow(header)
+        for row in heapq.merge(existing_rows, new_rows, key=_get_raw_sort_key):
+            file.write(row.line)
+
+    from .index import invalidate_index, update_index
+
+    if exclude_lines or exclude_tuples:
+        invalidate_index(path)
+    else:
+        # rows that replaced existing ones don't change the set of canonical tuples
+        update_index(path, list(new_mappings.values()), stat_before=stat_before)
+    return True
+
+
+class _RawRow(NamedTuple):
+    """A row in a SSSOM TSV file that has been split, but not parsed."""
+
+    line: str
+    sort_key: tuple[str, ...]
+    canonical_tuple: tuple[str, str, str, str]
+    best: int
+
+
+def _get_raw_sort_key(row: _RawRow) -> tuple[str, ...]:
+    return row.sort_key
+
+
+def _read_raw_header(path: Path) -> list[str]:
+    with _open_table(path) as file:
+        return file.readline().rstrip("\n").split("\t")
+
+
+def _iter_raw_rows(path: Path) -> Iterable[_RawRow]:
+    """Iterate over the rows of a SSSOM TSV file without parsing them into mappings.
+
+    The sort key, canonical tuple, and :func:`_pick_best` value are the same as what
+    would be calculated from a :class:`SemanticMapping`.
+    """
+    with _open_table(path) as file:
+        header = file.readline().rstrip("\n").split("\t")
+        columns = {key: i for i, key in enumerate(header)}
+        subject_i = columns["subject_id"]
+        predicate_i = columns["predicate_id"]
+        object_i = columns["object_id"]
+        justification_i = columns["mapping_justification"]
+        author_i = columns.get("author_id")
+        tool_i = columns.get("mapping_tool")
+        for line in file:
+            values = [_clean_raw_value(value) for value in line.rstrip("\n").split("\t")]
+            values.extend([""] * (len(header) - len(values)))
+            subject, obj = values[subject_i], values[object_i]
+            author = values[author_i] if author_i is not None else ""
+            yield _RawRow(
+                line=line if line.endswith("\n") else line + "\n",
+                sort_key=(
+                    subject,
+                    values[predicate_i],
+                    obj,
+                    values[justification_i],
+                    values[tool_i] if tool_i is not None else "",
+                ),
+                canonical_tuple=_get_raw_canonical_tuple(subject, obj),
+                best=1 if author.startswith("orcid:") else 0,
+            )
+
+
+def _clean_raw_value(value: str) -> str:
+    value = value.strip()
+    return "" if value == "." else value
+
+
+def _get_raw_canonical_tuple(subject: str, obj: str) -> tuple[str, str, str, str]:
+    """Get the canonical tuple from subject and object CURIE strings.
+
+    This is the same as :func:`biomappings.utils.get_canonical_tuple`, since references
+    are ordered by their prefix then identifier.
+    """
+    source = subject.partition(":")[::2]
+    target = obj.partition(":")[::2]
+    if source > target:
+        source, target = target, source
+    return (*source, *target)
 
 
 def mapping_sort_key(mapping: SemanticMapping) -> tuple[str, ...]:
@@ -252,20 +913,36 @@ def mapping_sort_key(mapping: SemanticMapping) -> tuple[str, ...]:
 
 
 def load_mappings(
-    *, path: str | Path | None = None, standardize: bool = False
+    *,
+    path: str | Path | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
 ) -> list[SemanticMapping]:
     """Load the mappings table."""
-    return _load_table(path or POSITIVES_SSSOM_PATH, standardize=standardize)
+    return _load_table(
+        path or POSITIVES_SSSOM_PATH, standardize=standardize, trusted=trusted, cache=cache
+    )
+
+
+def iter_mappings(
+    *, path: str | Path | None = None, standardize: bool = False, trusted: bool = False
+) -> Iterable[SemanticMapping]:
+    """Iterate over the mappings table, parsing one row at a time."""
+    return _iter_table(path or POSITIVES_SSSOM_PATH, standardize=standardize, trusted=trusted)
 
 
 def load_mappings_subset(source: str, target: str) -> Mapping[str, str]:
-    """Get a dictionary of 1-1 mappings from the source prefix to the target prefix."""
+    """Get a dictionary of 1-1 mappings from the source prefix to the target prefix.
+
+    Exact matches are also included in the flipped direction. The positive mappings are
+    partitioned by prefix pair once per process (and again whenever the file changes),
+    so repeated calls for different prefix pairs are cheap.
+    """
     # TODO replace with SeMRA functionality?
-    return {
-        mapping.subject.identifier: mapping.object.identifier
-        for mapping in load_mappings()
-        if mapping.subject.prefix == source and mapping.object.prefix == target
-    }
+    from .store import get_store
+
+    return get_store().subset(source, target)
 
 
 def append_true_mappings(
@@ -274,10 +951,24 @@ def append_true_mappings(
     sort: bool = True,
     path: Path | None = None,
     standardize: bool = False,
+    merge: bool = False,
 ) -> None:
-    """Append new lines to the mappings table."""
+    """Append new lines to the mappings table.
+
+    :param mappings: The mappings to add
+    :param sort: Should the file be linted after appending?
+    :param path: The path to the file, if not the default
+    :param standardize: Should references be standardized while linting?
+    :param merge: If true, merge the new mappings into their sorted positions in a
+        single streaming pass instead of appending then linting. This is much faster
+        for big files, but assumes the file is already linted, so ``sort`` and
+        ``standardize`` are ignored.
+    """
     if path is None:
         path = POSITIVES_SSSOM_PATH
+    if merge:
+        _merge_helper(mappings, path)
+        return
     _write_helper(mappings, path=path, mode="a", t="curated")
     if sort:
         lint_true_mappings(path=path, standardize=standardize)
@@ -288,9 +979,22 @@ def append_true_mapping_tuples(mappings: Iterable[SemanticMapping]) -> None:
     append_true_mappings(mappings)
 
 
-def write_true_mappings(mappings: Iterable[SemanticMapping], *, path: Path | None = None) -> None:
-    """Write mappigns to the true mappings file."""
-    _write_helper(mappings, path=path or POSITIVES_SSSOM_PATH, mode="w", t="curated")
+def write_true_mappings(
+    mappings: Iterable[SemanticMapping],
+    *,
+    path: Path | None = None,
+    record_ids: bool | None = None,
+) -> None:
+    """Write mappigns to the true mappings file.
+
+    :param mappings: The mappings
+    :param path: The path to the file, if not the default
+    :param record_ids: Should a ``record_id`` column with :attr:`SemanticMapping.record_id`
+        be written? By default, it's only written if the file already has one.
+    """
+    _write_helper(
+        mappings, path=path or POSITIVES_SSSOM_PATH, mode="w", t="curated", record_ids=record_ids
+    )
 
 
 def lint_true_mappings(*, path: Path | None = None, standardize: bool) -> None:
@@ -306,10 +1010,23 @@ def _lint_curated_mappings(path: Path, *, standardize: bool) -> None:
 
 
 def load_false_mappings(
-    *, path: Path | None = None, standardize: bool = False
+    *,
+    path: Path | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
 ) -> list[SemanticMapping]:
     """Load the false mappings table."""
-    return _load_table(path or NEGATIVES_SSSOM_PATH, standardize=standardize)
+    return _load_table(
+        path or NEGATIVES_SSSOM_PATH, standardize=standardize, trusted=trusted, cache=cache
+    )
+
+
+def iter_false_mappings(
+    *, path: str | Path | None = None, standardize: bool = False, trusted: bool = False
+) -> Iterable[SemanticMapping]:
+    """Iterate over the false mappings table, parsing one row at a time."""
+    return _iter_table(path or NEGATIVES_SSSOM_PATH, standardize=standardize, trusted=trusted)
 
 
 def append_false_mappings(
@@ -318,18 +1035,45 @@ def append_false_mappings(
     sort: bool = True,
     path: Path | None = None,
     standardize: bool = False,
+    merge: bool = False,
 ) -> None:
-    """Append new lines to the false mappings table."""
+    """Append new lines to the false mappings table.
+
+    :param mappings: The mappings to add
+    :param sort: Should the file be linted after appending?
+    :param path: The path to the file, if not the default
+    :param standardize: Should references be standardized while linting?
+    :param merge: If true, merge the new mappings into their sorted positions in a
+        single streaming pass instead of appending then linting. This is much faster
+        for big files, but assumes the file is already linted, so ``sort`` and
+        ``standardize`` are ignored.
+    """
     if path is None:
         path = NEGATIVES_SSSOM_PATH
+    if merge:
+        _merge_helper(mappings, path)
+        return
     _write_helper(mappings=mappings, path=path, mode="a", t="curated")
     if sort:
         lint_false_mappings(path=path, standardize=standardize)
 
 
-def write_false_mappings(mappings: Iterable[SemanticMapping], *, path: Path | None = None) -> None:
-    """Write mappings to the false mappings file."""
-    _write_helper(mappings, path or NEGATIVES_SSSOM_PATH, mode="w", t="curated")
+def write_false_mappings(
+    mappings: Iterable[SemanticMapping],
+    *,
+    path: Path | None = None,
+    record_ids: bool | None = None,
+) -> None:
+    """Write mappings to the false mappings file.
+
+    :param mappings: The mappings
+    :param path: The path to the file, if not the default
+    :param record_ids: Should a ``record_id`` column with :attr:`SemanticMapping.record_id`
+        be written? By default, it's only written if the file already has one.
+    """
+    _write_helper(
+        mappings, path or NEGATIVES_SSSOM_PATH, mode="w", t="curated", record_ids=record_ids
+    )
 
 
 def lint_false_mappings(*, path: Path | None = None, standardize: bool) -> None:
@@ -337,9 +1081,24 @@ def lint_false_mappings(*, path: Path | None = None, standardize: bool) -> None:
     _lint_curated_mappings(path=path or NEGATIVES_SSSOM_PATH, standardize=standardize)
 
 
-def load_unsure(*, path: Path | None = None, standardize: bool = False) -> list[SemanticMapping]:
+def load_unsure(
+    *,
+    path: Path | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
+) -> list[SemanticMapping]:
     """Load the unsure table."""
-    return _load_table(path or UNSURE_SSSOM_PATH, standardize=standardize)
+    return _load_table(
+        path or UNSURE_SSSOM_PATH, standardize=standardize, trusted=trusted, cache=cache
+    )
+
+
+def iter_unsure(
+    *, path: str | Path | None = None, standardize: bool = False, trusted: bool = False
+) -> Iterable[SemanticMapping]:
+    """Iterate over the unsure table, parsing one row at a time."""
+    return _iter_table(path or UNSURE_SSSOM_PATH, standardize=standardize, trusted=trusted)
 
 
 def append_unsure_mappings(
@@ -348,18 +1107,43 @@ def append_unsure_mappings(
     sort: bool = True,
     path: Path | None = None,
     standardize: bool = False,
+    merge: bool = False,
 ) -> None:
-    """Append new lines to the "unsure" mappings table."""
+    """Append new lines to the "unsure" mappings table.
+
+    :param mappings: The mappings to add
+    :param sort: Should the file be linted after appending?
+    :param path: The path to the file, if not the default
+    :param standardize: Should references be standardized while linting?
+    :param merge: If true, merge the new mappings into their sorted positions in a
+        single streaming pass instead of appending then linting. This is much faster
+        for big files, but assumes the file is already linted, so ``sort`` and
+        ``standardize`` are ignored.
+    """
     if path is None:
         path = UNSURE_SSSOM_PATH
+    if merge:
+        _merge_helper(mappings, path)
+        return
     _write_helper(mappings, path=path, mode="a", t="curated")
     if sort:
         lint_unsure_mappings(path=path, standardize=standardize)
 
 
-def write_unsure_mappings(mappings: Iterable[SemanticMapping], *, path: Path | None = None) -> None:
-    """Write mappings to the unsure mappings file."""
-    _write_helper(mappings, path or UNSURE_SSSOM_PATH, mode="w", t="curated")
+def write_unsure_mappings(
+    mappings: Iterable[SemanticMapping],
+    *,
+    path: Path | None = None,
+    record_ids: bool | None = None,
+) -> None:
+    """Write mappings to the unsure mappings file.
+
+    :param mappings: The mappings
+    :param path: The path to the file, if not the default
+    :param record_ids: Should a ``record_id`` column with :attr:`SemanticMapping.record_id`
+        be written? By default, it's only written if the file already has one.
+    """
+    _write_helper(mappings, path or UNSURE_SSSOM_PATH, mode="w", t="curated", record_ids=record_ids)
 
 
 def lint_unsure_mappings(*, standardize: bool, path: Path | None = None) -> None:
@@ -367,16 +1151,152 @@ def lint_unsure_mappings(*, standardize: bool, path: Path | None = None) -> None
     _lint_curated_mappings(path=path or UNSURE_SSSOM_PATH, standardize=standardize)
 
 
+# docstr-coverage:excused `overload`
+@overload
+def load_predictions(
+    *,
+    path: str | Path | None = ...,
+    standardize: bool = ...,
+    trusted: bool = ...,
+    cache: bool = ...,
+    prefixes: Collection[str] | None = ...,
+    as_table: Literal[False] = False,
+) -> list[SemanticMapping]: ...
+
+
+# docstr-coverage:excused `overload`
+@overload
 def load_predictions(
-    *, path: str | Path | None = None, standardize: bool = False
-) -> list[SemanticMapping]:
-    """Load the predictions table."""
-    return _load_table(path or PREDICTIONS_SSSOM_PATH, standardize=standardize)
+    *,
+    path: str | Path | None = ...,
+    standardize: bool = ...,
+    trusted: bool = ...,
+    cache: bool = ...,
+    prefixes: Collection[str] | None = ...,
+    as_table: Literal[True],
+) -> MappingTable: ...
+
+
+def load_predictions(
+    *,
+    path: str | Path | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
+    prefixes: Collection[str] | None = None,
+    as_table: bool = False,
+) -> list[SemanticMapping] | MappingTable:
+    """Load the predictions table.
+
+    :param path: The path to the predictions file, or to a directory of shards. See
+        :mod:`biomappings.resources.shards`.
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param trusted: Should validation be skipped? See :func:`load_mappings`.
+    :param cache: Should the parsed table be cached on disk?
+    :param prefixes: If given, only load predictions where the subject or object prefix
+        is one of these. For a directory of shards, only the matching shards are read.
+    :param as_table: Should a :class:`biomappings.resources.table.MappingTable` be
+        returned instead of a list? This takes much less memory, since rows are only
+        materialized as semantic mappings when they're accessed.
+
+    :returns: A list of semantic mappings, or a mapping table
+    """
+    path = Path(path or PREDICTIONS_SSSOM_PATH)
+    if path.is_dir():
+        from .shards import load_shards
+
+        mappings = load_shards(
+            path, prefixes=prefixes, standardize=standardize, trusted=trusted, cache=cache
+        )
+        if as_table:
+            from .table import MappingTable
+
+            return MappingTable.from_mappings(mappings)
+        return mappings
+    if as_table:
+        table = _load_mapping_table(path, standardize=standardize, trusted=trusted, cache=cache)
+        return table if prefixes is None else table.filter_any_prefix(prefixes)
+    mappings = _load_table(path, standardize=standardize, trusted=trusted, cache=cache)
+    if prefixes is not None:
+        mappings = [mapping for mapping in mappings if _has_prefix(mapping, prefixes)]
+    return mappings
 
 
-def write_predictions(mappings: Iterable[SemanticMapping], *, path: Path | None = None) -> None:
-    """Write new content to the predictions table."""
-    _write_helper(mappings, path or PREDICTIONS_SSSOM_PATH, mode="w", t="predicted")
+def _has_prefix(mapping: SemanticMapping, prefixes: Collection[str]) -> bool:
+    return mapping.subject.prefix in prefixes or mapping.object.prefix in prefixes
+
+
+def iter_predictions(
+    *,
+    path: str | Path | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    prefixes: Collection[str] | None = None,
+) -> Iterable[SemanticMapping]:
+    """Iterate over the predictions table, parsing one row at a time.
+
+    Unlike :func:`load_predictions`, this never holds more than one row in memory. A
+    directory of shards is iterated over one shard at a time.
+    """
+    path = Path(path or PREDICTIONS_SSSOM_PATH)
+    if path.is_dir():
+        from .shards import iter_shards
+
+        return iter_shards(path, prefixes=prefixes, standardize=standardize, trusted=trusted)
+    mappings = _iter_table(path, standardize=standardize, trusted=trusted)
+    if prefixes is not None:
+        mappings = (mapping for mapping in mappings if _has_prefix(mapping, prefixes))
+    return mappings
+
+
+def write_predictions(
+    mappings: Iterable[SemanticMapping],
+    *,
+    path: Path | None = None,
+    prefixes: Collection[str] | None = None,
+    record_ids: bool | None = None,
+) -> None:
+    """Write new content to the predictions table.
+
+    :param mappings: The predictions
+    :param path: The path to the predictions file, or to a directory of shards
+    :param prefixes: If given, only replace the predictions where the subject or object
+        prefix is one of these, e.g., after loading them with
+        ``load_predictions(prefixes=...)``. For a directory of shards, only the
+        matching shards are rewritten.
+    :param record_ids: Should a ``record_id`` column with :attr:`SemanticMapping.record_id`
+        be written? By default, it's only written if the file already has one.
+    """
+    from .pending import lock
+
+    with lock(path):
+        _write_predictions(mappings, path=path, prefixes=prefixes, record_ids=record_ids)
+
+
+def _write_predictions(
+    mappings: Iterable[SemanticMapping],
+    *,
+    path: Path | None,
+    prefixes: Collection[str] | None,
+    record_ids: bool | None,
+) -> None:
+    """Write new content to the predictions table, assuming the lock is already held."""
+    path = Path(path or PREDICTIONS_SSSOM_PATH)
+    if path.is_dir():
+        from .shards import write_shards
+
+        write_shards(mappings, path, prefixes=prefixes, record_ids=record_ids)
+        return
+    if prefixes is not None:
+        mappings = itt.chain(
+            (
+                mapping
+                for mapping in load_predictions(path=path)
+                if not _has_prefix(mapping, prefixes)
+            ),
+            mappings,
+        )
+    _write_helper(mappings, path, mode="w", t="predicted", record_ids=record_ids)
 
 
 def append_prediction_tuples(
@@ -386,10 +1306,16 @@ def append_prediction_tuples(
     sort: bool = True,
     path: Path | None = None,
     standardize: bool = False,
+    pending: bool = False,
 ) -> None:
     """Append new lines to the predictions table that come as canonical tuples."""
     append_predictions(
-        prediction_tuples, deduplicate=deduplicate, sort=sort, path=path, standardize=standardize
+        prediction_tuples,
+        deduplicate=deduplicate,
+        sort=sort,
+        path=path,
+        standardize=standardize,
+        pending=pending,
     )
 
 
@@ -400,27 +1326,78 @@ def append_predictions(
     sort: bool = True,
     path: Path | None = None,
     standardize: bool = True,
+    pending: bool = False,
+) -> None:
+    """Append new lines to the predictions table.
+
+    :param mappings: The mappings to add
+    :param deduplicate: Should mappings whose canonical tuples already appear in the
+        curated or predicted mappings be skipped? This is checked against the canonical
+        index in :mod:`biomappings.resources.index`, so only the new mappings are
+        loaded.
+    :param sort: Should the file be linted after appending?
+    :param path: The path to the file, if not the default. If this is a directory of
+        shards, only the shards for the new mappings' prefix pairs are appended to,
+        deduplicated against, and linted.
+    :param standardize: Should references be standardized while linting?
+    :param pending: If true, don't append to the predictions, but add the mappings as
+        a batch to be merged later by
+        :func:`biomappings.resources.pending.compact_predictions`. This is safe to do
+        from several processes at once, and the other arguments are used when
+        compacting instead.
+    """
+    from .pending import lock, stage_predictions
+
+    if pending:
+        stage_predictions(mappings, path=path)
+        return
+    with lock(path):
+        _append_predictions(
+            mappings, deduplicate=deduplicate, sort=sort, path=path, standardize=standardize
+        )
+
+
+def _append_predictions(
+    mappings: Iterable[SemanticMapping],
+    *,
+    deduplicate: bool,
+    sort: bool,
+    path: Path | None,
+    standardize: bool,
 ) -> None:
-    """Append new lines to the predictions table."""
+    """Append new lines to the predictions table, assuming the lock is already held."""
+    if path is None:
+        path = PREDICTIONS_SSSOM_PATH
+    sharded = path.is_dir()
     if deduplicate:
-        existing_mappings = {
-            get_canonical_tuple(existing_mapping)
-            for existing_mapping in itt.chain(
-                load_mappings(),
-                load_false_mappings(),
-                load_unsure(),
-                load_predictions(),
-            )
-        }
+        from .index import contains
+
+        mappings = list(mappings)
+        if sharded:
+            from .shards import get_prefix_pair, get_shard_path
+
+            prediction_paths = [
+                get_shard_path(path, prefix_pair)
+                for prefix_pair in {get_prefix_pair(mapping) for mapping in mappings}
+            ]
+        else:
+            prediction_paths = [path]
+        existing_mappings = contains(
+            [POSITIVES_SSSOM_PATH, NEGATIVES_SSSOM_PATH, UNSURE_SSSOM_PATH, *prediction_paths],
+            (get_canonical_tuple(mapping) for mapping in mappings),
+        )
         mappings = (
             mapping for mapping in mappings if get_canonical_tuple(mapping) not in existing_mappings
         )
 
-    if path is None:
-        path = PREDICTIONS_SSSOM_PATH
+    if sharded:
+        from .shards import append_shards
+
+        append_shards(mappings, path, sort=sort, standardize=standardize)
+        return
     _write_helper(mappings, path, mode="a", t="predicted")
     if sort:
-        lint_predictions(path=path, standardize=standardize)
+        _lint_predictions(path=path, standardize=standardize)
 
 
 def lint_predictions(
@@ -428,6 +1405,8 @@ def lint_predictions(
     path: Path | None = None,
     additional_curated_mappings: Iterable[SemanticMapping] | None = None,
     standardize: bool,
+    memory_budget: int | None = None,
+    curated_paths: Sequence[str | Path] | None = None,
 ) -> None:
     """Lint the predictions file.
 
@@ -437,19 +1416,76 @@ def lint_predictions(
 
     :param path: The path to the predicted mappings
     :param additional_curated_mappings: A list of additional mappings
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param memory_budget: If given, lint with an external merge sort that buffers
+        about this many bytes of rows in memory at a time, for predictions files that
+        are bigger than memory. See :mod:`biomappings.resources.external`.
+    :param curated_paths: Custom paths to the curated mappings files. Pass an empty
+        list if the curated mappings are all given as additional curated mappings, so
+        the files aren't parsed again.
     """
-    mappings = remove_mappings(
-        load_predictions(path=path, standardize=standardize),
-        itt.chain(
-            load_mappings(standardize=standardize),
-            load_false_mappings(standardize=standardize),
-            load_unsure(standardize=standardize),
-            additional_curated_mappings or [],
-        ),
+    from .pending import lock
+
+    with lock(path):
+        _lint_predictions(
+            path=path,
+            additional_curated_mappings=additional_curated_mappings,
+            standardize=standardize,
+            memory_budget=memory_budget,
+            curated_paths=curated_paths,
+        )
+
+
+def _lint_predictions(
+    *,
+    path: Path | None = None,
+    additional_curated_mappings: Iterable[SemanticMapping] | None = None,
+    standardize: bool,
+    memory_budget: int | None = None,
+    curated_paths: Sequence[str | Path] | None = None,
+) -> None:
+    """Lint the predictions file, assuming the lock is already held."""
+    if path is not None and path.is_dir():
+        from .shards import lint_shards
+
+        lint_shards(
+            path,
+            additional_curated_mappings=additional_curated_mappings,
+            standardize=standardize,
+            memory_budget=memory_budget,
+            curated_paths=curated_paths,
+        )
+        return
+    if memory_budget is not None:
+        from .external import lint_predictions_external
+
+        lint_predictions_external(
+            path=path,
+            additional_curated_mappings=additional_curated_mappings,
+            standardize=standardize,
+            memory_budget=memory_budget,
+            curated_paths=curated_paths,
+        )
+        return
+
+    from .index import contains
+
+    if curated_paths is None:
+        curated_paths = [POSITIVES_SSSOM_PATH, NEGATIVES_SSSOM_PATH, UNSURE_SSSOM_PATH]
+    predictions = load_predictions(path=path, standardize=standardize)
+    curated_tuples = contains(
+        curated_paths,
+        (get_canonical_tuple(mapping) for mapping in predictions),
+        standardize=standardize,
+    )
+    curated_tuples.update(
+        get_canonical_tuple(mapping) for mapping in additional_curated_mappings or []
+    )
+    mappings = _remove_redundant(
+        mapping for mapping in predictions if get_canonical_tuple(mapping) not in curated_tuples
     )
-    mappings = _remove_redundant(mappings)
     mappings = sorted(mappings, key=mapping_sort_key)
-    write_predictions(mappings, path=path)
+    _write_predictions(mappings, path=path, prefixes=None, record_ids=None)
 
 
 def remove_mappings(
@@ -460,13 +1496,52 @@ def remove_mappings(
     return (mapping for mapping in mappings if get_canonical_tuple(mapping) not in skip_tuples)
 
 
-def _remove_redundant(mappings: Iterable[SemanticMapping]) -> Iterable[SemanticMapping]:
+def _remove_redundant(
+    mappings: Iterable[SemanticMapping], *, presorted: bool = False
+) -> Iterable[SemanticMapping]:
+    """Keep the best mapping for each canonical tuple, see :func:`_pick_best`.
+
+    :param mappings: The mappings
+    :param presorted: Are the mappings sorted by canonical tuple? If so, they're
+        deduplicated in a single streaming pass that only holds one group of mappings
+        at a time. Otherwise, they're deduplicated by grouping all of them in a
+        dictionary. Files linted by Biomappings are sorted by :func:`mapping_sort_key`,
+        which doesn't generally agree with canonical order, so only set this when the
+        mappings were explicitly sorted by :func:`biomappings.utils.get_canonical_tuple`.
+    :returns: The best mapping for each canonical tuple, in order of first appearance.
+        Ties go to the first mapping.
+    """
+    if presorted:
+        return _remove_redundant_sorted(mappings, key=get_canonical_tuple, best=_pick_best)
     dd = defaultdict(list)
     for mapping in mappings:
         dd[get_canonical_tuple(mapping)].append(mapping)
     return (max(mappings, key=_pick_best) for mappings in dd.values())
 
 
+def _remove_redundant_sorted(
+    items: Iterable[X],
+    *,
+    key: Callable[[X], tuple[str, ...]],
+    best: Callable[[X], Any],
+) -> Iterator[X]:
+    """Keep the best item in each group of consecutive items with the same canonical tuple.
+
+    :param items: Mappings, or rows that stand for them, sorted by canonical tuple
+    :param key: A function that gets the canonical tuple of an item
+    :param best: A function that assigns a value to an item, where higher is better.
+        Ties go to the first item.
+    :raises ValueError: If the items aren't sorted by canonical tuple, since a group
+        that was already emitted might have been redundant with a later item
+    """
+    previous = None
+    for canonical_tuple, group in itt.groupby(items, key=key):
+        if previous is not None and canonical_tuple < previous:
+            raise ValueError(f"mappings aren't sorted by canonical tuple at {canonical_tuple}")
+        previous = canonical_tuple
+        yield max(group, key=best)
+
+
 def _pick_best(mapping: SemanticMapping) -> int:
     """Assign a value for this mapping.
 
@@ -523,37 +1598,64 @@ def get_current_curator(*, strict: bool = True) -> NormalizedNamedReference | No
         return None
 
 
-def filter_predictions(custom_filter: Mapping[str, Mapping[str, Mapping[str, str]]]) -> None:
+def filter_predictions(
+    custom_filter: CMapping | Collection[tuple[str, str, str, str]],
+    *,
+    path: str | Path | None = None,
+) -> bool:
     """Filter all the predictions by removing what's in the custom filter then re-write.
 
-    :param custom_filter: A filter 3-dictionary of source prefix to target prefix to
-        source identifier to target identifier
+    The predictions are rewritten in a single streaming pass without parsing them, and
+    only if any are removed. Predictions are matched by canonical tuple, so a filter
+    entry removes predictions in either direction.
+
+    :param custom_filter: Canonical tuples to remove, e.g., from
+        :func:`get_curated_filter`, or a filter 3-dictionary of source prefix to target
+        prefix to source identifier to target identifier
+    :param path: The path to the predictions file or directory of shards, if not the
+        default
+
+    :returns: If the predictions were changed
     """
-    predictions = load_predictions()
-    predictions = [
-        prediction for prediction in predictions if _check_filter(prediction, custom_filter)
-    ]
-    write_predictions(predictions)
+    from .pending import lock
 
+    canonical_tuples = _get_filter_tuples(custom_filter)
+    path = Path(path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    with lock(path):
+        if path.is_dir():
+            from .shards import filter_shards
+
+            return filter_shards(path, canonical_tuples)
+        return _merge_helper([], path, t="predicted", exclude_tuples=canonical_tuples)
 
-def _check_filter(
-    prediction: SemanticMapping,
-    custom_filter: Mapping[str, Mapping[str, Mapping[str, str]]],
-) -> bool:
-    v = (
-        custom_filter.get(prediction.subject.prefix, {})
-        .get(prediction.object.prefix, {})
-        .get(prediction.subject.identifier)
-    )
-    return prediction.object.identifier != v
 
+def _get_filter_tuples(
+    custom_filter: CMapping | Collection[tuple[str, str, str, str]],
+) -> Collection[tuple[str, str, str, str]]:
+    if not isinstance(custom_filter, Mapping):
+        return custom_filter
+    return {
+        _get_raw_canonical_tuple(f"{source_prefix}:{source_id}", f"{target_prefix}:{target_id}")
+        for source_prefix, targets in custom_filter.items()
+        for target_prefix, identifiers in targets.items()
+        for source_id, target_id in identifiers.items()
+    }
 
-def get_curated_filter() -> Mapping[str, Mapping[str, Mapping[str, str]]]:
-    """Get a filter over all curated mappings."""
-    d: defaultdict[str, defaultdict[str, dict[str, str]]] = defaultdict(lambda: defaultdict(dict))
-    for m in itt.chain(load_mappings(), load_false_mappings(), load_unsure()):
-        d[m.subject.prefix][m.object.prefix][m.subject.identifier] = m.object.identifier
-    return {k: dict(v) for k, v in d.items()}
+
+def get_curated_filter() -> frozenset[tuple[str, str, str, str]]:
+    """Get the canonical tuples of all curated mappings, to pass to :func:`filter_predictions`.
+
+    The curated files are streamed without parsing their rows. This used to return a
+    filter 3-dictionary of source prefix to target prefix to source identifier to
+    target identifier, which could only hold one curated mapping per source identifier,
+    so it returns a set of canonical tuples instead. :func:`filter_predictions` still
+    accepts the old format.
+    """
+    return frozenset(
+        row.canonical_tuple
+        for path in [POSITIVES_SSSOM_PATH, NEGATIVES_SSSOM_PATH, UNSURE_SSSOM_PATH]
+        for row in _iter_raw_rows(path)
+    )
 
 
 def prediction_tuples_from_semra(
@@ -0,0 +1,177 @@
+"""An on-disk cache of parsed SSSOM TSV files.
+
+Parsing and validating a SSSOM TSV file is much slower than reading it, so when given
+``cache=True``, the :func:`biomappings.load_mappings` family of functions stores each
+parsed table as a compact, dictionary-encoded
+:class:`biomappings.resources.table.MappingTable` in the ``biomappings/cache``
+:mod:`pystow` directory. Caching is opt-in, since entries are never evicted, and each
+new path, e.g., a temporary one, adds another entry.
+
+Each entry is keyed by the path of the file and how it was loaded, and records the
+size, modification time, and SHA-256 digest of the file. If the size and modification
+time still match, the entry is used without reading the file. Otherwise, the file is
+hashed, so touching it doesn't invalidate the entry, but changing it, whether by hand
+or by :func:`biomappings.resources.write_predictions` and friends, rebuilds the entry
+on the next load.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Callable, Literal, NamedTuple
+
+import pystow
+
+from biomappings.resources import SemanticMapping
+from biomappings.resources.table import MappingTable
+
+__all__ = [
+    "CACHE_MODULE",
+    "Fingerprint",
+    "get_cache_module",
+    "get_cached_table",
+    "load_cached_table",
+    "set_cached_table",
+]
+
+logger = logging.getLogger(__name__)
+
+#: The directory in which parsed tables are cached. It's resolved by
+#: :func:`get_cache_module` on first use, so importing this module doesn't create it.
+CACHE_MODULE: pystow.Module | None = None
+
+#: Bump this to invalidate old entries when the encoding changes, or when the internals
+#: of :class:`biomappings.resources.table.MappingTable` or
+#: :class:`biomappings.resources.SemanticMapping` change
+CACHE_VERSION = 3
+
+#: How a table was loaded, since these give different results
+LoadMode = Literal["trusted", "validated", "standardized"]
+
+
+class Fingerprint(NamedTuple):
+    """Identifies the contents of a file when it was loaded."""
+
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def get_cache_module() -> pystow.Module:
+    """Get the directory in which parsed tables are cached, creating it on first use."""
+    global CACHE_MODULE
+    if CACHE_MODULE is None:
+        CACHE_MODULE = pystow.module("biomappings", "cache")
+    return CACHE_MODULE
+
+
+def load_cached_table(
+    path: Path,
+    *,
+    mode: LoadMode,
+    func: Callable[[], Sequence[SemanticMapping]],
+) -> Sequence[SemanticMapping]:
+    """Load a table from the cache, or parse it with the given function and cache it.
+
+    :param path: The path to a SSSOM TSV file
+    :param mode: How the table is loaded
+    :param func: A function that parses the table
+
+    :returns: The cached table on a hit, whose rows are only materialized when they're
+        accessed, otherwise what the function returned
+    """
+    fingerprint, table = get_cached_table(path, mode=mode)
+    if table is not None:
+        return table
+    mappings = func()
+    set_cached_table(path, mode=mode, fingerprint=fingerprint, mappings=mappings)
+    return mappings
+
+
+def get_cached_table(path: Path, *, mode: LoadMode) -> tuple[Fingerprint, MappingTable | None]:
+    """Look up a table in the cache.
+
+    :param path: The path to a SSSOM TSV file
+    :param mode: How the table is loaded
+
+    :returns: The fingerprint of the file, which should be passed to
+        :func:`set_cached_table` on a miss, and the cached table, if there is one
+    """
+    file_stat = path.stat()
+    cache_path = _get_cache_path(path, mode)
+    entry = _read(cache_path)
+    if entry is not None:
+        fingerprint = entry["fingerprint"]
+        if (fingerprint.size, fingerprint.mtime_ns) == (file_stat.st_size, file_stat.st_mtime_ns):
+            logger.debug("loading %s from cache at %s", path, cache_path)
+            return fingerprint, entry["table"]
+    fingerprint = Fingerprint(file_stat.st_size, file_stat.st_mtime_ns, _get_digest(path))
+    if entry is not None and entry["fingerprint"].digest == fingerprint.digest:
+        logger.debug("loading %s from cache at %s, which was touched", path, cache_path)
+        # record the new modification time, so the next load doesn't hash the file
+        _write(cache_path, {"fingerprint": fingerprint, "table": entry["table"]})
+        return fingerprint, entry["table"]
+    return fingerprint, None
+
+
+def set_cached_table(
+    path: Path, *, mode: LoadMode, fingerprint: Fingerprint, mappings: Sequence[SemanticMapping]
+) -> None:
+    """Store a table in the cache.
+
+    :param path: The path to a SSSOM TSV file
+    :param mode: How the table was loaded
+    :param fingerprint: The fingerprint of the file before it was parsed, from
+        :func:`get_cached_table`
+    :param mappings: The parsed mappings
+    """
+    table = mappings if isinstance(mappings, MappingTable) else MappingTable.from_mappings(mappings)
+    _write(_get_cache_path(path, mode), {"fingerprint": fingerprint, "table": table})
+
+
+def _get_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_cache_path(path: Path, mode: LoadMode) -> Path:
+    path_hash = hashlib.sha256(str(path).encode("utf8")).hexdigest()[:16]
+    return get_cache_module().join(name=f"{path.name}-{path_hash}-{mode}.pkl")
+
+
+def _read(cache_path: Path) -> dict[str, Any] | None:
+    if not cache_path.is_file():
+        return None
+    try:
+        with cache_path.open("rb") as file:
+            # this is safe since cache files are only written by this module
+            table = pickle.load(file)  # noqa:S301
+    except Exception as e:  # noqa:BLE001
+        # besides corrupt files, a changed class layout can raise all sorts of errors,
+        # like AttributeError or ModuleNotFoundError, which are all cache misses
+        logger.warning("could not read cache at %s: %s", cache_path, e)
+        return None
+    if not isinstance(table, dict) or table.get("version") != CACHE_VERSION:
+        return None
+    return table
+
+
+def _write(cache_path: Path, table: dict[str, Any]) -> None:
+    # write to a temporary file then rename, so concurrent readers never see partial output
+    fd, temporary_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump({"version": CACHE_VERSION, **table}, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except OSError as e:
+        logger.warning("could not write cache to %s: %s", cache_path, e)
+        Path(temporary_path).unlink(missing_ok=True)
@@ -0,0 +1,257 @@
+"""Lint predictions files that are bigger than memory with an external merge sort.
+
+:func:`biomappings.resources.lint_predictions` holds every prediction in memory to
+remove redundant rows and sort them. When given a ``memory_budget``, it instead uses
+:func:`lint_predictions_external`, which works in two phases that each spill sorted
+runs to temporary files then stream them back with a k-way merge:
+
+1. Predictions and the canonical tuples of the curated mappings are sorted by canonical
+   tuple. Merging the runs puts everything with the same canonical tuple next to each
+   other, so redundant predictions and ones that were already curated can be dropped
+   without a lookup table.
+2. The remaining predictions are sorted by :func:`biomappings.resources.mapping_sort_key`
+   and written to the predictions file.
+
+Runs are merged at most :data:`MAX_FAN_IN` at a time, so if there are more, they're
+first merged into longer runs in several passes, which bounds the number of open files.
+The output is the same as linting in memory.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools as itt
+import logging
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TypeVar
+
+from biomappings.resources import (
+    SemanticMapping,
+    _get_columns,
+    _get_writer,
+    _has_record_ids,
+    _iter_raw_rows,
+    _iter_table,
+    _open_atomic,
+    _pick_best,
+    _remove_redundant_sorted,
+)
+from biomappings.utils import (
+    NEGATIVES_SSSOM_PATH,
+    POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
+    UNSURE_SSSOM_PATH,
+    get_canonical_tuple,
+)
+
+__all__ = [
+    "lint_predictions_external",
+]
+
+logger = logging.getLogger(__name__)
+
+#: A rough estimate of the memory used by each buffered row, on top of its text
+ROW_OVERHEAD = 200
+
+#: Curated rows sort before all predictions with the same canonical tuple
+CURATED_RANK = 0
+
+#: The maximum number of runs that are opened and merged at once
+MAX_FAN_IN = 64
+
+K = TypeVar("K")
+
+
+def lint_predictions_external(
+    *,
+    path: str | Path | None = None,
+    additional_curated_mappings: Iterable[SemanticMapping] | None = None,
+    standardize: bool,
+    memory_budget: int,
+    curated_paths: Sequence[str | Path] | None = None,
+) -> None:
+    """Lint the predictions file without holding it in memory.
+
+    :param path: The path to the predicted mappings
+    :param additional_curated_mappings: A list of additional mappings
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param memory_budget: The approximate number of bytes of rows to buffer before
+        spilling a sorted run to a temporary file
+    :param curated_paths: Custom paths to the curated mappings files
+    """
+    path = Path(path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    header, to_row = _get_columns("predicted", record_ids=_has_record_ids(path))
+    if curated_paths is None:
+        curated_paths = [POSITIVES_SSSOM_PATH, NEGATIVES_SSSOM_PATH, UNSURE_SSSOM_PATH]
+
+    with tempfile.TemporaryDirectory(dir=path.parent, prefix=f".{path.name}.") as directory:
+        run_directory = Path(directory)
+
+        # phase 1: sort curated tuples and predictions by canonical tuple, then keep
+        # the best prediction for each canonical tuple that's not curated
+        canonical_rows = itt.chain(
+            (
+                (*canonical_tuple, str(CURATED_RANK), "0")
+                for canonical_tuple in _iter_curated_tuples(
+                    curated_paths, additional_curated_mappings, standardize=standardize
+                )
+            ),
+            (
+                (
+                    *get_canonical_tuple(mapping),
+                    # rows picked by _pick_best() come first, then the earliest in the file
+                    str(2 - _pick_best(mapping)),
+                    str(position),
+                    *to_row(mapping),
+                )
+                for position, mapping in enumerate(_iter_table(path, standardize=standardize))
+            ),
+        )
+        canonical_runs = _spill(
+            canonical_rows, run_directory, "canonical", memory_budget, key=_get_canonical_key
+        )
+
+        # phase 2: sort the remaining predictions by mapping_sort_key()
+        sort_rows = (
+            (*_get_raw_sort_key(values), *values)
+            for values in _iter_best_values(_merge(canonical_runs, key=_get_canonical_key))
+        )
+        sort_runs = _spill(sort_rows, run_directory, "sort", memory_budget, key=_get_sort_key)
+
+        with _open_atomic(path) as file:
+            writer = _get_writer(file)
+            writer.writerow(header)
+            writer.writerows(row[5:] for row in _merge(sort_runs, key=_get_sort_key))
+
+    from .index import invalidate_index
+
+    invalidate_index(path)
+
+
+def _iter_curated_tuples(
+    paths: Iterable[str | Path],
+    additional_curated_mappings: Iterable[SemanticMapping] | None,
+    *,
+    standardize: bool,
+) -> Iterable[tuple[str, str, str, str]]:
+    for curated_path in paths:
+        curated_path = Path(curated_path).expanduser().resolve()
+        if standardize:
+            for mapping in _iter_table(curated_path, standardize=True):
+                yield get_canonical_tuple(mapping)
+        else:
+            for row in _iter_raw_rows(curated_path):
+                yield row.canonical_tuple
+    for mapping in additional_curated_mappings or []:
+        yield get_canonical_tuple(mapping)
+
+
+def _iter_best_values(rows: Iterable[tuple[str, ...]]) -> Iterable[tuple[str, ...]]:
+    """Get the values of the first row for each canonical tuple, unless it's curated.
+
+    The rows are sorted by canonical tuple, so only one group of rows is held at a time.
+    """
+    for best in _remove_redundant_sorted(rows, key=_get_row_canonical_tuple, best=_get_priority):
+        if int(best[4]) != CURATED_RANK:
+            yield best[6:]
+
+
+def _get_row_canonical_tuple(row: Sequence[str]) -> tuple[str, ...]:
+    return tuple(row[:4])
+
+
+def _get_priority(row: Sequence[str]) -> tuple[int, int]:
+    """Get a value that's highest for the first row of a group, i.e., curated or best."""
+    return -int(row[4]), -int(row[5])
+
+
+def _get_canonical_key(row: Sequence[str]) -> tuple[str, str, str, str, int, int]:
+    return row[0], row[1], row[2], row[3], int(row[4]), int(row[5])
+
+
+def _get_sort_key(row: Sequence[str]) -> tuple[str, ...]:
+    return tuple(row[:5])
+
+
+def _get_raw_sort_key(values: Sequence[str]) -> tuple[str, ...]:
+    """Get the same sort key as :func:`mapping_sort_key` from the values of a predicted row."""
+    subject_id, predicate_id, object_id = values[0], values[2], values[3]
+    mapping_justification, mapping_tool = values[5], values[7]
+    return subject_id, predicate_id, object_id, mapping_justification, mapping_tool
+
+
+def _spill(
+    rows: Iterable[tuple[str, ...]],
+    directory: Path,
+    name: str,
+    memory_budget: int,
+    *,
+    key: Callable[[Sequence[str]], K],
+) -> list[Path]:
+    """Write the rows to sorted runs, each holding about the given number of bytes."""
+    paths = []
+    buffer: list[tuple[str, ...]] = []
+    size = 0
+    for row in rows:
+        buffer.append(row)
+        size += sum(map(len, row)) + ROW_OVERHEAD
+        if size >= memory_budget:
+            paths.append(_write_run(buffer, directory, f"{name}-{len(paths)}", key=key))
+            buffer, size = [], 0
+    if buffer or not paths:
+        paths.append(_write_run(buffer, directory, f"{name}-{len(paths)}", key=key))
+    logger.debug("spilled %d %s runs to %s", len(paths), name, directory)
+    return paths
+
+
+def _write_run(
+    rows: list[tuple[str, ...]],
+    directory: Path,
+    name: str,
+    *,
+    key: Callable[[Sequence[str]], K],
+) -> Path:
+    rows.sort(key=key)  # type:ignore[arg-type]
+    path = directory.joinpath(f"{name}.tsv")
+    with path.open("w") as file:
+        _get_writer(file).writerows(rows)
+    return path
+
+
+def _merge(paths: list[Path], *, key: Callable[[Sequence[str]], K]) -> Iterator[tuple[str, ...]]:
+    """Merge sorted runs, merging at most :data:`MAX_FAN_IN` runs at a time.
+
+    While there are too many runs, each group of :data:`MAX_FAN_IN` runs is merged into
+    a new run that replaces them, so this takes a logarithmic number of passes.
+    """
+    while len(paths) > MAX_FAN_IN:
+        merged = []
+        for i in range(0, len(paths), MAX_FAN_IN):
+            group = paths[i : i + MAX_FAN_IN]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = group[0].with_name(f"{group[0].stem}-merged.tsv")
+            with path.open("w") as file:
+                _get_writer(file).writerows(_merge_runs(group, key=key))
+            for run_path in group:
+                run_path.unlink()
+            merged.append(path)
+        logger.debug("merged %d runs into %d", len(paths), len(merged))
+        paths = merged
+    yield from _merge_runs(paths, key=key)
+
+
+def _merge_runs(
+    paths: Iterable[Path], *, key: Callable[[Sequence[str]], K]
+) -> Iterator[tuple[str, ...]]:
+    """Merge sorted runs in a single pass, keeping all of them open."""
+    with ExitStack() as stack:
+        files = [stack.enter_context(path.open()) for path in paths]
+        yield from heapq.merge(
+            *((tuple(line.rstrip("\n").split("\t")) for line in file) for file in files),
+            key=key,  # type:ignore[arg-type]
+        )
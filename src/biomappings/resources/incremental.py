@@ -0,0 +1,191 @@
+"""Lint only the rows of the Biomappings resources that changed since the last commit.
+
+When a curator changes a handful of rows, linting everything with
+:func:`biomappings.resources.lint.lint_all` means parsing and standardizing every row
+of every file. Since the committed files are already linted, it's enough to:
+
+1. Find the rows that were added or modified relative to a git revision with
+   :func:`get_changed_rows`
+2. Parse and standardize only those rows
+3. Splice them back into their sorted positions in a streaming pass over the rest of
+   the file, which isn't parsed, dropping rows whose canonical tuples are redundant
+4. Drop predictions whose canonical tuples are now curated, and new predictions that
+   were already curated, using the canonical index in
+   :mod:`biomappings.resources.index`
+
+If a file can't be diffed, e.g., because it's not tracked by git, it's compressed, or
+its header changed, everything is linted with
+:func:`biomappings.resources.lint.lint_all` instead.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import re
+import subprocess
+from collections.abc import Sequence
+from pathlib import Path
+
+from biomappings.resources import (
+    SemanticMapping,
+    _get_compression,
+    _iter_records,
+    _merge_helper,
+    _read_raw_header,
+)
+from biomappings.resources.pending import lock
+from biomappings.utils import (
+    NEGATIVES_SSSOM_PATH,
+    POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
+    UNSURE_SSSOM_PATH,
+    get_canonical_tuple,
+)
+
+__all__ = [
+    "get_changed_rows",
+    "lint_changed",
+    "load_changed",
+]
+
+logger = logging.getLogger(__name__)
+
+HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+def get_changed_rows(path: str | Path, *, rev: str = "HEAD") -> list[tuple[int, str]] | None:
+    """Get the rows of a file that were added or modified since a git revision.
+
+    :param path: The path to a SSSOM TSV file
+    :param rev: The git revision to compare the working tree to
+    :returns: Pairs of line numbers, starting at 1 for the header, and lines, or None
+        if the file can't be diffed. This is the case if it doesn't exist, isn't tracked
+        by git, is compressed, or if its header changed.
+    """
+    path = Path(path).expanduser().resolve()
+    if not path.is_file() or _get_compression(path) is not None:
+        return None
+    tracked = _git(path.parent, "ls-files", "--error-unmatch", "--", path.name)
+    if tracked is None:
+        return None
+    diff = _git(
+        path.parent, "diff", "--no-color", "--no-ext-diff", "--unified=0", rev, "--", path.name
+    )
+    if diff is None:
+        return None
+
+    rv = []
+    line_number = 0
+    for line in diff.splitlines():
+        if match := HUNK_RE.match(line):
+            line_number = int(match.group(1))
+        elif line.startswith("+") and not line.startswith("+++"):
+            if line_number == 1:
+                return None
+            rv.append((line_number, line[1:] + "\n"))
+            line_number += 1
+    return rv
+
+
+def _git(directory: Path, *args: str) -> str | None:
+    result = subprocess.run(  # noqa:S603
+        ["git", *args],  # noqa:S607
+        cwd=directory,
+        capture_output=True,
+        encoding="utf-8",
+        check=False,
+    )
+    if result.returncode != 0:
+        logger.debug("git %s failed in %s: %s", " ".join(args), directory, result.stderr)
+        return None
+    return result.stdout
+
+
+def load_changed(
+    path: str | Path,
+    rows: Sequence[tuple[int, str]],
+    *,
+    standardize: bool = False,
+) -> list[SemanticMapping]:
+    """Parse the given rows of a SSSOM TSV file, e.g., from :func:`get_changed_rows`."""
+    path = Path(path).expanduser().resolve()
+    records = csv.DictReader(
+        (line for _, line in rows), fieldnames=_read_raw_header(path), delimiter="\t"
+    )
+    return list(_iter_records(records, standardize=standardize, trusted=False))
+
+
+def lint_changed(
+    *,
+    standardize: bool = True,
+    rev: str = "HEAD",
+    positives_path: str | Path | None = None,
+    negatives_path: str | Path | None = None,
+    unsure_path: str | Path | None = None,
+    predictions_path: str | Path | None = None,
+) -> list[Path]:
+    """Lint the rows that changed since a git revision, assuming the rest are linted.
+
+    :param standardize: Should the changed references be standardized against the
+        Bioregistry?
+    :param rev: The git revision whose files are already linted
+    :param positives_path: A custom path to the positive mappings
+    :param negatives_path: A custom path to the negative mappings
+    :param unsure_path: A custom path to the unsure mappings
+    :param predictions_path: A custom path to the predicted mappings
+
+    :returns: The paths of the files that were changed
+    """
+    curated_paths = [
+        Path(path or default).expanduser().resolve()
+        for path, default in [
+            (positives_path, POSITIVES_SSSOM_PATH),
+            (negatives_path, NEGATIVES_SSSOM_PATH),
+            (unsure_path, UNSURE_SSSOM_PATH),
+        ]
+    ]
+    predictions_path = Path(predictions_path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    # the predictions can't be appended to between diffing and merging
+    with lock(predictions_path):
+        changes = [get_changed_rows(path, rev=rev) for path in [*curated_paths, predictions_path]]
+        if any(rows is None for rows in changes):
+            from .lint import lint_all
+
+            logger.info("can't diff all resources against %s, so linting everything", rev)
+            return lint_all(
+                standardize=standardize,
+                positives_path=curated_paths[0],
+                negatives_path=curated_paths[1],
+                unsure_path=curated_paths[2],
+                predictions_path=predictions_path,
+            )
+
+        changed = []
+        curated_tuples: set[tuple[str, str, str, str]] = set()
+        for path, rows in zip(curated_paths, changes):
+            if not rows:
+                continue
+            mappings = load_changed(path, rows, standardize=standardize)
+            curated_tuples.update(get_canonical_tuple(mapping) for mapping in mappings)
+            if _merge_helper(mappings, path, exclude_lines={line for _, line in rows}):
+                changed.append(path)
+
+        rows = changes[-1] or []
+        predictions = load_changed(predictions_path, rows, standardize=standardize)
+        if predictions or curated_tuples:
+            from .index import contains
+
+            # new predictions might have already been curated before the changes
+            curated_tuples.update(
+                contains(curated_paths, (get_canonical_tuple(mapping) for mapping in predictions))
+            )
+            if _merge_helper(
+                predictions,
+                predictions_path,
+                t="predicted",
+                exclude_lines={line for _, line in rows},
+                exclude_tuples=curated_tuples,
+            ):
+                changed.append(predictions_path)
+        return changed
@@ -0,0 +1,240 @@
+"""A persistent index of the canonical tuples in each SSSOM TSV file.
+
+Deduplicating new predictions against the curated and predicted mappings only needs
+to know which canonical tuples (see :func:`biomappings.utils.get_canonical_tuple`)
+already appear in each file. Rather than loading every file on every call to
+:func:`biomappings.resources.append_predictions`, this module keeps a 64-bit hash of
+each file's canonical tuples in a SQLite database in the ``biomappings/cache``
+:mod:`pystow` directory.
+
+Each file is indexed in two modes, since standardizing references can change their
+canonical tuples. The ``raw`` mode uses the references exactly as written in the file
+and is updated incrementally when mappings are appended, e.g., by
+:func:`biomappings.resources.append_predictions`. When a file is rewritten, e.g., by
+:func:`biomappings.resources.write_predictions`, its entries are dropped and rebuilt
+on the next call to :func:`contains`, so writing doesn't pay for inserting every
+canonical tuple again. The ``standardized`` mode is always rebuilt lazily. An entry is considered stale
+when the size or modification time of its file changes, e.g., when it's edited by
+hand or checked out by git.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+
+from typing_extensions import Literal
+
+from biomappings.resources import SemanticMapping, _iter_raw_rows, _load_table
+from biomappings.resources.cache import get_cache_module
+from biomappings.utils import get_canonical_tuple
+
+__all__ = [
+    "INDEX_PATH",
+    "contains",
+    "get_index_path",
+    "hash_canonical_tuple",
+    "invalidate_index",
+    "update_index",
+]
+
+logger = logging.getLogger(__name__)
+
+#: The path to the SQLite database, resolved by :func:`get_index_path` on first use
+INDEX_PATH: Path | None = None
+
+#: How the canonical tuples in a file are calculated
+IndexMode = Literal["raw", "standardized"]
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS file (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    UNIQUE (path, mode)
+);
+CREATE TABLE IF NOT EXISTS canonical (
+    file_id INTEGER NOT NULL REFERENCES file (id) ON DELETE CASCADE,
+    key INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS canonical_key ON canonical (key, file_id);
+"""
+
+
+def hash_canonical_tuple(canonical_tuple: Sequence[str]) -> int:
+    """Get a signed 64-bit hash of a canonical tuple, which fits in a SQLite integer."""
+    digest = hashlib.blake2b("\t".join(canonical_tuple).encode("utf8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def contains(
+    paths: Iterable[str | Path],
+    canonical_tuples: Iterable[Sequence[str]],
+    *,
+    standardize: bool = False,
+) -> set[tuple[str, ...]]:
+    """Get the canonical tuples that appear in any of the given files.
+
+    :param paths: The paths to SSSOM TSV files. Stale or missing entries in the index
+        are rebuilt first.
+    :param canonical_tuples: The canonical tuples to look up
+    :param standardize: Should the canonical tuples in the files be calculated after
+        standardizing references?
+
+    :returns: The subset of the given canonical tuples that appear in any of the files
+    """
+    keys: dict[int, tuple[str, ...]] = {
+        hash_canonical_tuple(canonical_tuple): tuple(canonical_tuple)
+        for canonical_tuple in canonical_tuples
+    }
+    mode: IndexMode = "standardized" if standardize else "raw"
+    with _connect() as connection:
+        file_ids = [
+            file_id
+            for path in paths
+            if (file_id := _ensure(connection, Path(path).expanduser().resolve(), mode)) is not None
+        ]
+        if not keys or not file_ids:
+            return set()
+        connection.execute("CREATE TEMPORARY TABLE query (key INTEGER PRIMARY KEY)")
+        connection.executemany("INSERT INTO query VALUES (?)", ((key,) for key in keys))
+        cursor = connection.execute(
+            f"""\
+            SELECT DISTINCT query.key FROM query
+            JOIN canonical ON canonical.key = query.key
+            WHERE canonical.file_id IN ({", ".join("?" * len(file_ids))})
+            """,  # noqa:S608
+            file_ids,
+        )
+        return {keys[key] for (key,) in cursor}
+
+
+def update_index(
+    path: str | Path,
+    mappings: Sequence[SemanticMapping],
+    *,
+    stat_before: tuple[int, int] | None,
+) -> None:
+    """Update the index after mappings have been added to a file.
+
+    Files that are rewritten should be passed to :func:`invalidate_index` instead.
+
+    :param path: The path to the SSSOM TSV file that was written
+    :param mappings: The mappings that were added
+    :param stat_before: The size and modification time of the file before it was
+        written. If this doesn't match the index, the index is already stale and the
+        file will be re-indexed on its next use.
+    """
+    path = Path(path).expanduser().resolve()
+    try:
+        with _connect() as connection:
+            connection.execute(
+                "DELETE FROM file WHERE path = ? AND mode = 'standardized'", (str(path),)
+            )
+            row = connection.execute(
+                "SELECT id, size, mtime_ns FROM file WHERE path = ? AND mode = 'raw'",
+                (str(path),),
+            ).fetchone()
+            if row is None:
+                return
+            if tuple(row[1:]) != stat_before:
+                connection.execute("DELETE FROM file WHERE id = ?", (row[0],))
+                return
+            _insert_keys(connection, row[0], (get_canonical_tuple(m) for m in mappings))
+            connection.execute(
+                "UPDATE file SET size = ?, mtime_ns = ? WHERE id = ?", (*_stat(path), row[0])
+            )
+    except sqlite3.Error as e:
+        logger.warning("could not update canonical index at %s: %s", get_index_path(), e)
+
+
+def invalidate_index(path: str | Path) -> None:
+    """Remove a file from the index, e.g., after it's rewritten without its mappings in memory.
+
+    :param path: The path to a SSSOM TSV file. It will be re-indexed on its next use.
+    """
+    path = Path(path).expanduser().resolve()
+    try:
+        with _connect() as connection:
+            connection.execute("DELETE FROM file WHERE path = ?", (str(path),))
+    except sqlite3.Error as e:
+        logger.warning("could not update canonical index at %s: %s", get_index_path(), e)
+
+
+def get_index_path() -> Path:
+    """Get the path to the SQLite database, creating the cache directory on first use."""
+    global INDEX_PATH
+    if INDEX_PATH is None:
+        INDEX_PATH = get_cache_module().join(name="canonical_index.sqlite")
+    return INDEX_PATH
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Connect to the index, committing on success and rolling back on failure."""
+    connection = sqlite3.connect(get_index_path(), timeout=60)
+    try:
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _stat(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _ensure(connection: sqlite3.Connection, path: Path, mode: IndexMode) -> int | None:
+    """Get the ID for the file, indexing it first if needed."""
+    if not path.is_file():
+        return None
+    row = connection.execute(
+        "SELECT id, size, mtime_ns FROM file WHERE path = ? AND mode = ?", (str(path), mode)
+    ).fetchone()
+    if row is not None and tuple(row[1:]) == _stat(path):
+        return int(row[0])
+    if row is not None:
+        connection.execute("DELETE FROM file WHERE id = ?", (row[0],))
+
+    logger.info("indexing canonical tuples in %s (%s)", path, mode)
+    stat = _stat(path)
+    if mode == "raw":
+        canonical_tuples = (row.canonical_tuple for row in _iter_raw_rows(path))
+    else:
+        canonical_tuples = (
+            get_canonical_tuple(mapping) for mapping in _load_table(path, standardize=True)
+        )
+    file_id = _insert_file(connection, path, mode, stat)
+    _insert_keys(connection, file_id, canonical_tuples)
+    return file_id
+
+
+def _insert_file(
+    connection: sqlite3.Connection,
+    path: Path,
+    mode: IndexMode,
+    stat: tuple[int, int] = (-1, -1),
+) -> int:
+    cursor = connection.execute(
+        "INSERT INTO file (path, mode, size, mtime_ns) VALUES (?, ?, ?, ?)",
+        (str(path), mode, *stat),
+    )
+    return int(cursor.lastrowid)  # type:ignore[arg-type]
+
+
+def _insert_keys(
+    connection: sqlite3.Connection, file_id: int, canonical_tuples: Iterable[Sequence[str]]
+) -> None:
+    connection.executemany(
+        "INSERT INTO canonical (file_id, key) VALUES (?, ?)",
+        ((file_id, hash_canonical_tuple(canonical_tuple)) for canonical_tuple in canonical_tuples),
+    )
@@ -0,0 +1,220 @@
+"""Lint all of the Biomappings resources at once.
+
+Linting each file on its own, like :func:`biomappings.resources.lint_true_mappings` and
+friends, parses the curated files twice, since
+:func:`biomappings.resources.lint_predictions` needs their canonical tuples to remove
+predictions that were already curated. :func:`lint_all` instead parses each file once
+with :func:`biomappings.resources.parallel.load_all`, builds the set of curated
+canonical tuples from the linted curated mappings, then writes the files one after
+another. Each file is compared to its linted contents a chunk at a time, so files whose
+contents wouldn't change aren't rewritten, and in check mode, none are.
+
+.. code-block:: python
+
+    from biomappings.resources.lint import lint_all
+
+    changed = lint_all(check=True)
+"""
+
+from __future__ import annotations
+
+import io
+import itertools as itt
+import logging
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+
+from typing_extensions import Literal
+
+from biomappings.resources import (
+    SemanticMapping,
+    _get_columns,
+    _get_writer,
+    _has_record_ids,
+    _lint_predictions,
+    _open_atomic,
+    _open_table,
+    _recover_journal,
+    _remove_redundant,
+    load_false_mappings,
+    load_mappings,
+    load_unsure,
+    mapping_sort_key,
+)
+from biomappings.resources.parallel import load_all
+from biomappings.resources.pending import lock
+from biomappings.utils import (
+    NEGATIVES_SSSOM_PATH,
+    POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
+    UNSURE_SSSOM_PATH,
+    get_canonical_tuple,
+)
+
+__all__ = [
+    "lint_all",
+]
+
+logger = logging.getLogger(__name__)
+
+#: The number of rows that are rendered at a time when comparing a file to its linted
+#: contents
+CHUNK_ROWS = 10_000
+
+
+def lint_all(
+    *,
+    standardize: bool = True,
+    check: bool = False,
+    memory_budget: int | None = None,
+    max_workers: int | None = None,
+    positives_path: str | Path | None = None,
+    negatives_path: str | Path | None = None,
+    unsure_path: str | Path | None = None,
+    predictions_path: str | Path | None = None,
+) -> list[Path]:
+    """Lint the positive, negative, unsure, and predicted mappings.
+
+    This gives the same results as linting each file in turn, the same way as
+    ``biomappings lint`` used to.
+
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param check: If true, don't write anything, only report which files would change
+    :param memory_budget: If given, lint the predictions out-of-core after the curated
+        files. See :func:`biomappings.resources.lint_predictions`.
+    :param max_workers: The number of workers for parsing. See
+        :func:`biomappings.resources.parallel.load_all`.
+    :param positives_path: A custom path to the positive mappings
+    :param negatives_path: A custom path to the negative mappings
+    :param unsure_path: A custom path to the unsure mappings
+    :param predictions_path: A custom path to the predicted mappings, or to a directory
+        of shards
+
+    :returns: The paths of the files that were changed, or would be in check mode.
+        Predictions that are linted in place are always rewritten.
+
+    :raises ValueError: If checking predictions that are linted out-of-core or stored
+        in shards, which are only linted in place
+    """
+    curated_paths = [
+        Path(path or default).expanduser().resolve()
+        for path, default in [
+            (positives_path, POSITIVES_SSSOM_PATH),
+            (negatives_path, NEGATIVES_SSSOM_PATH),
+            (unsure_path, UNSURE_SSSOM_PATH),
+        ]
+    ]
+    predictions_path = Path(predictions_path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    in_place = memory_budget is not None or predictions_path.is_dir()
+    if check and in_place:
+        raise ValueError("can't check predictions that are linted out-of-core or in shards")
+
+    # the predictions are read and rewritten under one exclusive lock, so they can't change
+    # in between. Checking doesn't write anything, so a shared lock is enough
+    with lock(predictions_path, shared=check):
+        if in_place:
+            loaders = [load_mappings, load_false_mappings, load_unsure]
+            curated = [
+                loader(path=path, standardize=standardize)
+                for loader, path in zip(loaders, curated_paths)
+            ]
+            predictions = None
+        else:
+            *curated, predictions = load_all(
+                standardize=standardize,
+                max_workers=max_workers,
+                positives_path=curated_paths[0],
+                negatives_path=curated_paths[1],
+                unsure_path=curated_paths[2],
+                predictions_path=predictions_path,
+            )
+
+        jobs: list[tuple[Path, Iterable[SemanticMapping], Literal["curated", "predicted"]]] = [
+            (path, _remove_redundant(mappings), "curated")
+            for path, mappings in zip(curated_paths, curated)
+        ]
+        if predictions is not None:
+            curated_tuples = {
+                get_canonical_tuple(mapping) for mappings in curated for mapping in mappings
+            }
+            jobs.append(
+                (
+                    predictions_path,
+                    _remove_redundant(
+                        mapping
+                        for mapping in predictions
+                        if get_canonical_tuple(mapping) not in curated_tuples
+                    ),
+                    "predicted",
+                )
+            )
+
+        # rendering rows is CPU-bound, so writing files in threads wouldn't be any faster
+        changed = [path for path, mappings, t in jobs if _lint_file(path, mappings, t, check=check)]
+
+        if predictions is None:
+            # the curated files were already parsed, so they're not looked up again
+            _lint_predictions(
+                path=predictions_path,
+                additional_curated_mappings=itt.chain.from_iterable(curated),
+                standardize=standardize,
+                memory_budget=memory_budget,
+                curated_paths=[],
+            )
+            changed.append(predictions_path)
+    return changed
+
+
+def _lint_file(
+    path: Path,
+    mappings: Iterable[SemanticMapping],
+    t: Literal["curated", "predicted"],
+    *,
+    check: bool,
+) -> bool:
+    """Write the mappings to the file if it would change, and return if it would."""
+    mappings = sorted(set(mappings), key=mapping_sort_key)
+    _recover_journal(path)
+    record_ids = _has_record_ids(path)
+    if path.is_file() and _is_rendered(path, _iter_chunks(mappings, t, record_ids=record_ids)):
+        return False
+    if check:
+        logger.info("%s would be changed by linting", path)
+        return True
+
+    with _open_atomic(path) as file:
+        for chunk in _iter_chunks(mappings, t, record_ids=record_ids):
+            file.write(chunk)
+
+    from .index import invalidate_index
+
+    invalidate_index(path)
+    return True
+
+
+def _iter_chunks(
+    mappings: Sequence[SemanticMapping], t: Literal["curated", "predicted"], *, record_ids: bool
+) -> Iterator[str]:
+    """Render the contents of a SSSOM TSV file with the given mappings, a chunk at a time."""
+    header, to_row = _get_columns(t, record_ids=record_ids)
+    buffer = io.StringIO()
+    writer = _get_writer(buffer)
+    writer.writerow(header)
+    rows = map(to_row, mappings)
+    while True:
+        writer.writerows(itt.islice(rows, CHUNK_ROWS))
+        chunk = buffer.getvalue()
+        if not chunk:
+            return
+        yield chunk
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _is_rendered(path: Path, chunks: Iterable[str]) -> bool:
+    """Check if a file has the given contents, reading it a chunk at a time."""
+    with _open_table(path) as file:
+        for chunk in chunks:
+            if file.read(len(chunk)) != chunk:
+                return False
+        return not file.read(1)
@@ -0,0 +1,219 @@
+"""Load all of the Biomappings resources at once, in parallel.
+
+Parsing SSSOM TSV files is CPU-bound, so :func:`load_all` parses the positive,
+negative, unsure, and predicted mappings in a pool of worker processes rather than one
+after another. Big files, like the predictions, are split into byte ranges at line
+boundaries so they're spread over several workers. Workers send back a
+:class:`biomappings.resources.table.MappingTable` rather than a list of
+:class:`biomappings.SemanticMapping`, since it's much faster to pickle.
+
+.. code-block:: python
+
+    from biomappings.resources.parallel import load_all
+
+    mappings, false_mappings, unsure, predictions = load_all()
+"""
+
+from __future__ import annotations
+
+import csv
+import heapq
+import io
+import os
+from collections.abc import Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from typing_extensions import Literal
+
+from biomappings.resources import (
+    SemanticMapping,
+    _get_compression,
+    _get_load_mode,
+    _iter_records,
+    _iter_table,
+    mapping_sort_key,
+)
+from biomappings.resources.cache import Fingerprint, get_cached_table, set_cached_table
+from biomappings.resources.shards import get_shard_paths
+from biomappings.resources.table import MappingTable
+from biomappings.utils import (
+    NEGATIVES_SSSOM_PATH,
+    POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
+    UNSURE_SSSOM_PATH,
+)
+
+__all__ = [
+    "Resources",
+    "load_all",
+]
+
+#: Files are only split into chunks of at least this many bytes
+MIN_CHUNK_SIZE = 1 << 23
+
+
+class Resources(NamedTuple):
+    """All of the Biomappings resources."""
+
+    mappings: list[SemanticMapping]
+    false_mappings: list[SemanticMapping]
+    unsure: list[SemanticMapping]
+    predictions: list[SemanticMapping]
+
+
+def load_all(
+    *,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
+    executor: Literal["process", "thread"] = "process",
+    max_workers: int | None = None,
+    positives_path: str | Path | None = None,
+    negatives_path: str | Path | None = None,
+    unsure_path: str | Path | None = None,
+    predictions_path: str | Path | None = None,
+) -> Resources:
+    """Load the positive, negative, unsure, and predicted mappings in parallel.
+
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param trusted: Should validation be skipped? See
+        :func:`biomappings.load_mappings`.
+    :param cache: Should parsed tables be read from and written to the on-disk cache?
+        Files whose parsed tables are already cached aren't sent to workers.
+    :param executor: Whether to parse in worker processes, which scales with the number
+        of cores, or in threads, which avoids the cost of starting processes but is
+        limited by the GIL.
+    :param max_workers: The number of workers. Defaults to the number of cores.
+    :param positives_path: A custom path to the positive mappings
+    :param negatives_path: A custom path to the negative mappings
+    :param unsure_path: A custom path to the unsure mappings
+    :param predictions_path: A custom path to the predicted mappings, or to a directory
+        of shards. See :mod:`biomappings.resources.shards`.
+
+    :returns: The mappings from each file, in the same order as if they were loaded
+        with :func:`biomappings.load_mappings` and friends
+    """
+    paths = [
+        Path(path or default).expanduser().resolve()
+        for path, default in [
+            (positives_path, POSITIVES_SSSOM_PATH),
+            (negatives_path, NEGATIVES_SSSOM_PATH),
+            (unsure_path, UNSURE_SSSOM_PATH),
+            (predictions_path, PREDICTIONS_SSSOM_PATH),
+        ]
+    ]
+    # a directory of shards is loaded like one file per shard, then merged
+    files = [
+        (i, file_path)
+        for i, path in enumerate(paths)
+        for file_path in (get_shard_paths(path) if path.is_dir() else [path])
+    ]
+    mode = _get_load_mode(standardize=standardize, trusted=trusted)
+    results: list[Sequence[SemanticMapping] | None] = [None] * len(files)
+    fingerprints: list[Fingerprint | None] = [None] * len(files)
+    if cache:
+        for j, (_, path) in enumerate(files):
+            fingerprints[j], results[j] = get_cached_table(path, mode=mode)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if executor not in {"process", "thread"}:
+            raise ValueError(f"unknown executor: {executor}")
+        # with a single worker, starting a process and pickling results is pure overhead
+        use_processes = executor == "process" and max_workers > 1
+        pool: Executor
+        if use_processes:
+            pool = ProcessPoolExecutor(max_workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers)
+        with pool:
+            futures: dict[int, list[Future[Sequence[SemanticMapping]]]] = {
+                j: [
+                    pool.submit(
+                        _parse_chunk,
+                        files[j][1],
+                        start,
+                        end,
+                        standardize=standardize,
+                        trusted=trusted,
+                        as_table=use_processes,
+                    )
+                    for start, end in _get_chunks(files[j][1], max_workers)
+                ]
+                for j in missing
+            }
+            for j, chunk_futures in futures.items():
+                results[j] = [mapping for future in chunk_futures for mapping in future.result()]
+                if cache:
+                    set_cached_table(
+                        files[j][1],
+                        mode=mode,
+                        fingerprint=fingerprints[j],  # type:ignore[arg-type]
+                        mappings=results[j],  # type:ignore[arg-type]
+                    )
+
+    tables: list[list[Sequence[SemanticMapping]]] = [[] for _ in paths]
+    for (i, _), result in zip(files, results):
+        tables[i].append(result)  # type:ignore[arg-type]
+    return Resources(
+        *(
+            list(heapq.merge(*path_tables, key=mapping_sort_key))
+            if path.is_dir()
+            else list(path_tables[0])
+            for path, path_tables in zip(paths, tables)
+        )
+    )
+
+
+def _get_chunks(path: Path, n: int) -> list[tuple[int, int | None]]:
+    """Split the rows of a file into at most the given number of byte ranges.
+
+    Each range starts at the beginning of a line and ends after a newline (or at the
+    end of the file), so no line is split across chunks. Compressed files can't be
+    split, so they're parsed in a single chunk whose end is None.
+    """
+    if _get_compression(path) is not None:
+        return [(0, None)]
+    size = path.stat().st_size
+    with path.open("rb") as file:
+        file.readline()
+        start = file.tell()
+        n = max(1, min(n, (size - start) // MIN_CHUNK_SIZE))
+        boundaries = [start]
+        for k in range(1, n):
+            file.seek(start + k * (size - start) // n)
+            file.readline()
+            position = file.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_chunk(
+    path: Path,
+    start: int,
+    end: int | None,
+    *,
+    standardize: bool,
+    trusted: bool,
+    as_table: bool,
+) -> Sequence[SemanticMapping]:
+    """Parse the rows in a byte range of a SSSOM TSV file, or all of them if end is None."""
+    if end is None:
+        mappings = list(_iter_table(path, standardize=standardize, trusted=trusted))
+    else:
+        with path.open("rb") as file:
+            header = file.readline().decode("utf8").rstrip("\r\n")
+            file.seek(start)
+            text = file.read(end - start).decode("utf8")
+        fieldnames = next(csv.reader([header], delimiter="\t"))
+        records = csv.DictReader(io.StringIO(text), fieldnames=fieldnames, delimiter="\t")
+        mappings = list(_iter_records(records, standardize=standardize, trusted=trusted))
+    if as_table:
+        return MappingTable.from_mappings(mappings)
+    return mappings
@@ -0,0 +1,208 @@
+"""Stage predictions from concurrent jobs, then merge them into the predictions in one step.
+
+Scripts like ``scripts/generate_agrovoc_mappings.py`` append to the predictions with
+:func:`biomappings.resources.append_prediction_tuples`, which rewrites the whole file
+while linting it. When several of them run in parallel, each one has to wait for the
+others to finish linting. Instead, each job can drop its predictions as an immutable
+batch file in a directory next to the predictions, e.g.,
+``predictions.sssom.tsv.pending/``, by passing ``pending=True``. The batches are then
+merged into the predictions with a single append and lint by
+:func:`compact_predictions`, or by running ``biomappings compact``.
+
+.. code-block:: python
+
+    from biomappings.resources import append_prediction_tuples
+    from biomappings.resources.pending import compact_predictions
+
+    # in each job
+    append_prediction_tuples(predictions, pending=True)
+
+    # once they're all done
+    compact_predictions()
+
+Writers take a shared advisory lock on a file next to the predictions, e.g.,
+``predictions.sssom.tsv.lock``, while adding a batch. Everything that rewrites the
+predictions takes an exclusive one, so batches are never half-written
+or merged twice, and two rewrites never interleave. This covers compacting,
+:func:`biomappings.resources.append_predictions`,
+:func:`biomappings.resources.write_predictions`,
+:func:`biomappings.resources.lint_predictions`,
+:func:`biomappings.resources.filter_predictions`,
+:func:`biomappings.resources.incremental.lint_changed`, and
+:func:`biomappings.resources.lint.lint_all`. The functions in
+:mod:`biomappings.resources.shards` assume that their caller already holds the lock.
+Locks are per thread and re-entrant, i.e., a thread holding the exclusive lock can take
+it again without blocking. Locking uses :mod:`fcntl`, so it's skipped on platforms that
+don't have it, like Windows.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from biomappings.resources import (
+    SemanticMapping,
+    _append_predictions,
+    _get_columns,
+    _get_writer,
+    _iter_table,
+    _open_atomic,
+)
+from biomappings.utils import PREDICTIONS_SSSOM_PATH
+
+__all__ = [
+    "compact_predictions",
+    "get_lock_path",
+    "get_pending_directory",
+    "iter_pending",
+    "lock",
+    "stage_predictions",
+]
+
+logger = logging.getLogger(__name__)
+
+#: The suffix of the directory of batches next to the predictions
+PENDING_SUFFIX = ".pending"
+
+#: The suffix of the lock file next to the predictions
+LOCK_SUFFIX = ".lock"
+
+#: The extension of each batch
+BATCH_SUFFIX = ".sssom.tsv"
+
+#: The locks held by the current thread, from lock file to whether they're shared
+_held_locks = threading.local()
+
+
+def get_pending_directory(path: str | Path | None = None) -> Path:
+    """Get the directory of pending batches for a predictions file or directory of shards."""
+    path = Path(path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    return path.with_name(f"{path.name}{PENDING_SUFFIX}")
+
+
+def get_lock_path(path: str | Path | None = None) -> Path:
+    """Get the lock file for a predictions file or directory of shards."""
+    path = Path(path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    return path.with_name(f"{path.name}{LOCK_SUFFIX}")
+
+
+@contextmanager
+def lock(path: str | Path | None = None, *, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on the predictions, blocking until it's available.
+
+    :param path: The path to the predictions file or directory of shards, if not the
+        default
+    :param shared: Should the lock be shared, e.g., by several jobs staging batches? If
+        not, it's exclusive, e.g., while the predictions are rewritten.
+    """
+    lock_path = get_lock_path(path)
+    if not hasattr(_held_locks, "modes"):
+        _held_locks.modes = {}
+    held: dict[Path, bool] = _held_locks.modes
+    if lock_path in held:
+        # flock() would block on a second file descriptor for the same file, so the
+        # lock that this thread already holds is reused
+        if not shared and held[lock_path]:
+            raise RuntimeError(f"can't upgrade a shared lock on {lock_path} to exclusive")
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:  # e.g., on Windows
+        yield
+        return
+    with lock_path.open("a") as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[lock_path] = shared
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def stage_predictions(
+    mappings: Iterable[SemanticMapping], *, path: str | Path | None = None
+) -> Path | None:
+    """Add predictions as a new batch, to be merged later by :func:`compact_predictions`.
+
+    :param mappings: The new predictions
+    :param path: The path to the predictions file or directory of shards, if not the
+        default
+
+    :returns: The path to the batch, or None if there were no predictions
+    """
+    mappings = list(mappings)
+    if not mappings:
+        return None
+    header, to_row = _get_columns("predicted")
+    # sorting batch names by the time they were written keeps batches in order
+    name = f"{time.time_ns():020}-{os.getpid()}-{uuid.uuid4().hex[:8]}{BATCH_SUFFIX}"
+    directory = get_pending_directory(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    batch_path = directory.joinpath(name)
+    with lock(path, shared=True), _open_atomic(batch_path) as file:
+        writer = _get_writer(file)
+        writer.writerow(header)
+        writer.writerows(map(to_row, mappings))
+    return batch_path
+
+
+def _get_batch_paths(path: str | Path | None) -> list[Path]:
+    directory = get_pending_directory(path)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f"*{BATCH_SUFFIX}"))
+
+
+def iter_pending(path: str | Path | None = None) -> Iterable[SemanticMapping]:
+    """Iterate over the predictions that are staged, but haven't been compacted yet."""
+    for batch_path in _get_batch_paths(path):
+        yield from _iter_table(batch_path, standardize=False)
+
+
+def compact_predictions(
+    *,
+    path: str | Path | None = None,
+    deduplicate: bool = True,
+    sort: bool = True,
+    standardize: bool = True,
+) -> int:
+    """Merge the staged batches into the predictions, then remove them.
+
+    All of the batches are appended at once, so the predictions are only linted once.
+    If this is interrupted after appending but before the batches are removed, running
+    it again with ``deduplicate`` skips the predictions that were already appended.
+
+    :param path: The path to the predictions file or directory of shards, if not the
+        default
+    :param deduplicate: See :func:`biomappings.resources.append_predictions`
+    :param sort: See :func:`biomappings.resources.append_predictions`
+    :param standardize: See :func:`biomappings.resources.append_predictions`
+
+    :returns: The number of predictions in the batches that were merged
+    """
+    path = Path(path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    with lock(path):
+        batch_paths = _get_batch_paths(path)
+        if not batch_paths:
+            return 0
+        mappings = [
+            mapping
+            for batch_path in batch_paths
+            for mapping in _iter_table(batch_path, standardize=False)
+        ]
+        logger.info("compacting %d batches with %d predictions", len(batch_paths), len(mappings))
+        _append_predictions(
+            mappings, deduplicate=deduplicate, sort=sort, path=path, standardize=standardize
+        )
+        for batch_path in batch_paths:
+            batch_path.unlink()
+    return len(mappings)
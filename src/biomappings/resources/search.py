@@ -0,0 +1,145 @@
+"""An inverted trigram index for substring search over the text fields of mappings.
+
+The curation web app filters predictions by case-insensitive substrings of their
+CURIEs, labels, and mapping tools. Rather than casefolding every field of every
+prediction on every request, a :class:`TextIndex` maps each trigram (i.e., substring
+of three characters) of each casefolded field to the positions of the mappings where
+it appears. A query is answered by intersecting the posting lists of its trigrams,
+then checking the few remaining candidates.
+
+.. code-block:: python
+
+    from biomappings.resources import load_predictions
+    from biomappings.resources.search import TextIndex
+
+    index = TextIndex(load_predictions())
+    positions = index.search("glyox", ["subject_name", "object_name"])
+
+Queries shorter than three characters don't have any trigrams, so :meth:`TextIndex.search`
+returns None and the caller has to scan the mappings instead.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+
+from typing_extensions import Literal
+
+from biomappings.resources import SemanticMapping
+
+__all__ = [
+    "FIELDS",
+    "Field",
+    "TextIndex",
+    "get_field",
+]
+
+#: The text fields of a mapping that can be searched
+Field = Literal["subject_curie", "subject_name", "object_curie", "object_name", "mapping_tool"]
+
+#: Functions to get each text field from a mapping
+FIELDS: dict[Field, Callable[[SemanticMapping], str | None]] = {
+    "subject_curie": lambda mapping: mapping.subject.curie,
+    "subject_name": lambda mapping: mapping.subject.name,
+    "object_curie": lambda mapping: mapping.object.curie,
+    "object_name": lambda mapping: mapping.object.name,
+    "mapping_tool": lambda mapping: mapping.mapping_tool,
+}
+
+#: The length of the substrings in the index
+GRAM_SIZE = 3
+
+
+def get_field(mapping: SemanticMapping, field: Field) -> str | None:
+    """Get a text field from a mapping."""
+    return FIELDS[field](mapping)
+
+
+def _get_grams(text: str) -> set[str]:
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _new_postings() -> array[int]:
+    return array("q")
+
+
+class TextIndex:
+    """An inverted index from trigrams of casefolded text fields to positions of mappings."""
+
+    def __init__(self, mappings: Iterable[SemanticMapping]) -> None:
+        """Index the mappings.
+
+        :param mappings: The mappings to index. Positions refer to the order in which
+            they're given, and are updated by :meth:`remove`.
+        """
+        self.mappings = list(mappings)
+        self.postings: dict[Field, defaultdict[str, array[int]]] = {
+            field: defaultdict(_new_postings) for field in FIELDS
+        }
+        for position, mapping in enumerate(self.mappings):
+            for field, getter in FIELDS.items():
+                value = getter(mapping)
+                if not value:
+                    continue
+                postings = self.postings[field]
+                for gram in _get_grams(value.casefold()):
+                    postings[gram].append(position)
+        # the original positions of the mappings that haven't been removed, which is
+        # sorted, so the current position of a mapping is found by bisection
+        self._alive = array("q", range(len(self.mappings)))
+
+    def __len__(self) -> int:
+        return len(self._alive)
+
+    def remove(self, positions: Iterable[int]) -> None:
+        """Remove mappings, shifting the positions of later mappings down.
+
+        This mirrors removing the mappings from a list with :meth:`list.pop`, without
+        re-indexing the mappings that remain.
+
+        :param positions: The current positions of the mappings to remove
+        """
+        removed = set(positions)
+        if not removed:
+            return
+        # deleting each position would move the rest of the array every time
+        self._alive = array(
+            "q",
+            (original for position, original in enumerate(self._alive) if position not in removed),
+        )
+
+    def search(self, query: str, fields: Iterable[Field]) -> list[int] | None:
+        """Get the positions of mappings where the query is a substring of any of the fields.
+
+        :param query: The query, which is matched case-insensitively
+        :param fields: The fields to search
+        :returns: The sorted current positions of matching mappings, or None if the query
+            is too short to use the index
+        """
+        query = query.casefold()
+        if len(query) < GRAM_SIZE:
+            return None
+        grams = _get_grams(query)
+        matches: set[int] = set()
+        for field in fields:
+            postings = self.postings[field]
+            lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+            if not lists[0]:
+                continue
+            candidates = set(lists[0]).intersection(*lists[1:])
+            getter = FIELDS[field]
+            matches.update(
+                original
+                for original in candidates
+                if original not in matches
+                and query in (getter(self.mappings[original]) or "").casefold()
+            )
+        return sorted(
+            position
+            for original in matches
+            if (position := bisect_left(self._alive, original)) < len(self._alive)
+            and self._alive[position] == original
+        )
@@ -0,0 +1,414 @@
+"""Store predictions in a directory of shards, one per canonical prefix pair.
+
+A single predictions file has to be loaded, linted, and rewritten in full, even when a
+script only adds predictions from ChEBI to MeSH. As an alternative, predictions can be
+stored in a directory with one SSSOM TSV file per canonical prefix pair, i.e., the
+subject and object prefixes of :func:`biomappings.utils.get_canonical_tuple`, and a
+manifest with the number of rows in each:
+
+.. code-block::
+
+    predictions/
+        manifest.json
+        chebi/mesh.sssom.tsv
+        doid/mesh.sssom.tsv
+        ...
+
+Since all mappings with the same canonical tuple end up in the same shard, each shard
+can be linted on its own. Passing the directory as the ``path`` to
+:func:`biomappings.resources.load_predictions`,
+:func:`biomappings.resources.write_predictions`,
+:func:`biomappings.resources.append_predictions`, and
+:func:`biomappings.resources.lint_predictions` uses this layout, and their
+``prefixes`` arguments only read or write the shards that involve those prefixes.
+
+.. code-block:: python
+
+    from biomappings.resources import load_predictions
+    from biomappings.resources.shards import shard_predictions
+
+    shard_predictions("predictions")
+    mappings = load_predictions(path="predictions", prefixes={"chebi"})
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools as itt
+import json
+from collections import defaultdict
+from collections.abc import Collection, Iterable, Sequence
+from pathlib import Path
+
+from bioregistry import NormalizedNamableReference
+
+from biomappings.resources import (
+    SemanticMapping,
+    _from_curie,
+    _iter_table,
+    _load_table,
+    _merge_helper,
+    _open_atomic,
+    _open_table,
+    _recover_journal,
+    _write_helper,
+    mapping_sort_key,
+)
+from biomappings.utils import PREDICTIONS_SSSOM_PATH, get_canonical_tuple
+
+__all__ = [
+    "MANIFEST_NAME",
+    "append_shards",
+    "filter_shards",
+    "get_prefix_pair",
+    "get_shard_path",
+    "get_shard_paths",
+    "iter_shards",
+    "lint_shards",
+    "load_shards",
+    "read_manifest",
+    "shard_predictions",
+    "write_shards",
+]
+
+#: The name of the file in the directory with the number of rows in each shard
+MANIFEST_NAME = "manifest.json"
+
+#: The extension of each shard
+SHARD_SUFFIX = ".sssom.tsv"
+
+PrefixPair = tuple[str, str]
+
+
+def shard_predictions(directory: str | Path, *, path: str | Path | None = None) -> None:
+    """Split a predictions file into a directory of shards.
+
+    :param directory: The directory to write the shards to. It's created if it doesn't
+        exist, and any existing shards are replaced.
+    :param path: The predictions file to split. Defaults to the predictions in
+        Biomappings.
+    """
+    directory = Path(directory).expanduser().resolve()
+    directory.mkdir(parents=True, exist_ok=True)
+    write_shards(_iter_table(path or PREDICTIONS_SSSOM_PATH, standardize=False), directory)
+
+
+def get_prefix_pair(mapping: SemanticMapping) -> PrefixPair:
+    """Get the prefix pair of the shard that a mapping belongs to."""
+    canonical_tuple = get_canonical_tuple(mapping)
+    return canonical_tuple[0], canonical_tuple[2]
+
+
+def get_manifest_path(directory: Path) -> Path:
+    """Get the path to the manifest of a directory of shards."""
+    return directory.joinpath(MANIFEST_NAME)
+
+
+def get_shard_path(directory: Path, prefix_pair: PrefixPair) -> Path:
+    """Get the path to the shard for a prefix pair, which might not exist yet."""
+    subject_prefix, object_prefix = prefix_pair
+    return directory.joinpath(subject_prefix, f"{object_prefix}{SHARD_SUFFIX}")
+
+
+def _matches(prefix_pair: PrefixPair, prefixes: Collection[str] | None) -> bool:
+    return prefixes is None or prefix_pair[0] in prefixes or prefix_pair[1] in prefixes
+
+
+def read_manifest(directory: str | Path) -> dict[PrefixPair, int]:
+    """Get the number of rows in each shard, by prefix pair.
+
+    If the manifest is missing, e.g., because shards were added by hand, it's rebuilt
+    by counting the rows in each shard.
+    """
+    directory = Path(directory).expanduser().resolve()
+    manifest_path = get_manifest_path(directory)
+    if not manifest_path.is_file():
+        counts = {
+            (shard_path.parent.name, shard_path.name.removesuffix(SHARD_SUFFIX)): _count_rows(
+                shard_path
+            )
+            for shard_path in directory.glob(f"*/*{SHARD_SUFFIX}")
+        }
+        _write_manifest(directory, counts)
+        return counts
+    with manifest_path.open() as file:
+        data = json.load(file)
+    return {
+        (shard["subject_prefix"], shard["object_prefix"]): shard["rows"] for shard in data["shards"]
+    }
+
+
+def _write_manifest(directory: Path, counts: dict[PrefixPair, int]) -> None:
+    shards = [
+        {"subject_prefix": subject_prefix, "object_prefix": object_prefix, "rows": rows}
+        for (subject_prefix, object_prefix), rows in sorted(counts.items())
+    ]
+    with _open_atomic(get_manifest_path(directory)) as file:
+        json.dump({"shards": shards}, file, indent=2)
+        file.write("\n")
+
+
+def _count_rows(path: Path) -> int:
+    _recover_journal(path)
+    with _open_table(path) as file:
+        return sum(1 for _ in file) - 1
+
+
+def get_shard_paths(directory: str | Path, prefixes: Collection[str] | None = None) -> list[Path]:
+    """Get the paths to shards, in order of their prefix pairs.
+
+    :param directory: The directory of shards
+    :param prefixes: If given, only get shards where the subject or object prefix is
+        one of these
+    :returns: Paths to shards
+    """
+    directory = Path(directory).expanduser().resolve()
+    return [
+        get_shard_path(directory, prefix_pair)
+        for prefix_pair in sorted(read_manifest(directory))
+        if _matches(prefix_pair, prefixes)
+    ]
+
+
+def load_shards(
+    directory: str | Path,
+    *,
+    prefixes: Collection[str] | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+    cache: bool = False,
+) -> list[SemanticMapping]:
+    """Load predictions from a directory of shards.
+
+    Each shard is cached separately. Since linted shards are sorted, they're merged so
+    the predictions are in the same order as if they were linted in a single file.
+    """
+    tables = [
+        _load_table(shard_path, standardize=standardize, trusted=trusted, cache=cache)
+        for shard_path in get_shard_paths(directory, prefixes)
+    ]
+    return list(heapq.merge(*tables, key=mapping_sort_key))
+
+
+def iter_shards(
+    directory: str | Path,
+    *,
+    prefixes: Collection[str] | None = None,
+    standardize: bool = False,
+    trusted: bool = False,
+) -> Iterable[SemanticMapping]:
+    """Iterate over predictions from a directory of shards, one shard at a time."""
+    return itt.chain.from_iterable(
+        _iter_table(shard_path, standardize=standardize, trusted=trusted)
+        for shard_path in get_shard_paths(directory, prefixes)
+    )
+
+
+def _group(mappings: Iterable[SemanticMapping]) -> dict[PrefixPair, list[SemanticMapping]]:
+    rv: defaultdict[PrefixPair, list[SemanticMapping]] = defaultdict(list)
+    for mapping in mappings:
+        rv[get_prefix_pair(mapping)].append(mapping)
+    return rv
+
+
+def write_shards(
+    mappings: Iterable[SemanticMapping],
+    directory: str | Path,
+    *,
+    prefixes: Collection[str] | None = None,
+    record_ids: bool | None = None,
+) -> None:
+    """Replace the predictions in a directory of shards.
+
+    :param mappings: The new predictions
+    :param directory: The directory of shards
+    :param prefixes: If given, only replace the shards where the subject or object
+        prefix is one of these, and leave the rest as they are
+    :param record_ids: Should the shards have a ``record_id`` column? By default, each
+        shard keeps the column if it already has one.
+    :raises ValueError: If a mapping doesn't involve any of the given prefixes
+    """
+    from .index import invalidate_index
+
+    directory = Path(directory).expanduser().resolve()
+    counts = read_manifest(directory)
+    groups = _group(mappings)
+    for prefix_pair in groups:
+        if not _matches(prefix_pair, prefixes):
+            raise ValueError(f"prediction with prefixes {prefix_pair} doesn't match {prefixes}")
+
+    for prefix_pair in list(counts):
+        if _matches(prefix_pair, prefixes) and prefix_pair not in groups:
+            shard_path = get_shard_path(directory, prefix_pair)
+            shard_path.unlink(missing_ok=True)
+            invalidate_index(shard_path)
+            del counts[prefix_pair]
+    for prefix_pair, group in groups.items():
+        shard_path = get_shard_path(directory, prefix_pair)
+        shard_path.parent.mkdir(exist_ok=True)
+        _write_helper(group, shard_path, mode="w", t="predicted", record_ids=record_ids)
+        counts[prefix_pair] = _count_rows(shard_path)
+    _write_manifest(directory, counts)
+
+
+def append_shards(
+    mappings: Iterable[SemanticMapping],
+    directory: str | Path,
+    *,
+    sort: bool = True,
+    standardize: bool = True,
+) -> None:
+    """Append predictions to the shards for their prefix pairs, leaving the rest untouched.
+
+    :param mappings: The new predictions
+    :param directory: The directory of shards
+    :param sort: Should the shards that were appended to be linted?
+    :param standardize: Should references be standardized? The subjects and objects are
+        standardized before picking the shards, like after
+        :func:`biomappings.resources.lint_predictions`, and the rest while linting.
+    """
+    from biomappings.resources import _lint_predictions
+
+    if standardize:
+        mappings = map(_standardize_prefix_pair, mappings)
+    directory = Path(directory).expanduser().resolve()
+    counts = read_manifest(directory)
+    for prefix_pair, group in _group(mappings).items():
+        shard_path = get_shard_path(directory, prefix_pair)
+        shard_path.parent.mkdir(exist_ok=True)
+        if prefix_pair in counts:
+            _write_helper(group, shard_path, mode="a", t="predicted")
+        else:
+            _write_helper(group, shard_path, mode="w", t="predicted")
+        if sort:
+            _lint_predictions(path=shard_path, standardize=standardize)
+        counts[prefix_pair] = _count_rows(shard_path)
+    _write_manifest(directory, counts)
+
+
+def _standardize_prefix_pair(mapping: SemanticMapping) -> SemanticMapping:
+    """Standardize the subject and object of a mapping, which decide its shard."""
+    return mapping.model_copy(
+        update={
+            "subject": _from_curie(
+                NormalizedNamableReference, mapping.subject.curie, mapping.subject.name
+            ),
+            "object": _from_curie(
+                NormalizedNamableReference, mapping.object.curie, mapping.object.name
+            ),
+        }
+    )
+
+
+def filter_shards(
+    directory: str | Path, canonical_tuples: Collection[tuple[str, str, str, str]]
+) -> bool:
+    """Remove predictions with the given canonical tuples, only rewriting shards that change.
+
+    :param directory: The directory of shards
+    :param canonical_tuples: The canonical tuples to remove
+    :returns: If any shards were changed
+    """
+    directory = Path(directory).expanduser().resolve()
+    prefix_pairs = {
+        (canonical_tuple[0], canonical_tuple[2]) for canonical_tuple in canonical_tuples
+    }
+    counts = read_manifest(directory)
+    changed = False
+    for prefix_pair in counts.keys() & prefix_pairs:
+        shard_path = get_shard_path(directory, prefix_pair)
+        if _merge_helper([], shard_path, t="predicted", exclude_tuples=canonical_tuples):
+            counts[prefix_pair] = _count_rows(shard_path)
+            changed = True
+    if changed:
+        _write_manifest(directory, counts)
+    return changed
+
+
+def lint_shards(
+    directory: str | Path,
+    *,
+    additional_curated_mappings: Iterable[SemanticMapping] | None = None,
+    standardize: bool,
+    memory_budget: int | None = None,
+    prefixes: Collection[str] | None = None,
+    curated_paths: Sequence[str | Path] | None = None,
+) -> None:
+    """Lint each shard on its own.
+
+    Standardizing a mapping's references can change its prefix pair, e.g., from
+    ``taxonomy`` to ``ncbitaxon``, so those mappings are moved to the shards they now
+    belong to, which are linted again.
+
+    :param directory: The directory of shards
+    :param additional_curated_mappings: A list of additional mappings
+    :param standardize: Should references be standardized against the Bioregistry?
+    :param memory_budget: See :func:`biomappings.resources.lint_predictions`
+    :param prefixes: If given, only lint the shards where the subject or object prefix
+        is one of these
+    :param curated_paths: See :func:`biomappings.resources.lint_predictions`
+    """
+    from biomappings.resources import _lint_predictions
+
+    from .index import invalidate_index
+
+    directory = Path(directory).expanduser().resolve()
+    additional_groups = _group(additional_curated_mappings or [])
+    counts = read_manifest(directory)
+    moved: list[SemanticMapping] = []
+    for prefix_pair in list(counts):
+        if not _matches(prefix_pair, prefixes):
+            continue
+        shard_path = get_shard_path(directory, prefix_pair)
+        _lint_predictions(
+            path=shard_path,
+            additional_curated_mappings=additional_groups.get(prefix_pair),
+            standardize=standardize,
+            memory_budget=memory_budget,
+            curated_paths=curated_paths,
+        )
+        if standardize:
+            moved.extend(_remove_misplaced(shard_path, prefix_pair))
+        counts[prefix_pair] = _count_rows(shard_path)
+        if not counts[prefix_pair]:
+            shard_path.unlink()
+            invalidate_index(shard_path)
+            del counts[prefix_pair]
+
+    for prefix_pair, group in _group(moved).items():
+        shard_path = get_shard_path(directory, prefix_pair)
+        shard_path.parent.mkdir(exist_ok=True)
+        _write_helper(group, shard_path, mode="a" if prefix_pair in counts else "w", t="predicted")
+        _lint_predictions(
+            path=shard_path,
+            additional_curated_mappings=additional_groups.get(prefix_pair),
+            standardize=False,
+            memory_budget=memory_budget,
+            curated_paths=curated_paths,
+        )
+        counts[prefix_pair] = _count_rows(shard_path)
+    _write_manifest(directory, counts)
+
+
+def _remove_misplaced(shard_path: Path, prefix_pair: PrefixPair) -> list[SemanticMapping]:
+    """Remove the mappings that belong in another shard from a linted shard.
+
+    :param shard_path: The path to the shard
+    :param prefix_pair: The prefix pair of the shard
+    :returns: The mappings that were removed
+    """
+    misplaced = [
+        mapping
+        for mapping in _iter_table(shard_path, standardize=False)
+        if get_prefix_pair(mapping) != prefix_pair
+    ]
+    if misplaced:
+        # all mappings with the same canonical tuple share a prefix pair, so excluding
+        # the canonical tuples only removes the misplaced rows
+        _merge_helper(
+            [],
+            shard_path,
+            t="predicted",
+            exclude_tuples={get_canonical_tuple(mapping) for mapping in misplaced},
+        )
+    return misplaced
@@ -0,0 +1,335 @@
+"""An in-memory store of semantic mappings with hash indexes.
+
+Many questions about Biomappings only concern a few mappings, e.g., which curated
+mappings go from ChEBI to MeSH, or which predictions mention a given term. Rather than
+scanning every mapping to answer each one, a :class:`MappingStore` loads each resource
+once and indexes it by subject CURIE, object CURIE, prefix pair, canonical tuple,
+mapping tool, and record ID.
+
+.. code-block:: python
+
+    from biomappings.resources.store import get_store
+
+    store = get_store()
+    mappings = store.get(subject_prefix="chebi", object_prefix="mesh", kinds=["positive"])
+
+The store returned by :func:`get_store` is shared across the process. Each resource is
+loaded when it's first queried, and reloaded when its file changes.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, overload
+
+from typing_extensions import Literal
+
+from biomappings.resources import (
+    SemanticMapping,
+    _get_stat,
+    load_false_mappings,
+    load_mappings,
+    load_predictions,
+    load_unsure,
+)
+from biomappings.utils import (
+    EXACT_MATCH,
+    NEGATIVES_SSSOM_PATH,
+    POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
+    UNSURE_SSSOM_PATH,
+    get_canonical_tuple,
+)
+
+__all__ = [
+    "CURATED_KINDS",
+    "Kind",
+    "MappingIndex",
+    "MappingStore",
+    "get_store",
+]
+
+#: The resources in a store
+Kind = Literal["positive", "negative", "unsure", "predicted"]
+
+#: The kinds of curated mappings, in the order in which they're usually combined
+CURATED_KINDS: tuple[Kind, ...] = ("positive", "negative", "unsure")
+
+#: All kinds, in the order in which they're usually combined
+KINDS: tuple[Kind, ...] = (*CURATED_KINDS, "predicted")
+
+LOADERS: dict[Kind, tuple[Path, Callable[..., list[SemanticMapping]]]] = {
+    "positive": (POSITIVES_SSSOM_PATH, load_mappings),
+    "negative": (NEGATIVES_SSSOM_PATH, load_false_mappings),
+    "unsure": (UNSURE_SSSOM_PATH, load_unsure),
+    "predicted": (PREDICTIONS_SSSOM_PATH, load_predictions),
+}
+
+_EMPTY: Mapping[str, str] = MappingProxyType({})
+
+
+class MappingIndex(Sequence[SemanticMapping]):
+    """A list of mappings with hash indexes from each key to the positions where it appears."""
+
+    def __init__(self, mappings: Iterable[SemanticMapping]) -> None:
+        """Index the mappings.
+
+        :param mappings: The mappings to index. Positions refer to the order in which
+            they're given.
+        """
+        self.mappings = list(mappings)
+        self.subjects: defaultdict[str, list[int]] = defaultdict(list)
+        self.objects: defaultdict[str, list[int]] = defaultdict(list)
+        self.prefix_pairs: defaultdict[tuple[str, str], list[int]] = defaultdict(list)
+        self.subject_prefixes: defaultdict[str, list[int]] = defaultdict(list)
+        self.object_prefixes: defaultdict[str, list[int]] = defaultdict(list)
+        self.canonical_tuples: defaultdict[tuple[str, str, str, str], list[int]] = defaultdict(list)
+        self.mapping_tools: defaultdict[str | None, list[int]] = defaultdict(list)
+        self.record_ids: defaultdict[str, list[int]] = defaultdict(list)
+        for position, mapping in enumerate(self.mappings):
+            self.subjects[mapping.subject.curie].append(position)
+            self.objects[mapping.object.curie].append(position)
+            self.prefix_pairs[mapping.subject.prefix, mapping.object.prefix].append(position)
+            self.subject_prefixes[mapping.subject.prefix].append(position)
+            self.object_prefixes[mapping.object.prefix].append(position)
+            self.canonical_tuples[get_canonical_tuple(mapping)].append(position)
+            self.mapping_tools[mapping.mapping_tool].append(position)
+            self.record_ids[mapping.record_id].append(position)
+        self._partition: dict[tuple[str, str], Mapping[str, str]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.mappings)
+
+    @overload
+    def __getitem__(self, item: int) -> SemanticMapping: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> list[SemanticMapping]: ...
+
+    def __getitem__(self, item: int | slice) -> SemanticMapping | list[SemanticMapping]:
+        return self.mappings[item]
+
+    def positions(
+        self,
+        *,
+        subject: str | None = None,
+        object: str | None = None,
+        subject_prefix: str | None = None,
+        object_prefix: str | None = None,
+        canonical_tuple: tuple[str, str, str, str] | None = None,
+        mapping_tool: str | None = None,
+        record_id: str | None = None,
+    ) -> list[int]:
+        """Get the sorted positions of mappings that match all the given criteria.
+
+        :param subject: The CURIE of the subject
+        :param object: The CURIE of the object
+        :param subject_prefix: The prefix of the subject
+        :param object_prefix: The prefix of the object
+        :param canonical_tuple: The canonical tuple, which matches a mapping in either
+            direction. See :func:`biomappings.utils.get_canonical_tuple`.
+        :param mapping_tool: The mapping tool
+        :param record_id: The record ID. See :attr:`biomappings.SemanticMapping.record_id`.
+
+        :returns: Positions of matching mappings. If no criteria are given, this is all
+            positions.
+        """
+        candidates: list[list[int]] = []
+        if subject is not None:
+            candidates.append(self.subjects.get(subject, []))
+        if object is not None:
+            candidates.append(self.objects.get(object, []))
+        if subject_prefix is not None and object_prefix is not None:
+            candidates.append(self.prefix_pairs.get((subject_prefix, object_prefix), []))
+        elif subject_prefix is not None:
+            candidates.append(self.subject_prefixes.get(subject_prefix, []))
+        elif object_prefix is not None:
+            candidates.append(self.object_prefixes.get(object_prefix, []))
+        if canonical_tuple is not None:
+            candidates.append(self.canonical_tuples.get(canonical_tuple, []))
+        if mapping_tool is not None:
+            candidates.append(self.mapping_tools.get(mapping_tool, []))
+        if record_id is not None:
+            candidates.append(self.record_ids.get(record_id, []))
+
+        if not candidates:
+            return list(range(len(self.mappings)))
+        if len(candidates) == 1:
+            return list(candidates[0])
+        candidates.sort(key=len)
+        rest = [set(positions) for positions in candidates[1:]]
+        return [
+            position
+            for position in candidates[0]
+            if all(position in positions for positions in rest)
+        ]
+
+    def get(self, **kwargs: Any) -> list[SemanticMapping]:
+        """Get the mappings that match all the given criteria, in order.
+
+        :param kwargs: Criteria, as for :meth:`positions`
+        :returns: Matching mappings
+        """
+        return [self.mappings[position] for position in self.positions(**kwargs)]
+
+    def subset(self, source: str, target: str) -> Mapping[str, str]:
+        """Get a read-only dictionary of 1-1 mappings from the source to the target prefix.
+
+        The first call partitions all mappings by prefix pair, so later calls for any
+        pair are a dictionary lookup. Exact matches also appear in the flipped
+        direction, but a mapping in the given direction takes priority.
+        """
+        if self._partition is None:
+            self._partition = self._get_partition()
+        return self._partition.get((source, target), _EMPTY)
+
+    def _get_partition(self) -> dict[tuple[str, str], Mapping[str, str]]:
+        direct: defaultdict[tuple[str, str], dict[str, str]] = defaultdict(dict)
+        flipped: defaultdict[tuple[str, str], dict[str, str]] = defaultdict(dict)
+        for mapping in self.mappings:
+            subject, obj = mapping.subject, mapping.object
+            direct[subject.prefix, obj.prefix][subject.identifier] = obj.identifier
+            if mapping.predicate.curie == EXACT_MATCH.curie:
+                flipped[obj.prefix, subject.prefix][obj.identifier] = subject.identifier
+        return {
+            pair: MappingProxyType({**flipped.get(pair, {}), **direct.get(pair, {})})
+            for pair in direct.keys() | flipped.keys()
+        }
+
+    def by_prefix(self, prefix: str) -> list[int]:
+        """Get the sorted positions of mappings where the subject or object has the prefix."""
+        return sorted(
+            {*self.subject_prefixes.get(prefix, []), *self.object_prefixes.get(prefix, [])}
+        )
+
+
+class MappingStore:
+    """Indexed positive, negative, unsure, and predicted mappings."""
+
+    def __init__(
+        self,
+        *,
+        paths: Mapping[Kind, Path] | None = None,
+        mappings: Mapping[Kind, Iterable[SemanticMapping]] | None = None,
+    ) -> None:
+        """Instantiate the store.
+
+        :param paths: Paths to SSSOM TSV files for each kind, which are loaded when
+            first needed and reloaded when they change. If neither this nor
+            ``mappings`` is given, the default paths are used.
+        :param mappings: Mappings for each kind, which take priority over files and are
+            never reloaded.
+        """
+        if paths is None and mappings is None:
+            paths = {kind: path for kind, (path, _) in LOADERS.items()}
+        self.paths: dict[Kind, Path] = dict(paths or {})
+        self._indexes: dict[Kind, tuple[tuple[int, int] | None, MappingIndex]] = {
+            kind: (None, MappingIndex(values)) for kind, values in (mappings or {}).items()
+        }
+        self._static = set(self._indexes)
+        #: The kinds of mappings in the store, which are searched by default
+        self.kinds: tuple[Kind, ...] = tuple(
+            kind for kind in KINDS if kind in self.paths or kind in self._static
+        )
+
+    def index(self, kind: Kind) -> MappingIndex:
+        """Get the index for the given kind, loading the file first if needed."""
+        if kind in self._static:
+            return self._indexes[kind][1]
+        path = self.paths[kind]
+        stat = _get_stat(path)
+        cached = self._indexes.get(kind)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+        _, loader = LOADERS[kind]
+        index = MappingIndex(loader(path=path))
+        self._indexes[kind] = stat, index
+        return index
+
+    def get(
+        self,
+        *,
+        kinds: Iterable[Kind] | None = None,
+        subject: str | None = None,
+        object: str | None = None,
+        subject_prefix: str | None = None,
+        object_prefix: str | None = None,
+        canonical_tuple: tuple[str, str, str, str] | None = None,
+        mapping_tool: str | None = None,
+        record_id: str | None = None,
+    ) -> list[SemanticMapping]:
+        """Get the mappings that match all the given criteria.
+
+        :param kinds: The kinds of mappings to search, in the order they're returned.
+            Defaults to all kinds in the store.
+        :param subject: The CURIE of the subject
+        :param object: The CURIE of the object
+        :param subject_prefix: The prefix of the subject
+        :param object_prefix: The prefix of the object
+        :param canonical_tuple: The canonical tuple, which matches a mapping in either
+            direction. See :func:`biomappings.utils.get_canonical_tuple`.
+        :param mapping_tool: The mapping tool
+        :param record_id: The record ID. See :attr:`biomappings.SemanticMapping.record_id`.
+
+        :returns: Matching mappings, in the order of the kinds then of their files
+        """
+        return [
+            mapping
+            for kind in kinds or self.kinds
+            for mapping in self.index(kind).get(
+                subject=subject,
+                object=object,
+                subject_prefix=subject_prefix,
+                object_prefix=object_prefix,
+                canonical_tuple=canonical_tuple,
+                mapping_tool=mapping_tool,
+                record_id=record_id,
+            )
+        ]
+
+    def subset(self, source: str, target: str, *, kind: Kind = "positive") -> Mapping[str, str]:
+        """Get a read-only dictionary of 1-1 mappings from the source to the target prefix.
+
+        See :meth:`MappingIndex.subset`. The result is cached until the file changes.
+        """
+        return self.index(kind).subset(source, target)
+
+    def by_prefix(
+        self, prefix: str, *, kinds: Iterable[Kind] | None = None
+    ) -> list[SemanticMapping]:
+        """Get the mappings where the subject or object has the given prefix."""
+        rv = []
+        for kind in kinds or self.kinds:
+            index = self.index(kind)
+            rv.extend(index[position] for position in index.by_prefix(prefix))
+        return rv
+
+    def contains(self, mapping: SemanticMapping, *, kinds: Iterable[Kind] | None = None) -> bool:
+        """Check if a mapping with the same canonical tuple appears in any of the kinds."""
+        canonical_tuple = get_canonical_tuple(mapping)
+        return any(
+            canonical_tuple in self.index(kind).canonical_tuples for kind in kinds or self.kinds
+        )
+
+    def prefix_pairs(
+        self, *, kinds: Iterable[Kind] | None = None
+    ) -> Iterable[tuple[Kind, tuple[str, str], list[SemanticMapping]]]:
+        """Iterate over the mappings grouped by kind and by subject and object prefix."""
+        for kind in kinds or self.kinds:
+            index = self.index(kind)
+            for prefix_pair, positions in index.prefix_pairs.items():
+                yield kind, prefix_pair, [index[position] for position in positions]
+
+
+_STORE: MappingStore | None = None
+
+
+def get_store() -> MappingStore:
+    """Get the store over the default resources that's shared across the process."""
+    global _STORE
+    if _STORE is None:
+        _STORE = MappingStore()
+    return _STORE
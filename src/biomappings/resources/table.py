@@ -0,0 +1,408 @@
+"""A columnar table of semantic mappings.
+
+Holding millions of predictions as :class:`biomappings.SemanticMapping` objects, each with
+four or five references, costs several hundred bytes per row. A :class:`MappingTable`
+instead stores each unique reference once and represents each row as integers pointing
+to them, in :class:`array.array` columns. Rows are only materialized as
+:class:`biomappings.SemanticMapping` objects when they're accessed.
+
+.. code-block:: python
+
+    from biomappings.resources.table import MappingTable
+
+    table = MappingTable.from_path("predictions.sssom.tsv")
+    table = table.filter_prefixes(subject_prefix="chebi", object_prefix="mesh")
+    table = table.deduplicate().sort()
+    for mapping in table:
+        ...
+"""
+
+from __future__ import annotations
+
+import itertools as itt
+import math
+import operator
+from array import array
+from collections.abc import Collection, Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Literal, overload
+
+from curies import NamableReference
+
+from biomappings.resources import SemanticMapping, _construct, _iter_table
+
+__all__ = [
+    "MappingTable",
+]
+
+#: The keys that a table can be sorted on
+SortKey = Literal["mapping", "subject", "object", "confidence"]
+
+#: The reference columns, in the order they're encoded
+REFERENCE_COLUMNS = ("subjects", "predicates", "objects", "justifications", "authors")
+
+_MISSING = -1
+
+
+class MappingTable(Sequence[SemanticMapping]):
+    """A columnar, dictionary-encoded table of semantic mappings."""
+
+    def __init__(
+        self,
+        *,
+        references: list[NamableReference],
+        mapping_tools: list[str],
+        subjects: array[int],
+        predicates: array[int],
+        objects: array[int],
+        justifications: array[int],
+        authors: array[int],
+        tools: array[int],
+        predicate_modifiers: array[int],
+        confidences: array[float],
+    ) -> None:
+        """Instantiate a table from its columns.
+
+        :param references: The unique references, which the reference columns index
+        :param mapping_tools: The unique mapping tools, which the tools column indexes
+        :param subjects: The position of each row's subject in ``references``
+        :param predicates: The position of each row's predicate in ``references``
+        :param objects: The position of each row's object in ``references``
+        :param justifications: The position of each row's mapping justification in
+            ``references``
+        :param authors: The position of each row's author in ``references``, or -1 if
+            it has no author
+        :param tools: The position of each row's mapping tool in ``mapping_tools``, or
+            -1 if it has no mapping tool
+        :param predicate_modifiers: 1 if a row's predicate is negated, otherwise 0
+        :param confidences: The confidence of each row, or NaN if it has no confidence
+
+        Use :meth:`from_mappings` or :meth:`from_path` rather than calling this directly.
+        """
+        self.references = references
+        self.mapping_tools = mapping_tools
+        self.subjects = subjects
+        self.predicates = predicates
+        self.objects = objects
+        self.justifications = justifications
+        self.authors = authors
+        self.tools = tools
+        self.predicate_modifiers = predicate_modifiers
+        self.confidences = confidences
+        # these are lazily computed for sorting and deduplication
+        self._curie_ranks: array[int] | None = None
+        self._pair_ranks: array[int] | None = None
+
+    @classmethod
+    def from_mappings(cls, mappings: Iterable[SemanticMapping]) -> MappingTable:
+        """Construct a table from semantic mappings."""
+        builder = _Builder()
+        for mapping in mappings:
+            builder.append(
+                builder.add_reference(mapping.subject),
+                builder.add_reference(mapping.predicate),
+                builder.add_reference(mapping.object),
+                builder.add_reference(mapping.mapping_justification),
+                builder.add_reference(mapping.author) if mapping.author is not None else _MISSING,
+                mapping.mapping_tool,
+                mapping.predicate_modifier,
+                mapping.confidence,
+            )
+        return builder.build()
+
+    @classmethod
+    def from_path(
+        cls, path: str | Path, *, standardize: bool = False, trusted: bool = False
+    ) -> MappingTable:
+        """Load a table from a SSSOM TSV file.
+
+        :param path: The path to a SSSOM TSV file
+        :param standardize: Should references be standardized against the Bioregistry?
+            This is ignored when ``trusted`` is true.
+        :param trusted: Should validation be skipped? See
+            :func:`biomappings.resources.load_mappings`.
+
+        :returns: A mapping table
+
+        Rows are parsed one at a time, so only the table is held in memory. Use
+        :func:`biomappings.resources.load_predictions` with ``as_table=True`` to also
+        use the on-disk cache.
+        """
+        return cls.from_mappings(_iter_table(path, standardize=standardize, trusted=trusted))
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    # docstr-coverage:excused `overload`
+    @overload
+    def __getitem__(self, index: int) -> SemanticMapping: ...
+
+    # docstr-coverage:excused `overload`
+    @overload
+    def __getitem__(self, index: slice) -> MappingTable: ...
+
+    def __getitem__(self, index: int | slice) -> SemanticMapping | MappingTable:
+        """Get the mapping at the given position, or a table of the given slice."""
+        if isinstance(index, slice):
+            return self.take(range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"index {index} is out of range for table of length {len(self)}")
+        return self._materialize(index)
+
+    def __iter__(self) -> Iterator[SemanticMapping]:
+        return map(self._materialize, range(len(self)))
+
+    def _materialize(self, index: int) -> SemanticMapping:
+        references = self.references
+        author = self.authors[index]
+        tool = self.tools[index]
+        confidence = self.confidences[index]
+        return _construct(
+            SemanticMapping,
+            {
+                "subject": references[self.subjects[index]],
+                "predicate": references[self.predicates[index]],
+                "object": references[self.objects[index]],
+                "mapping_justification": references[self.justifications[index]],
+                "author": references[author] if author != _MISSING else None,
+                "mapping_tool": self.mapping_tools[tool] if tool != _MISSING else None,
+                "predicate_modifier": "Not" if self.predicate_modifiers[index] else None,
+                "confidence": None if math.isnan(confidence) else confidence,
+            },
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # references are pickled as tuples since unpickling pydantic models is slow
+        return {
+            "references": [
+                (type(reference), reference.prefix, reference.identifier, reference.name)
+                for reference in self.references
+            ],
+            "mapping_tools": self.mapping_tools,
+            **{
+                key: getattr(self, key)
+                for key in (
+                    *REFERENCE_COLUMNS,
+                    "tools",
+                    "predicate_modifiers",
+                    "confidences",
+                )
+            },
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        state["references"] = [
+            _construct(reference_cls, {"prefix": prefix, "identifier": identifier, "name": name})
+            for reference_cls, prefix, identifier, name in state["references"]
+        ]
+        self.__init__(**state)  # type:ignore[misc]
+
+    def take(self, indices: Iterable[int]) -> MappingTable:
+        """Get a new table with the rows at the given positions, in the given order.
+
+        The new table shares its references with this one.
+        """
+        indices = array("q", indices)
+        return MappingTable(
+            references=self.references,
+            mapping_tools=self.mapping_tools,
+            subjects=_take(self.subjects, indices),
+            predicates=_take(self.predicates, indices),
+            objects=_take(self.objects, indices),
+            justifications=_take(self.justifications, indices),
+            authors=_take(self.authors, indices),
+            tools=_take(self.tools, indices),
+            predicate_modifiers=_take(self.predicate_modifiers, indices),
+            confidences=_take(self.confidences, indices),
+        )
+
+    def where(self, mask: Iterable[bool]) -> MappingTable:
+        """Get a new table with the rows where the mask is true."""
+        return self.take(itt.compress(range(len(self)), mask))
+
+    def filter_prefixes(
+        self, *, subject_prefix: str | None = None, object_prefix: str | None = None
+    ) -> MappingTable:
+        """Get a new table with the rows whose subject and object have the given prefixes.
+
+        Each prefix is only compared once per unique reference, rather than once per row.
+        """
+        mask: Iterable[bool] = itt.repeat(True, len(self))
+        if subject_prefix is not None:
+            mask = map(bool.__and__, mask, self._column_mask(self.subjects, prefix=subject_prefix))
+        if object_prefix is not None:
+            mask = map(bool.__and__, mask, self._column_mask(self.objects, prefix=object_prefix))
+        return self.where(mask)
+
+    def filter_any_prefix(self, prefixes: Collection[str]) -> MappingTable:
+        """Get a new table with the rows whose subject or object has one of the prefixes."""
+        matches = [reference.prefix in prefixes for reference in self.references]
+        return self.where(
+            map(
+                bool.__or__,
+                map(matches.__getitem__, self.subjects),
+                map(matches.__getitem__, self.objects),
+            )
+        )
+
+    def _column_mask(self, column: array[int], *, prefix: str) -> Iterator[bool]:
+        matches = [reference.prefix == prefix for reference in self.references]
+        return map(matches.__getitem__, column)
+
+    def _get_curie_ranks(self) -> array[int]:
+        """Get the position of each reference's CURIE in lexical order."""
+        if self._curie_ranks is None:
+            self._curie_ranks = _rank([reference.curie for reference in self.references])
+        return self._curie_ranks
+
+    def _get_pair_ranks(self) -> array[int]:
+        """Get the position of each reference's prefix/identifier pair in sort order."""
+        if self._pair_ranks is None:
+            self._pair_ranks = _rank([reference.pair for reference in self.references])
+        return self._pair_ranks
+
+    def argsort(self, key: SortKey = "mapping", *, reverse: bool = False) -> list[int]:
+        """Get the positions of rows, sorted by the given key.
+
+        :param key: What to sort on. ``mapping`` gives the same order as
+            :func:`biomappings.resources.mapping_sort_key`. ``confidence`` puts rows
+            without a confidence first.
+        :param reverse: Should the order be reversed? Like :func:`sorted`, this is
+            stable, so the original order is kept between equal rows.
+
+        :returns: A list of row positions
+        """
+        ranks = self._get_curie_ranks()
+        positions = range(len(self))
+        if key == "subject":
+            return sorted(positions, key=_take(ranks, self.subjects).__getitem__, reverse=reverse)
+        if key == "object":
+            return sorted(positions, key=_take(ranks, self.objects).__getitem__, reverse=reverse)
+        if key == "confidence":
+            confidences = [0.0 if math.isnan(c) else c for c in self.confidences]
+            return sorted(positions, key=confidences.__getitem__, reverse=reverse)
+        if key == "mapping":
+            # rows without a mapping tool point to the last rank, which is for ""
+            tool_ranks = _rank([*self.mapping_tools, ""])
+            rv = list(positions)
+            # sort on one column at a time, from the least significant, which gives the
+            # same order as sorting on tuples since each sort is stable
+            for column in (
+                _take(tool_ranks, self.tools),
+                _take(ranks, self.justifications),
+                _take(ranks, self.objects),
+                _take(ranks, self.predicates),
+                _take(ranks, self.subjects),
+            ):
+                rv.sort(key=column.__getitem__, reverse=reverse)
+            return rv
+        raise ValueError(f"unknown sort key: {key}")
+
+    def sort(self, key: SortKey = "mapping", *, reverse: bool = False) -> MappingTable:
+        """Get a new table sorted by the given key. See :meth:`argsort`."""
+        return self.take(self.argsort(key, reverse=reverse))
+
+    def get_canonical_keys(self) -> array[int]:
+        """Get a key for each row that corresponds to its canonical tuple.
+
+        Two rows have the same key if and only if they have the same
+        :func:`biomappings.utils.get_canonical_tuple`.
+        """
+        ranks = self._get_pair_ranks()
+        subject_ranks = _take(ranks, self.subjects)
+        object_ranks = _take(ranks, self.objects)
+        # the pair of the lower and higher rank, packed into a single integer
+        return array(
+            "q",
+            map(
+                operator.add,
+                map(operator.mul, map(min, subject_ranks, object_ranks), itt.repeat(len(ranks))),
+                map(max, subject_ranks, object_ranks),
+            ),
+        )
+
+    def deduplicate(self) -> MappingTable:
+        """Get a new table without rows that have the same canonical tuple.
+
+        Like :func:`biomappings.resources.lint_predictions`, rows curated by someone with
+        an ORCID are preferred, then the first row is kept.
+        """
+        keys = self.get_canonical_keys()
+        # rows without an author point to the last element, which isn't curated
+        uncurated = array("b", [reference.prefix != "orcid" for reference in self.references])
+        uncurated.append(True)
+        order = sorted(range(len(self)), key=_take(uncurated, self.authors).__getitem__)
+        # assigning in reverse keeps the first row in order for each key
+        best = dict(zip(map(keys.__getitem__, reversed(order)), reversed(order)))
+        # keys are kept in the order in which they first appear
+        return self.take(map(best.__getitem__, dict.fromkeys(keys)))
+
+
+def _take(column: array[Any], indices: array[int]) -> array[Any]:
+    return array(column.typecode, map(column.__getitem__, indices))
+
+
+def _rank(values: Sequence[Any]) -> array[int]:
+    """Get the rank of each value, where equal values have the same rank."""
+    rank_of = {value: rank for rank, value in enumerate(sorted(set(values)))}
+    return array("q", map(rank_of.__getitem__, values))
+
+
+class _Builder:
+    """Accumulates rows for a :class:`MappingTable`."""
+
+    def __init__(self) -> None:
+        self.references: list[NamableReference] = []
+        self.reference_to_index: dict[tuple[type, str, str, str | None], int] = {}
+        self.tool_to_index: dict[str, int] = {}
+        self.columns: dict[str, array[Any]] = {
+            **{key: array("q") for key in REFERENCE_COLUMNS},
+            "tools": array("q"),
+            "predicate_modifiers": array("b"),
+            "confidences": array("d"),
+        }
+
+    def add_reference(self, reference: NamableReference) -> int:
+        key = (type(reference), reference.prefix, reference.identifier, reference.name)
+        index = self.reference_to_index.get(key)
+        if index is None:
+            index = self.reference_to_index[key] = len(self.references)
+            self.references.append(reference)
+        return index
+
+    def append(
+        self,
+        subject: int,
+        predicate: int,
+        obj: int,
+        justification: int,
+        author: int,
+        mapping_tool: str | None,
+        predicate_modifier: str | None,
+        confidence: float | None,
+    ) -> None:
+        if mapping_tool is None:
+            tool = _MISSING
+        else:
+            tool = self.tool_to_index.setdefault(mapping_tool, len(self.tool_to_index))
+        for key, value in zip(REFERENCE_COLUMNS, (subject, predicate, obj, justification, author)):
+            self.columns[key].append(value)
+        self.columns["tools"].append(tool)
+        self.columns["predicate_modifiers"].append(1 if predicate_modifier else 0)
+        self.columns["confidences"].append(math.nan if confidence is None else confidence)
+
+    def build(self) -> MappingTable:
+        return MappingTable(
+            references=self.references,
+            mapping_tools=list(self.tool_to_index),
+            subjects=self.columns["subjects"],
+            predicates=self.columns["predicates"],
+            objects=self.columns["objects"],
+            justifications=self.columns["justifications"],
+            authors=self.columns["authors"],
+            tools=self.columns["tools"],
+            predicate_modifiers=self.columns["predicate_modifiers"],
+            confidences=self.columns["confidences"],
+        )
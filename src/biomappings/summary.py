@@ -24,9 +24,9 @@ __all__ = [
 def export() -> None:
     """Create export data file."""
     from biomappings.resources import (
+        iter_predictions,
         load_false_mappings,
         load_mappings,
-        load_predictions,
         load_unsure,
     )
     from biomappings.utils import DATA
@@ -47,7 +47,8 @@ def export() -> None:
         ("positive", true_mappings),
         ("negative", false_mappings),
         ("unsure", unsure_mappings),
-        ("predictions", load_predictions()),
+        # the predictions are much bigger, so they're counted one row at a time
+        ("predictions", iter_predictions()),
     ]:
         count_records = _get_count_records(mappings)
         rv[key] = count_records
@@ -18,20 +18,22 @@ from biomappings.resources import (
     CURATORS_PATH,
     SemanticMapping,
     _CuratedTuple,
+    _iter_raw_rows,
+    _load_table,
     _PredictedTuple,
-    load_mappings,
-    load_predictions,
     mapping_sort_key,
 )
 from biomappings.resources.semapv import get_semapv_id_to_name
 from biomappings.utils import (
     NEGATIVES_SSSOM_PATH,
     POSITIVES_SSSOM_PATH,
+    PREDICTIONS_SSSOM_PATH,
     UNSURE_SSSOM_PATH,
     get_canonical_tuple,
 )
 
 __all__ = [
+    "ChangedIntegrityTestCase",
     "IntegrityTestCase",
     "PathIntegrityTestCase",
 ]
@@ -246,7 +248,120 @@ class PathIntegrityTestCase(IntegrityTestCase):
     @classmethod
     def setUpClass(cls) -> None:
         """Set up the test case."""
-        cls.predictions = load_predictions(path=cls.predictions_path)
-        cls.mappings = load_mappings(path=cls.positives_path)
-        cls.incorrect = load_mappings(path=cls.negatives_path)
-        cls.unsure = load_mappings(path=cls.unsure_path)
+        from biomappings.resources.parallel import load_all
+
+        cls.mappings, cls.incorrect, cls.unsure, cls.predictions = load_all(
+            positives_path=cls.positives_path,
+            negatives_path=cls.negatives_path,
+            unsure_path=cls.unsure_path,
+            predictions_path=cls.predictions_path,
+        )
+
+
+class ChangedIntegrityTestCase(IntegrityTestCase):
+    """A test case that only parses the rows that changed since a git revision.
+
+    This is meant for pre-commit hooks, where only a few rows usually change. Checks on
+    single rows, like :meth:`test_valid_curies`, only run on the rows that were added or
+    modified. Checks that span whole files, like sorting and redundancy, run on every
+    row, but without parsing them, which is much faster. Files that can't be diffed,
+    e.g., because they aren't tracked by git, are parsed in full.
+
+    .. code-block:: python
+
+        from biomappings.testing import ChangedIntegrityTestCase
+
+
+        class TestChanged(ChangedIntegrityTestCase):
+            rev = "origin/master"
+    """
+
+    predictions_path: ClassVar[str | Path] = PREDICTIONS_SSSOM_PATH
+    positives_path: ClassVar[str | Path] = POSITIVES_SSSOM_PATH
+    negatives_path: ClassVar[str | Path] = NEGATIVES_SSSOM_PATH
+    unsure_path: ClassVar[str | Path] = UNSURE_SSSOM_PATH
+    #: The git revision to compare the working tree to
+    rev: ClassVar[str] = "HEAD"
+    #: The line numbers of the parsed mappings in each file, by label
+    line_numbers: ClassVar[dict[str, list[int]]]
+
+    @classmethod
+    def _get_files(cls) -> list[tuple[str, str, str | Path]]:
+        return [
+            ("mappings", "positive", cls.positives_path),
+            ("incorrect", "negative", cls.negatives_path),
+            ("unsure", "unsure", cls.unsure_path),
+            ("predictions", "predictions", cls.predictions_path),
+        ]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Set up the test case by parsing the changed rows."""
+        from biomappings.resources.incremental import get_changed_rows, load_changed
+
+        cls.line_numbers = {}
+        for attribute, label, path in cls._get_files():
+            rows = get_changed_rows(path, rev=cls.rev)
+            if rows is None:
+                mappings = _load_table(path, standardize=False)
+                cls.line_numbers[label] = list(range(2, len(mappings) + 2))
+            else:
+                mappings = load_changed(path, rows)
+                cls.line_numbers[label] = [line for line, _ in rows]
+            setattr(cls, attribute, mappings)
+
+    def _iter_groups(self) -> Iterable[tuple[str, int, SemanticMapping]]:
+        for attribute, label, _ in self._get_files():
+            for line, mapping in zip(self.line_numbers[label], getattr(self, attribute)):
+                yield label, line, mapping
+
+    def test_cross_redundancy(self) -> None:
+        """Test the redundancy of manually curated mappings and predicted mappings."""
+        counter: defaultdict[tuple[str, str, str, str], defaultdict[str, list[int]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for _, label, path in self._get_files():
+            for line, row in enumerate(_iter_raw_rows(Path(path)), start=2):
+                counter[row.canonical_tuple][label].append(line)
+
+        redundant = [
+            (mapping_key, sorted(label_to_lines.items()))
+            for mapping_key, label_to_lines in counter.items()
+            if len(label_to_lines) > 1
+        ]
+        if redundant:
+            msg = "".join(
+                f"\n  {mapping}: {_locations_str(locations)}" for mapping, locations in redundant
+            )
+            raise ValueError(f"{len(redundant)} are redundant: {msg}")
+
+    def assert_raw_sorted(self, path: str | Path, msg: str) -> None:
+        """Assert the rows of a file are in a canonical order, without redundancies."""
+        previous: tuple[str, ...] = ()
+        counter: defaultdict[tuple[str, str], list[int]] = defaultdict(list)
+        for line, row in enumerate(_iter_raw_rows(Path(path)), start=2):
+            self.assertLessEqual(previous, row.sort_key, msg=f"{msg} on line {line}")
+            previous = row.sort_key
+            counter[row.sort_key[0], row.sort_key[2]].append(line)
+        redundant = _extract_redundant(counter)
+        if redundant:
+            msg = "".join(
+                f"\n  {subject}/{obj}: {locations}" for (subject, obj), locations in redundant
+            )
+            raise ValueError(f"{len(redundant)} are redundant: {msg}")
+
+    def test_predictions_sorted(self) -> None:
+        """Test the predictions are in a canonical order."""
+        self.assert_raw_sorted(self.predictions_path, "Predictions are not sorted")
+
+    def test_curations_sorted(self) -> None:
+        """Test the true curated mappings are in a canonical order."""
+        self.assert_raw_sorted(self.positives_path, "True curations are not sorted")
+
+    def test_false_mappings_sorted(self) -> None:
+        """Test the false curated mappings are in a canonical order."""
+        self.assert_raw_sorted(self.negatives_path, "False curations are not sorted")
+
+    def test_unsure_sorted(self) -> None:
+        """Test the unsure mappings are in a canonical order."""
+        self.assert_raw_sorted(self.unsure_path, "Unsure curations are not sorted")
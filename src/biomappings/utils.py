@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 import os
 from collections.abc import Mapping
 from pathlib import Path
@@ -24,6 +25,7 @@ __all__ = [
     "CMapping",
     "get_canonical_tuple",
     "get_git_hash",
+    "get_record_id",
     "get_script_url",
 ]
 
@@ -116,6 +118,23 @@ def get_canonical_tuple(mapping) -> tuple[str, str, str, str]:
     return (*source.pair, *target.pair)
 
 
+def get_record_id(mapping) -> str:
+    """Get a stable ID for a mapping, based on its subject, predicate, and object.
+
+    The ID is 16 hexadecimal characters from a 64-bit hash, so it doesn't change when
+    files are rewritten or other columns like the label or confidence change. Exact
+    matches are symmetric, so they get the same ID in either direction, like their
+    canonical tuples (see :func:`get_canonical_tuple`).
+    """
+    if mapping.predicate.curie == EXACT_MATCH.curie:
+        subject_prefix, subject_id, object_prefix, object_id = get_canonical_tuple(mapping)
+    else:
+        subject_prefix, subject_id = mapping.subject.pair
+        object_prefix, object_id = mapping.object.pair
+    key = f"{subject_prefix}:{subject_id}\t{mapping.predicate.curie}\t{object_prefix}:{object_id}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
 #: A filter 3-dictionary of source prefix to target prefix to source identifier to target identifier
 CMapping = Mapping[str, Mapping[str, Mapping[str, str]]]
 
@@ -2,9 +2,16 @@
 
 from __future__ import annotations
 
+import atexit
+import datetime
 import getpass
+import itertools as itt
+import json
+import logging
 import os
-from collections import Counter, defaultdict
+import threading
+from array import array
+from collections import Counter, OrderedDict, defaultdict
 from collections.abc import Iterable, Iterator
 from copy import deepcopy
 from pathlib import Path
@@ -25,18 +32,23 @@ from wtforms import StringField, SubmitField
 
 from biomappings.resources import (
     SemanticMapping,
+    _open_atomic,
     append_false_mappings,
     append_true_mappings,
     append_unsure_mappings,
     get_current_curator,
+    iter_predictions,
     load_predictions,
     write_predictions,
 )
+from biomappings.resources.search import FIELDS, Field, TextIndex, get_field
+from biomappings.resources.store import MappingIndex
 from biomappings.utils import (
     BROAD_MATCH,
     EXACT_MATCH,
     MANUAL_MAPPING_CURATION,
     NARROW_MATCH,
+    PREDICTIONS_SSSOM_PATH,
     commit,
     get_branch,
     not_main,
@@ -47,9 +59,30 @@ __all__ = [
     "get_app",
 ]
 
+logger = logging.getLogger(__name__)
+
 Mark: TypeAlias = Literal["correct", "incorrect", "unsure", "broad", "narrow"]
 MARKS: set[Mark] = set(get_args(Mark))
 
+#: The default number of seconds after a mark to write marks to the source files
+FLUSH_INTERVAL = 10.0
+
+#: The number of filtered views of the predictions to cache, see :meth:`Controller._get_view`
+VIEW_CACHE_SIZE = 16
+
+
+def _get_confidence(mapping: SemanticMapping) -> float:
+    return mapping.confidence or 0.0
+
+
+#: Functions to sort predictions by, and whether the sort is descending
+SORT_KEYS: dict[str, tuple[Callable[[SemanticMapping], Any], bool]] = {
+    "desc": (_get_confidence, True),
+    "asc": (_get_confidence, False),
+    "subject": (lambda mapping: mapping.subject.curie, False),
+    "object": (lambda mapping: mapping.object.curie, False),
+}
+
 
 class State(BaseModel):
     """Contains the state for queries to the curation app."""
@@ -109,6 +142,7 @@ def get_app(
     positives_path: Path | None = None,
     negatives_path: Path | None = None,
     unsure_path: Path | None = None,
+    prefixes: Iterable[str] | None = None,
     controller: Controller | None = None,
     user: NormalizedNamableReference | None = None,
     resolver_base: str | None = None,
@@ -126,11 +160,16 @@ def get_app(
             positives_path=positives_path,
             negatives_path=negatives_path,
             unsure_path=unsure_path,
+            prefixes=prefixes,
             user=user,
         )
     if not controller._predictions and predictions_path is not None:
         raise RuntimeError(f"There are no predictions to curate in {predictions_path}")
+    replayed = controller.replay_journal()
+    if replayed:
+        logger.warning("replayed %d actions from %s", replayed, controller.journal_path)
     app_.config["controller"] = controller
+    controller.flush_on_exit()
     flask_bootstrap.Bootstrap4(app_)
     app_.register_blueprint(blueprint)
 
@@ -145,6 +184,12 @@ def get_app(
     return app_
 
 
+def get_journal_path(predictions_path: Path | None = None) -> Path:
+    """Get the path to the journal of curation actions for a predictions file or directory of shards."""
+    path = Path(predictions_path or PREDICTIONS_SSSOM_PATH).expanduser().resolve()
+    return path.with_name(f"{path.name}.marks.jsonl")
+
+
 class Controller:
     """A module for interacting with the predictions and mappings."""
 
@@ -158,7 +203,9 @@ class Controller:
         positives_path: Path | None = None,
         negatives_path: Path | None = None,
         unsure_path: Path | None = None,
+        prefixes: Iterable[str] | None = None,
         user: NamableReference | None = None,
+        flush_interval: float | None = FLUSH_INTERVAL,
     ) -> None:
         """Instantiate the web controller.
 
@@ -170,17 +217,52 @@ class Controller:
         :param positives_path: A custom positives file to curate to
         :param negatives_path: A custom negatives file to curate to
         :param unsure_path: A custom unsure file to curate to
+        :param prefixes: If given, only curate predictions where the subject or object
+            prefix is one of these. If the predictions are in a directory of shards,
+            only the matching shards are loaded and rewritten.
+        :param flush_interval: The number of seconds after a prediction is marked to
+            write marks to the source files in the background. If None, they're only
+            written by :meth:`flush` or :meth:`persist`, e.g., when committing.
         """
         self.predictions_path = predictions_path
-        self._predictions = load_predictions(path=self.predictions_path)
+        self.prefixes = set(prefixes) if prefixes is not None else None
+        self._predictions = load_predictions(path=self.predictions_path, prefixes=self.prefixes)
+        self._prediction_index: MappingIndex | None = None
+        self._text_index: TextIndex | None = None
+        self._views: OrderedDict[tuple[Any, ...], array[int]] = OrderedDict()
+        self._permutations: dict[str, array[int]] = {}
 
         self.positives_path = positives_path
         self.negatives_path = negatives_path
         self.unsure_path = unsure_path
 
         self._marked: dict[int, Mark] = {}
+        # the curator of each mark, which is only different from the current author
+        # for marks that were replayed from the journal
+        self._curators: dict[int, NamableReference] = {}
+        # marked lines that were already written to the source files, or are being
+        # written by a flush
+        self._flushed: set[int] = set()
         self.total_curated = 0
         self._added_mappings: list[SemanticMapping] = []
+
+        self.flush_interval = flush_interval
+        self.journal_path = get_journal_path(predictions_path)
+        # the actions in the journal that haven't been flushed yet
+        self._journal: list[dict[str, Any]] = []
+        # marks in the journal on predictions that weren't loaded, e.g., because of the
+        # prefixes, which are kept in the journal for a controller that loads them
+        self._unresolved: list[dict[str, Any]] = []
+        # the number of actions written to the journal, and how many of them were synced
+        # to disk, so one sync covers all the actions written by concurrent requests
+        self._journal_written = 0
+        self._journal_synced = 0
+        # when several are needed, they're always acquired in this order
+        self._flush_lock = threading.RLock()
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._flushes_on_exit = False
         self.target_references = set(target_references or [])
 
         if user is not None:
@@ -246,32 +328,23 @@ class Controller:
 
         :yields: Pairs of positions and prediction dictionaries
         """
-        if same_text is None:
-            same_text = False
-        it = self._help_it_predictions(
-            query=query,
-            source_query=source_query,
-            source_prefix=source_prefix,
-            target_query=target_query,
-            target_prefix=target_prefix,
-            prefix=prefix,
-            sort=sort,
-            same_text=same_text,
-            provenance=provenance,
-        )
-        if offset is not None:
-            try:
-                for _ in range(offset):
-                    next(it)
-            except StopIteration:
-                # if next() fails, then there are no remaining entries.
-                # do not pass go, do not collect 200 euro $
-                return
-        if limit is None:
-            yield from it
-        else:
-            for line_prediction, _ in zip(it, range(limit)):
-                yield line_prediction
+        start = max(offset or 0, 0)
+        stop = None if limit is None else start + max(limit, 0)
+        # get the page while holding the lock, since persisting changes positions
+        with self._lock:
+            view = self._get_view(
+                query=query,
+                source_query=source_query,
+                source_prefix=source_prefix,
+                target_query=target_query,
+                target_prefix=target_prefix,
+                prefix=prefix,
+                sort=sort,
+                same_text=same_text,
+                provenance=provenance,
+            )
+            page = [(line, self._predictions[line]) for line in view[start:stop]]
+        yield from page
 
     def count_predictions_from_state(self, state: State) -> int:
         """Count the number of predictions to check for the given filters."""
@@ -299,18 +372,137 @@ class Controller:
         provenance: str | None = None,
     ) -> int:
         """Count the number of predictions to check for the given filters."""
-        it = self._help_it_predictions(
-            query=query,
-            source_query=source_query,
-            source_prefix=source_prefix,
-            target_query=target_query,
-            target_prefix=target_prefix,
-            prefix=prefix,
-            sort=sort,
-            same_text=same_text,
-            provenance=provenance,
+        # sorting doesn't change the count, so reuse the unsorted view
+        with self._lock:
+            view = self._get_view(
+                query=query,
+                source_query=source_query,
+                source_prefix=source_prefix,
+                target_query=target_query,
+                target_prefix=target_prefix,
+                prefix=prefix,
+                same_text=same_text,
+                provenance=provenance,
+            )
+        return len(view)
+
+    def _get_view(
+        self,
+        *,
+        query: str | None = None,
+        source_query: str | None = None,
+        source_prefix: str | None = None,
+        target_query: str | None = None,
+        target_prefix: str | None = None,
+        prefix: str | None = None,
+        sort: str | None = None,
+        same_text: bool | None = None,
+        provenance: str | None = None,
+    ) -> array[int]:
+        """Get the positions of the unmarked predictions that match the filters, in order.
+
+        The most recently used views are cached, so paging through a view and counting
+        it only filters the predictions once. The cache is cleared whenever predictions
+        are marked or persisted, since either changes which predictions are shown.
+        """
+        key = (
+            query,
+            source_query,
+            source_prefix,
+            target_query,
+            target_prefix,
+            prefix,
+            sort,
+            bool(same_text),
+            provenance,
         )
-        return sum(1 for _ in it)
+        view = self._views.get(key)
+        if view is not None:
+            self._views.move_to_end(key)
+            return view
+
+        if sort is None:
+            view = array(
+                "q",
+                (
+                    line
+                    for line, _ in self._help_it_predictions(
+                        query=query,
+                        source_query=source_query,
+                        source_prefix=source_prefix,
+                        target_query=target_query,
+                        target_prefix=target_prefix,
+                        prefix=prefix,
+                        same_text=same_text,
+                        provenance=provenance,
+                    )
+                ),
+            )
+        else:
+            # sort the unsorted view, which is cached for counting anyway
+            lines = self._get_view(
+                query=query,
+                source_query=source_query,
+                source_prefix=source_prefix,
+                target_query=target_query,
+                target_prefix=target_prefix,
+                prefix=prefix,
+                same_text=same_text,
+                provenance=provenance,
+            )
+            view = self._sort_lines(lines, sort)
+
+        self._views[key] = view
+        if len(self._views) > VIEW_CACHE_SIZE:
+            self._views.popitem(last=False)
+        return view
+
+    def _sort_lines(self, lines: array[int], sort: str) -> array[int]:
+        """Sort positions by walking the precomputed permutation for the sort."""
+        permutation = self._get_permutation(sort)
+        mask = bytearray(len(self._predictions))
+        for line in lines:
+            mask[line] = 1
+        return array("q", filter(mask.__getitem__, permutation))
+
+    def _get_permutation(self, sort: str) -> array[int]:
+        """Get the positions of all predictions in order for the sort, which is computed once.
+
+        :raises ValueError: if the sort is unknown
+        """
+        permutation = self._permutations.get(sort)
+        if permutation is None:
+            if sort not in SORT_KEYS:
+                raise ValueError(f"unknown sort type: {sort}")
+            key, reverse = SORT_KEYS[sort]
+            permutation = array(
+                "q",
+                sorted(
+                    range(len(self._predictions)),
+                    key=lambda line: key(self._predictions[line]),
+                    reverse=reverse,
+                ),
+            )
+            self._permutations[sort] = permutation
+        return permutation
+
+    def _remove_from_permutations(self, lines: Iterable[int]) -> None:
+        """Update the permutations after the predictions at the given positions are popped."""
+        if not self._permutations:
+            return
+        removed = set(lines)
+        new_positions = array("q")
+        shift = 0
+        for line in range(len(self._predictions) + len(removed)):
+            if line in removed:
+                new_positions.append(-1)
+                shift += 1
+            else:
+                new_positions.append(line - shift)
+        for sort, permutation in self._permutations.items():
+            self._permutations[sort] = array(
+                "q", (new_positions[line] for line in permutation if new_positions[line] >= 0)
+            )
 
     def _help_it_predictions(
         self,
@@ -320,63 +512,60 @@ class Controller:
         target_query: str | None = None,
         target_prefix: str | None = None,
         prefix: str | None = None,
-        sort: str | None = None,
         same_text: bool | None = None,
         provenance: str | None = None,
     ) -> Iterator[tuple[int, SemanticMapping]]:
-        it: Iterable[tuple[int, SemanticMapping]] = enumerate(self._predictions)
+        text_filters: list[tuple[str, tuple[Field, ...]]] = [
+            (value, fields)
+            for value, fields in [
+                (query, tuple(FIELDS)),
+                (source_prefix, ("subject_curie",)),
+                (source_query, ("subject_curie", "subject_name")),
+                (target_query, ("object_curie", "object_name")),
+                (target_prefix, ("object_curie",)),
+                (prefix, ("subject_curie", "object_curie")),
+                (provenance, ("mapping_tool",)),
+            ]
+            if value is not None
+        ]
+
+        # intersect the positions from the text index. queries that are too short to
+        # use it are checked on each remaining prediction instead
+        lines: set[int] | None = None
+        unindexed_filters = []
+        for value, fields in text_filters:
+            positions = self._get_text_index().search(value, fields)
+            if positions is None:
+                unindexed_filters.append((value, fields))
+            elif lines is None:
+                lines = set(positions)
+            else:
+                lines.intersection_update(positions)
+
         if self.target_references:
-            it = (
-                (line, p)
-                for (line, p) in it
-                if p.subject in self.target_references or p.object in self.target_references
-            )
+            index = self._get_prediction_index()
+            target_lines = {
+                line
+                for reference in self.target_references
+                for line in itt.chain(
+                    index.positions(subject=reference.curie),
+                    index.positions(object=reference.curie),
+                )
+            }
+            lines = target_lines if lines is None else lines & target_lines
 
-        if query is not None:
+        it: Iterable[tuple[int, SemanticMapping]]
+        if lines is not None:
+            it = ((line, self._predictions[line]) for line in sorted(lines))
+        else:
+            it = enumerate(self._predictions)
+
+        for value, fields in unindexed_filters:
             it = self._help_filter(
-                query,
+                value,
                 it,
-                lambda mapping: [
-                    mapping.subject.curie,
-                    mapping.subject.name,
-                    mapping.object.curie,
-                    mapping.object.name,
-                    mapping.mapping_tool,
-                ],
-            )
-        if source_prefix is not None:
-            it = self._help_filter(source_prefix, it, lambda mapping: [mapping.subject.curie])
-        if source_query is not None:
-            it = self._help_filter(
-                source_query, it, lambda mapping: [mapping.subject.curie, mapping.subject.name]
+                lambda mapping, fields=fields: [get_field(mapping, field) for field in fields],
             )
-        if target_query is not None:
-            it = self._help_filter(
-                target_query, it, lambda mapping: [mapping.object.curie, mapping.object.name]
-            )
-        if target_prefix is not None:
-            it = self._help_filter(target_prefix, it, lambda mapping: [mapping.object.curie])
-        if prefix is not None:
-            it = self._help_filter(
-                prefix, it, lambda mapping: [mapping.subject.curie, mapping.object.curie]
-            )
-        if provenance is not None:
-            it = self._help_filter(provenance, it, lambda mapping: [mapping.mapping_tool])
-
-        def _get_confidence(t: tuple[int, SemanticMapping]) -> float:
-            return t[1].confidence or 0.0
-
-        if sort is not None:
-            if sort == "desc":
-                it = iter(sorted(it, key=_get_confidence, reverse=True))
-            elif sort == "asc":
-                it = iter(sorted(it, key=_get_confidence, reverse=False))
-            elif sort == "subject":
-                it = iter(sorted(it, key=lambda l_p: l_p[1].subject.curie))
-            elif sort == "object":
-                it = iter(sorted(it, key=lambda l_p: l_p[1].object.curie))
-            else:
-                raise ValueError(f"unknown sort type: {sort}")
 
         if same_text:
             it = (
@@ -391,6 +580,22 @@ class Controller:
         rv = ((line, prediction) for line, prediction in it if line not in self._marked)
         return rv
 
+    def _get_prediction_index(self) -> MappingIndex:
+        """Get an index over the predictions, which is rebuilt after persisting."""
+        if self._prediction_index is None:
+            self._prediction_index = MappingIndex(self._predictions)
+        return self._prediction_index
+
+    def _get_text_index(self) -> TextIndex:
+        """Get an index for substring search over the predictions, which is built once.
+
+        Marking doesn't change positions and marked predictions are filtered out of
+        search results, so the index is only updated when persisting removes them.
+        """
+        if self._text_index is None:
+            self._text_index = TextIndex(self._predictions)
+        return self._text_index
+
     @staticmethod
     def _help_filter(
         query: str,
@@ -410,20 +615,59 @@ class Controller:
     def mark(self, line: int, value: Mark) -> None:
         """Mark the given equivalency as correct.
 
+        The mark is recorded in memory and in the journal right away, and is written to
+        the source files by the next :meth:`flush`. A prediction can be marked again to
+        change its mark until then. Afterwards, marking it again does nothing, e.g., when
+        a link is clicked twice or on a page that was rendered before the flush.
+
         :param line: Position of the prediction
         :param value: Value to mark the prediction with
 
+        :raises IndexError: if the line isn't the position of a prediction
         :raises ValueError: if an invalid value is used
         """
-        if line > len(self._predictions):
-            raise IndexError(
-                f"given line {line} is larger than the number of predictions {len(self._predictions):,}"
+        if value not in MARKS:
+            raise ValueError(f"illegal mark value given: {value}. Should be one of {MARKS}")
+        with self._lock:
+            # persisting removes predictions, so this is only checked under the lock
+            if not 0 <= line < len(self._predictions):
+                raise IndexError(
+                    f"given line {line} is not in the {len(self._predictions):,} predictions"
+                )
+            if line in self._flushed:
+                logger.debug("line %d was already marked and written", line)
+                return
+            author = self._get_current_author()
+            written = self._write_journal(
+                {"action": "mark", "record_id": self._predictions[line].record_id, "mark": value},
+                author,
             )
+            self._mark(line, value, author)
+            self._schedule_flush()
+        self._sync_journal(written)
+
+    def _mark(self, line: int, value: Mark, author: NamableReference) -> None:
         if line not in self._marked:
             self.total_curated += 1
-        if value not in MARKS:
-            raise ValueError(f"illegal mark value given: {value}. Should be one of {MARKS}")
         self._marked[line] = value
+        self._curators[line] = author
+        self._views.clear()
+
+    def get_line(self, record_id: str) -> int:
+        """Get the current position of a prediction from its record ID.
+
+        Unlike positions, record IDs don't change when other predictions are persisted.
+        See :attr:`biomappings.SemanticMapping.record_id`.
+
+        :param record_id: The record ID of a prediction
+        :returns: The position of the prediction
+
+        :raises KeyError: if no prediction has the record ID
+        """
+        positions = self._get_prediction_index().positions(record_id=record_id)
+        if not positions:
+            raise KeyError(record_id)
+        return positions[0]
 
     def add_mapping(
         self,
@@ -431,39 +675,234 @@ class Controller:
         obj: NormalizedNamableReference,
     ) -> None:
         """Add manually curated new mappings."""
+        author = self._get_current_author()
+        with self._lock:
+            written = self._write_journal(
+                {
+                    "action": "add",
+                    "subject": subject.curie,
+                    "subject_name": subject.name,
+                    "object": obj.curie,
+                    "object_name": obj.name,
+                },
+                author,
+            )
+            self._add_mapping(subject, obj, author)
+        self._sync_journal(written)
+
+    def _add_mapping(
+        self, subject: NamableReference, obj: NamableReference, author: NamableReference
+    ) -> None:
         self._added_mappings.append(
             SemanticMapping.model_validate(
                 {
                     "subject": subject,
                     "predicate": EXACT_MATCH,
                     "object": obj,
-                    "author": self._get_current_author(),
+                    "author": author,
                     "mapping_justification": MANUAL_MAPPING_CURATION,
                 }
             )
         )
         self.total_curated += 1
 
-    def persist(self) -> None:
-        """Save the current markings to the source files."""
-        if not self._marked:
-            # no need to persist if there are no marks
-            return None
+    def _schedule_flush(self) -> None:
+        """Flush in the background after the flush interval, unless a flush is already scheduled."""
+        if self.flush_interval is None or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write_journal(self, entry: dict[str, Any], author: NamableReference) -> int:
+        """Append an action to the journal, which is called with the lock held.
+
+        :returns: The number of actions written so far, to pass to :meth:`_sync_journal`
+            once the lock is released
+        """
+        entry = {
+            **entry,
+            "curator": author.curie,
+            "curator_name": author.name,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        with self.journal_path.open("a") as file:
+            file.write(json.dumps(entry) + "\n")
+        self._journal.append(entry)
+        self._journal_written += 1
+        return self._journal_written
+
+    def _sync_journal(self, written: int) -> None:
+        """Make sure the given number of actions are on disk, without holding the lock.
+
+        Actions written by other requests while waiting for a sync are covered by the
+        next one, so concurrent requests share a sync instead of each doing their own.
+        """
+        with self._sync_lock:
+            if self._journal_synced >= written:
+                return
+            # everything written up to here is covered by this sync
+            written = self._journal_written
+            try:
+                fd = os.open(self.journal_path, os.O_RDWR)
+            except FileNotFoundError:
+                pass  # it was rewritten without the actions, since they were flushed
+            else:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._journal_synced = written
+
+    def _rewrite_journal(self) -> None:
+        """Replace the journal with the actions that haven't been flushed yet."""
+        # the journal isn't replaced while it's being synced, and the new one is on disk
+        with self._sync_lock:
+            if not self._unresolved and not self._journal:
+                self.journal_path.unlink(missing_ok=True)
+            else:
+                with _open_atomic(self.journal_path) as file:
+                    for entry in itt.chain(self._unresolved, self._journal):
+                        file.write(json.dumps(entry) + "\n")
+            self._journal_synced = self._journal_written
+
+    def replay_journal(self) -> int:
+        """Apply and write the actions in the journal that weren't flushed before stopping.
+
+        Marks on predictions that weren't loaded, e.g., because they don't match the
+        prefixes, are kept in the journal until a controller that loads them replays
+        them. Marks on predictions that aren't in the predictions file anymore are
+        dropped. Since flushing rewrites the predictions after appending to the curated
+        files, these were already written. Curated files are merged by canonical tuple,
+        so writing an action twice doesn't add a duplicate row.
+
+        :returns: The number of actions that were replayed
+        """
+        if not self.journal_path.is_file():
+            return 0
+        with self._flush_lock, self._lock:
+            replayed = 0
+            unresolved = []
+            for text in self.journal_path.read_text().splitlines():
+                try:
+                    entry = json.loads(text)
+                except json.JSONDecodeError:
+                    # the last line might be incomplete if writing it was interrupted
+                    logger.warning("skipping incomplete journal entry: %s", text)
+                    continue
+                author = NormalizedNamableReference.from_curie(
+                    entry["curator"], name=entry["curator_name"]
+                )
+                if entry["action"] == "mark":
+                    try:
+                        line = self.get_line(entry["record_id"])
+                    except KeyError:
+                        unresolved.append(entry)
+                        continue
+                    self._mark(line, entry["mark"], author)
+                elif entry["action"] == "add":
+                    self._add_mapping(
+                        NormalizedNamableReference.from_curie(
+                            entry["subject"], name=entry["subject_name"]
+                        ),
+                        NormalizedNamableReference.from_curie(
+                            entry["object"], name=entry["object_name"]
+                        ),
+                        author,
+                    )
+                else:
+                    raise ValueError(f"unknown journal action: {entry['action']}")
+                self._journal.append(entry)
+                replayed += 1
+            self._unresolved = self._get_unwritten(unresolved)
+            self.flush()
+            # flushing doesn't rewrite the journal if there weren't any actions to write
+            self._rewrite_journal()
+        return replayed
+
+    def _get_unwritten(self, entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Get the marks on predictions that are still in the predictions file."""
+        if not entries or self.prefixes is None:
+            # all predictions were loaded, so the rest were already written
+            return []
+        record_ids = {entry["record_id"] for entry in entries}
+        remaining = {
+            mapping.record_id
+            for mapping in iter_predictions(path=self.predictions_path)
+            if mapping.record_id in record_ids
+        }
+        return [entry for entry in entries if entry["record_id"] in remaining]
+
+    def flush(self) -> None:
+        """Write the marks that haven't been written yet to the source files.
+
+        Positions don't change, so pages that were already rendered stay valid. The
+        pending marks are taken under the lock, then the files are written without
+        holding it, so predictions can be marked in the meantime. Those marks are written
+        by the next flush, while marking one of the predictions that's being written
+        does nothing, like after it's written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                marked = [
+                    (line, value)
+                    for line, value in self._marked.items()
+                    if line not in self._flushed
+                ]
+                added_mappings, self._added_mappings = self._added_mappings, []
+                if not marked and not added_mappings:
+                    return
+                journaled = len(self._journal)
+                mappings = [
+                    (self._predictions[line], value, self._curators[line]) for line, value in marked
+                ]
+                predictions = [
+                    prediction
+                    for line, prediction in enumerate(self._predictions)
+                    if line not in self._marked
+                ]
+                self._flushed.update(line for line, _ in marked)
+
+            try:
+                self._write(mappings, predictions, added_mappings)
+            except BaseException:
+                with self._lock:
+                    self._flushed.difference_update(line for line, _ in marked)
+                    self._added_mappings[:0] = added_mappings
+                raise
+
+            with self._lock:
+                # actions that were journaled while writing are kept for the next flush
+                del self._journal[:journaled]
+                self._rewrite_journal()
+
+    def flush_on_exit(self) -> None:
+        """Write marks that are still waiting for a flush when the interpreter exits.
+
+        This can be called several times, e.g., by each app made for the controller, but
+        only registers one exit handler.
+        """
+        if not self._flushes_on_exit:
+            atexit.register(self.flush)
+            self._flushes_on_exit = True
 
+    def _write(
+        self,
+        marked: list[tuple[SemanticMapping, Mark, NamableReference]],
+        predictions: list[SemanticMapping],
+        added_mappings: list[SemanticMapping],
+    ) -> None:
+        """Append the marked and added mappings to the curated files and rewrite the predictions."""
         entries: defaultdict[Literal["correct", "incorrect", "unsure"], list[SemanticMapping]] = (
             defaultdict(list)
         )
 
-        for line, value in sorted(self._marked.items(), reverse=True):
-            try:
-                mapping = self._predictions.pop(line)
-            except IndexError:
-                raise IndexError(
-                    f"you tried popping the {line} element from the predictions list, which only has {len(self._predictions):,} elements"
-                ) from None
-
+        for mapping, value, author in marked:
             update: dict[str, str | NamableReference] = {
-                "author": self._get_current_author(),
+                "author": author,
                 "mapping_justification": MANUAL_MAPPING_CURATION,
             }
 
@@ -493,24 +932,40 @@ class Controller:
         # no need to standardize since we assume everything was correct on load.
         # only write files that have some valies to go in them!
         if entries["correct"]:
-            append_true_mappings(
-                entries["correct"], path=self.positives_path, sort=True, standardize=False
-            )
+            append_true_mappings(entries["correct"], path=self.positives_path, merge=True)
         if entries["incorrect"]:
-            append_false_mappings(
-                entries["incorrect"], path=self.negatives_path, sort=True, standardize=False
-            )
+            append_false_mappings(entries["incorrect"], path=self.negatives_path, merge=True)
         if entries["unsure"]:
-            append_unsure_mappings(
-                entries["unsure"], path=self.unsure_path, sort=True, standardize=False
-            )
-        write_predictions(self._predictions, path=self.predictions_path)
-        self._marked.clear()
+            append_unsure_mappings(entries["unsure"], path=self.unsure_path, merge=True)
+        if marked:
+            write_predictions(predictions, path=self.predictions_path, prefixes=self.prefixes)
 
         # Now add manually curated mappings, if there are any
-        if self._added_mappings:
-            append_true_mappings(self._added_mappings, path=self.positives_path, standardize=False)
-            self._added_mappings = []
+        if added_mappings:
+            append_true_mappings(added_mappings, path=self.positives_path, merge=True)
+
+    def persist(self) -> None:
+        """Save the current markings to the source files, then remove them from the predictions.
+
+        Unlike :meth:`flush`, this changes the positions of predictions, so it holds the
+        lock until it's done.
+        """
+        with self._flush_lock, self._lock:
+            self.flush()
+            if not self._marked:
+                # no need to update positions if there are no marks
+                return
+
+            for line in sorted(self._marked, reverse=True):
+                self._predictions.pop(line)
+            self._prediction_index = None
+            if self._text_index is not None:
+                self._text_index.remove(self._marked)
+            self._remove_from_permutations(self._marked)
+            self._marked.clear()
+            self._curators.clear()
+            self._flushed.clear()
+            self._views.clear()
 
 
 CONTROLLER: Controller = cast(Controller, LocalProxy(lambda: current_app.config["controller"]))
@@ -611,6 +1066,7 @@ def add_mapping() -> werkzeug.Response:
 @blueprint.route("/commit")
 def run_commit() -> werkzeug.Response:
     """Make a commit then redirect to the home page."""
+    CONTROLLER.persist()
     commit_info = commit(
         f"Curated {CONTROLLER.total_curated} mapping"
         f"{'s' if CONTROLLER.total_curated > 1 else ''}"
@@ -653,7 +1109,6 @@ def _normalize_mark(value: str) -> Mark:
 def mark(line: int, value: str) -> werkzeug.Response:
     """Mark the given line as correct or not."""
     CONTROLLER.mark(line, _normalize_mark(value))
-    CONTROLLER.persist()
     return _go_home()
 
 
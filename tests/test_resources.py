@@ -0,0 +1,912 @@
+"""Tests for loading and writing resources."""
+
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import pystow
+from bioregistry import NormalizedNamableReference as Reference
+from curies import NamableReference
+
+from biomappings import resources, testing
+from biomappings.resources import (
+    SemanticMapping,
+    _from_curie,
+    _get_columns,
+    _get_journal_path,
+    _get_writer,
+    _open_journaled,
+    _recover_journal,
+    _remove_redundant,
+    append_predictions,
+    append_true_mappings,
+    cache,
+    external,
+    filter_predictions,
+    get_curated_filter,
+    index,
+    iter_mappings,
+    lint_false_mappings,
+    lint_predictions,
+    lint_true_mappings,
+    lint_unsure_mappings,
+    load_false_mappings,
+    load_mappings,
+    load_predictions,
+    load_unsure,
+    mapping_sort_key,
+    parallel,
+    write_false_mappings,
+    write_predictions,
+    write_true_mappings,
+    write_unsure_mappings,
+)
+from biomappings.resources.incremental import get_changed_rows, lint_changed
+from biomappings.resources.index import contains
+from biomappings.resources.lint import lint_all
+from biomappings.resources.pending import (
+    compact_predictions,
+    get_pending_directory,
+    iter_pending,
+    lock,
+)
+from biomappings.resources.shards import read_manifest, shard_predictions
+from biomappings.resources.store import MappingStore
+from biomappings.resources.table import MappingTable
+from biomappings.utils import (
+    EXACT_MATCH,
+    LEXICAL_MATCHING_PROCESS,
+    MANUAL_MAPPING_CURATION,
+    NARROW_MATCH,
+    get_canonical_tuple,
+)
+
+TEST_USER = Reference(prefix="orcid", identifier="0000-0000-0000-0000")
+
+
+def _mapping(subject: str, obj: str) -> SemanticMapping:
+    return SemanticMapping(
+        subject=Reference.from_curie(subject),
+        predicate=EXACT_MATCH,
+        object=Reference.from_curie(obj),
+        mapping_justification=MANUAL_MAPPING_CURATION,
+        author=TEST_USER,
+    )
+
+
+#: The prefix pairs of the fixture mappings, with each pair in both directions
+PREFIX_PAIRS = [("chebi", "mesh"), ("doid", "mesh"), ("mesh", "chebi")]
+
+
+def _curie(prefix: str, identifier: int) -> str:
+    return f"mesh:C{identifier:06}" if prefix == "mesh" else f"{prefix}:{identifier}"
+
+
+def _get_mappings(n: int = 300, *, start: int = 1) -> list[SemanticMapping]:
+    """Get curated mappings to test with, including redundant ones."""
+    rv = []
+    for i in range(n):
+        subject_prefix, object_prefix = PREFIX_PAIRS[i % len(PREFIX_PAIRS)]
+        # identifiers repeat, so some mappings are the same as others or their flips
+        identifier = start + i % 200
+        rv.append(
+            SemanticMapping(
+                subject=Reference.from_curie(
+                    _curie(subject_prefix, identifier),
+                    name=f"name {identifier}" if i % 2 else None,
+                ),
+                predicate=NARROW_MATCH if i % 7 == 0 else EXACT_MATCH,
+                object=Reference.from_curie(_curie(object_prefix, identifier)),
+                mapping_justification=MANUAL_MAPPING_CURATION,
+                author=None if i % 4 == 0 else TEST_USER,
+                mapping_tool=f"tool{i % 3}" if i % 5 else None,
+            )
+        )
+    return rv
+
+
+class _TemporaryTestCase(unittest.TestCase):
+    """A test case with fixtures, the cache, and the canonical index in a temporary directory."""
+
+    def setUp(self) -> None:
+        """Set up the test case with a temporary directory."""
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_directory.cleanup)
+        self.directory = Path(self.temporary_directory.name)
+        for patch in [
+            mock.patch.object(cache, "CACHE_MODULE", pystow.Module(self.directory / "cache")),
+            mock.patch.object(index, "INDEX_PATH", self.directory / "canonical_index.sqlite"),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.mappings = _get_mappings()
+        self.positives_path = self.directory.joinpath("fixture-positive.sssom.tsv")
+        write_true_mappings(self.mappings, path=self.positives_path)
+        self.negatives_path = self.directory.joinpath("fixture-negative.sssom.tsv")
+        write_false_mappings(_get_mappings(100, start=1000), path=self.negatives_path)
+        self.unsure_path = self.directory.joinpath("fixture-unsure.sssom.tsv")
+        write_unsure_mappings(_get_mappings(50, start=2000), path=self.unsure_path)
+
+
+class TestLoad(_TemporaryTestCase):
+    """Test loading resources."""
+
+    def test_trusted(self) -> None:
+        """Test that trusted loading gives the same result as validated loading."""
+        for func, path in [
+            (load_mappings, self.positives_path),
+            (load_false_mappings, self.negatives_path),
+        ]:
+            with self.subTest(func=func.__name__):
+                validated = func(path=path, cache=False)
+                trusted = func(path=path, trusted=True, cache=False)
+                self.assertEqual(validated, trusted)
+                self.assertEqual(
+                    [mapping.model_dump() for mapping in validated],
+                    [mapping.model_dump() for mapping in trusted],
+                )
+
+    def test_iter(self) -> None:
+        """Test that iterating gives the same result as loading."""
+        for trusted in [False, True]:
+            with self.subTest(trusted=trusted):
+                self.assertEqual(
+                    load_mappings(path=self.positives_path, trusted=trusted, cache=False),
+                    list(iter_mappings(path=self.positives_path, trusted=trusted)),
+                )
+
+    def test_load_all(self) -> None:
+        """Test loading all resources in parallel gives the same result as loading each."""
+        # use the positive mappings in place of the predictions, which are the biggest
+        expected = (
+            load_mappings(path=self.positives_path),
+            load_false_mappings(path=self.negatives_path),
+            load_unsure(path=self.unsure_path),
+            load_mappings(path=self.positives_path),
+        )
+        # make chunks small so the file is split across workers
+        with mock.patch.object(parallel, "MIN_CHUNK_SIZE", 1 << 10):
+            for executor in ["process", "thread"]:
+                with self.subTest(executor=executor):
+                    self.assertEqual(
+                        expected,
+                        parallel.load_all(
+                            executor=executor,
+                            max_workers=2,
+                            cache=False,
+                            positives_path=self.positives_path,
+                            negatives_path=self.negatives_path,
+                            unsure_path=self.unsure_path,
+                            predictions_path=self.positives_path,
+                        ),
+                    )
+
+    def test_lazy_import(self) -> None:
+        """Test importing the package doesn't import the cache, which creates a directory."""
+        code = (
+            "import sys, biomappings\n"
+            "assert 'biomappings.resources.cache' not in sys.modules\n"
+            "assert biomappings.load_all is biomappings.resources.parallel.load_all\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)  # noqa:S603
+
+    def test_chunks(self) -> None:
+        """Test splitting a file into chunks at line boundaries."""
+        with mock.patch.object(parallel, "MIN_CHUNK_SIZE", 1 << 10):
+            chunks = parallel._get_chunks(self.positives_path, 1_000_000)
+        self.assertLess(1, len(chunks))
+        data = self.positives_path.read_bytes()
+        self.assertEqual(data.index(b"\n") + 1, chunks[0][0])
+        self.assertEqual(len(data), chunks[-1][1])
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(b"\n"[0], data[start - 1])
+
+    def test_journal(self) -> None:
+        """Test interrupted appends are rolled back."""
+        path = self.directory.joinpath("positive.sssom.tsv")
+        mappings = [_mapping("chebi:1", "mesh:C000001")]
+        write_true_mappings(mappings, path=path)
+        original = path.read_bytes()
+
+        # interrupted in process, so it's rolled back right away
+        with self.assertRaises(KeyboardInterrupt), _open_journaled(path) as file:
+            file.write("chebi:2\tpartial")
+            file.flush()
+            raise KeyboardInterrupt
+        self.assertEqual(original, path.read_bytes())
+        self.assertFalse(_get_journal_path(path).exists())
+
+        # an append that's still running holds the lock on the journal, so it isn't
+        # rolled back by reading or writing
+        _, to_row = _get_columns("curated")
+        with _open_journaled(path) as file:
+            _get_writer(file).writerow(to_row(_mapping("chebi:2", "mesh:C000002")))
+            file.flush()
+            appended = path.read_bytes()
+            _recover_journal(path)
+            self.assertEqual(2, len(load_mappings(path=path, cache=False)))
+            self.assertEqual(appended, path.read_bytes())
+            self.assertTrue(_get_journal_path(path).exists())
+        self.assertEqual(appended, path.read_bytes())
+        self.assertFalse(_get_journal_path(path).exists())
+
+        # the process died, which released the lock, so it's rolled back on the next write
+        _get_journal_path(path).write_text(str(len(original)))
+        self.assertEqual(2, len(load_mappings(path=path, cache=False)))
+        self.assertTrue(_get_journal_path(path).exists())
+        append_true_mappings([], path=path)
+        self.assertEqual(original, path.read_bytes())
+        self.assertFalse(_get_journal_path(path).exists())
+
+    def test_compression(self) -> None:
+        """Test reading and writing compressed predictions based on the extension."""
+        predictions = [
+            _mapping(f"chebi:{i % 20}", f"mesh:C{i % 20:06}").model_copy(
+                update={"author": None, "confidence": i / 30, "mapping_tool": "x"}
+            )
+            for i in range(30)
+        ]
+        expected_path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(predictions[:10], path=expected_path)
+        append_predictions(predictions[10:], path=expected_path, deduplicate=False, sort=False)
+        lint_predictions(path=expected_path, standardize=False)
+        expected = load_predictions(path=expected_path, cache=False)
+
+        for suffix, magic in [(".gz", b"\x1f\x8b"), (".xz", b"\xfd7zXZ")]:
+            for memory_budget in [None, 1_000]:
+                with self.subTest(suffix=suffix, memory_budget=memory_budget):
+                    path = self.directory.joinpath(f"predictions{memory_budget}.sssom.tsv{suffix}")
+                    write_predictions(predictions[:10], path=path)
+                    append_predictions(predictions[10:], path=path, deduplicate=False, sort=False)
+                    lint_predictions(path=path, standardize=False, memory_budget=memory_budget)
+                    self.assertTrue(path.read_bytes().startswith(magic))
+                    self.assertEqual(expected, load_predictions(path=path, cache=False))
+                    resources = parallel.load_all(
+                        cache=False,
+                        positives_path=path,
+                        negatives_path=path,
+                        unsure_path=path,
+                        predictions_path=path,
+                    )
+                    self.assertEqual(expected, resources.predictions)
+
+    def test_lint_predictions_external(self) -> None:
+        """Test out-of-core linting gives the same result as linting in memory."""
+        predictions = [
+            mapping.model_copy(update={"author": None, "confidence": 0.5, "mapping_tool": "x"})
+            for mapping in self.mappings[:50]
+        ]
+        for i in range(300):
+            prediction = _mapping(f"chebi:{i % 200}", f"mesh:C{i % 200:06}").model_copy(
+                update={"author": None, "confidence": i / 300, "mapping_tool": f"tool{i % 3}"}
+            )
+            # flip some, so they're redundant in the other direction
+            predictions.append(prediction.flip() if i % 7 == 0 else prediction)
+
+        expected_path = self.directory.joinpath("expected.sssom.tsv")
+        write_predictions(predictions, path=expected_path)
+        lint_predictions(path=expected_path, standardize=False)
+
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(predictions, path=path)
+        lint_predictions(path=path, standardize=False, memory_budget=10_000)
+        self.assertEqual(expected_path.read_text(), path.read_text())
+
+        # with more runs than can be merged at once, they're merged in several passes
+        write_predictions(predictions, path=path)
+        with mock.patch.object(external, "MAX_FAN_IN", 3):
+            lint_predictions(path=path, standardize=False, memory_budget=2_000)
+        self.assertEqual(expected_path.read_text(), path.read_text())
+
+    def test_construct(self) -> None:
+        """Test that constructing without validation gives the same state as validating."""
+        reference_keys = ["subject", "predicate", "object", "mapping_justification", "author"]
+        for func in [load_mappings, load_false_mappings, load_unsure]:
+            with self.subTest(func=func.__name__):
+                validated = func()
+                trusted = func(trusted=True)
+                self.assertEqual(len(validated), len(trusted))
+                for expected, mapping in zip(validated, trusted):
+                    self.assertEqual(expected.__getstate__(), mapping.__getstate__())
+                    for key in reference_keys:
+                        reference = getattr(mapping, key)
+                        if reference is not None:
+                            self.assertEqual(
+                                getattr(expected, key).__getstate__(), reference.__getstate__()
+                            )
+
+    def test_memoized_normalization(self) -> None:
+        """Test memoized normalization gives the same references as validation."""
+        for curie in ["CHEBI:1234", "chebi:1234", "MeSH:C000001", "skos:exactMatch"]:
+            for name in [None, "name"]:
+                with self.subTest(curie=curie, name=name):
+                    expected = Reference.from_curie(curie, name=name)
+                    for _ in range(2):
+                        reference = _from_curie(Reference, curie, name=name)
+                        self.assertEqual(expected.model_dump(), reference.model_dump())
+        for curie in ["nope:1234", "chebi:abc", "chebi"]:
+            with self.subTest(curie=curie), self.assertRaises(ValueError):
+                _from_curie(Reference, curie)
+
+    def test_cache(self) -> None:
+        """Test that the cache returns the same mappings and is invalidated on write."""
+        path = self.directory.joinpath("positive.sssom.tsv")
+        first = [_mapping("chebi:1", "mesh:C000001"), _mapping("chebi:2", "mesh:C000002")]
+        write_true_mappings(first, path=path)
+        # caching is opt-in
+        self.assertEqual(first, load_mappings(path=path))
+        self.assertEqual([], list(self.directory.joinpath("cache").glob("*.pkl")))
+        self.assertEqual(first, load_mappings(path=path, cache=True))
+        # this time, it's read from the cache without hashing the file
+        with mock.patch.object(cache, "_get_digest", side_effect=AssertionError):
+            self.assertEqual(first, load_mappings(path=path, cache=True))
+        # touching the file means it's hashed, but the entry is still used
+        os.utime(path, ns=(0, 0))
+        with mock.patch.object(resources, "_parse_table", side_effect=AssertionError):
+            self.assertEqual(first, load_mappings(path=path, cache=True))
+
+        second = [_mapping("chebi:3", "mesh:C000003")]
+        write_true_mappings(second, path=path)
+        self.assertEqual(second, load_mappings(path=path, cache=True))
+
+        # entries that can't be unpickled, e.g., after a class changed, are misses
+        self.assertEqual(1, len(list(self.directory.joinpath("cache").glob("*.pkl"))))
+        with mock.patch("pickle.load", side_effect=AttributeError):
+            self.assertEqual(second, load_mappings(path=path, cache=True))
+
+    def test_merge(self) -> None:
+        """Test that merging gives the same result as appending then linting."""
+        # files are linted before merging, so they don't have redundant rows
+        mappings = list(_remove_redundant(self.mappings))
+        existing, new = mappings[::2], mappings[1::2]
+        # a duplicate by a non-curator, which should lose to the existing row
+        new.append(existing[0].model_copy(update={"author": None}))
+        # a flipped duplicate by a curator, which should replace a row by a non-curator
+        new.append(_mapping(existing[1].object.curie, existing[1].subject.curie))
+        existing[1] = existing[1].model_copy(update={"author": None})
+
+        expected_path = self.directory.joinpath("expected.sssom.tsv")
+        write_true_mappings(existing, path=expected_path)
+        append_true_mappings(new, path=expected_path, standardize=False)
+
+        path = self.directory.joinpath("positive.sssom.tsv")
+        write_true_mappings(existing, path=path)
+        append_true_mappings(new, path=path, merge=True)
+        self.assertEqual(expected_path.read_text(), path.read_text())
+
+    def test_record_ids(self) -> None:
+        """Test record IDs are stable and can be persisted in a column."""
+        mapping = _mapping("chebi:1", "mesh:C000001")
+        self.assertEqual(16, len(mapping.record_id))
+        # the ID is computed once, but it isn't a field
+        self.assertIs(mapping.record_id, mapping.record_id)
+        self.assertNotIn("record_id", mapping.model_dump())
+        self.assertEqual(_mapping("chebi:1", "mesh:C000001"), mapping)
+        self.assertEqual(mapping.record_id, mapping.flip().record_id)
+        self.assertEqual(
+            mapping.record_id, mapping.model_copy(update={"mapping_tool": "x"}).record_id
+        )
+        narrow = mapping.model_copy(update={"predicate": NARROW_MATCH})
+        self.assertNotEqual(mapping.record_id, narrow.record_id)
+        self.assertNotEqual(
+            narrow.record_id,
+            narrow.model_copy(
+                update={"subject": mapping.object, "object": mapping.subject}
+            ).record_id,
+        )
+
+        path = self.directory.joinpath("positive.sssom.tsv")
+        write_true_mappings([mapping], path=path, record_ids=True)
+        # appending, merging, and linting keep the column
+        append_true_mappings([_mapping("chebi:2", "mesh:C000002")], path=path, standardize=False)
+        append_true_mappings([_mapping("chebi:3", "mesh:C000003")], path=path, merge=True)
+        lint_true_mappings(path=path, standardize=False)
+        mappings = load_mappings(path=path, cache=False)
+        self.assertEqual(3, len(mappings))
+        with path.open() as file:
+            rows = list(csv.DictReader(file, delimiter="\t"))
+        self.assertEqual(
+            [mapping.record_id for mapping in mappings], [row["record_id"] for row in rows]
+        )
+
+        store = MappingStore(mappings={"positive": mappings})
+        self.assertEqual([mappings[1]], store.get(record_id=mappings[1].record_id))
+
+    def test_index(self) -> None:
+        """Test the canonical index is updated by writers and when files change."""
+        path = self.directory.joinpath("positive.sssom.tsv")
+        first, second, third = (
+            _mapping("chebi:1", "mesh:C000001"),
+            _mapping("chebi:2", "mesh:C000002"),
+            _mapping("chebi:3", "mesh:C000003"),
+        )
+        canonical_tuples = [get_canonical_tuple(m) for m in (first, second, third)]
+        # rewriting a file only invalidates it, so it's indexed on the next lookup
+        with mock.patch.object(index, "_insert_keys", side_effect=AssertionError):
+            write_true_mappings([first], path=path)
+        self.assertEqual({canonical_tuples[0]}, contains([path], canonical_tuples))
+
+        # appending updates the index without reading the file again
+        append_true_mappings([second], path=path, merge=True)
+        with mock.patch.object(index, "_iter_raw_rows", side_effect=AssertionError):
+            self.assertEqual(set(canonical_tuples[:2]), contains([path], canonical_tuples))
+
+        # the file is changed outside of biomappings, so the index is rebuilt
+        with path.open("a") as file:
+            print(*third.as_curated_row(), sep="\t", file=file)
+        self.assertEqual(set(canonical_tuples), contains([path], canonical_tuples))
+        # flipped mappings have the same canonical tuple
+        self.assertEqual(
+            {canonical_tuples[0]},
+            contains([path], [get_canonical_tuple(_mapping("mesh:C000001", "chebi:1"))]),
+        )
+
+    def test_shards(self) -> None:
+        """Test storing predictions in a directory of shards, by canonical prefix pair."""
+        predictions = [
+            _mapping(subject, obj).model_copy(
+                update={"author": None, "confidence": 0.5, "mapping_tool": "x"}
+            )
+            for subject, obj in [
+                ("chebi:1", "mesh:C000001"),
+                ("mesh:C000002", "chebi:2"),
+                ("doid:1", "mesh:C000003"),
+            ]
+        ]
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(predictions, path=path)
+        directory = self.directory.joinpath("predictions")
+        shard_predictions(directory, path=path)
+        self.assertEqual({("chebi", "mesh"): 2, ("doid", "mesh"): 1}, read_manifest(directory))
+        self.assertEqual(load_predictions(path=path), load_predictions(path=directory))
+        self.assertEqual(predictions[2:], load_predictions(path=directory, prefixes={"doid"}))
+        self.assertEqual(predictions[2:], load_predictions(path=path, prefixes={"doid"}))
+        resources = parallel.load_all(
+            positives_path=path, negatives_path=path, unsure_path=path, predictions_path=directory
+        )
+        self.assertEqual(load_predictions(path=path), resources.predictions)
+
+        # appending only touches the shards for the new predictions
+        chebi_shard = directory.joinpath("chebi", "mesh.sssom.tsv")
+        chebi_stat = chebi_shard.stat()
+        new = predictions[2].model_copy(update={"object": Reference.from_curie("mesh:C000004")})
+        append_predictions([new], path=directory, standardize=False)
+        self.assertEqual(chebi_stat, chebi_shard.stat())
+        self.assertEqual({("chebi", "mesh"): 2, ("doid", "mesh"): 2}, read_manifest(directory))
+        self.assertEqual([predictions[2], new], load_predictions(path=directory, prefixes={"doid"}))
+
+        # replacing the predictions for some prefixes leaves the rest
+        write_predictions([], path=directory, prefixes={"doid"})
+        self.assertEqual({("chebi", "mesh"): 2}, read_manifest(directory))
+        self.assertEqual(chebi_stat, chebi_shard.stat())
+        write_predictions([], path=path, prefixes={"doid"})
+        self.assertEqual(load_predictions(path=path), load_predictions(path=directory))
+
+    def test_lint_shards_standardize(self) -> None:
+        """Test that standardizing moves predictions to the shard for their new prefix pair."""
+        predictions = [
+            _mapping(subject, obj).model_copy(
+                update={"author": None, "confidence": 0.5, "mapping_tool": "x"}
+            )
+            for subject, obj in [("ncbitaxon:9606", "mesh:D006801"), ("doid:1", "mesh:C000001")]
+        ]
+        # not standardized, so it's in a shard for mesh and taxonomy
+        legacy = predictions[0].model_copy(
+            update={
+                "subject": NamableReference.from_curie("taxonomy:9605"),
+                "object": NamableReference.from_curie("mesh:D006802"),
+            }
+        )
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions([*predictions, legacy], path=path)
+        directory = self.directory.joinpath("predictions")
+        shard_predictions(directory, path=path)
+        self.assertEqual(
+            {("mesh", "ncbitaxon"): 1, ("doid", "mesh"): 1, ("mesh", "taxonomy"): 1},
+            read_manifest(directory),
+        )
+
+        lint_predictions(path=directory, standardize=True, curated_paths=[])
+        self.assertEqual({("mesh", "ncbitaxon"): 2, ("doid", "mesh"): 1}, read_manifest(directory))
+        self.assertFalse(directory.joinpath("mesh", "taxonomy.sssom.tsv").exists())
+        lint_predictions(path=path, standardize=True, curated_paths=[])
+        self.assertEqual(load_predictions(path=path), load_predictions(path=directory))
+
+        # appending puts the prediction in the shard for its standardized prefix pair
+        append_predictions(
+            [legacy.model_copy(update={"subject": NamableReference.from_curie("taxonomy:9604")})],
+            path=directory,
+            deduplicate=False,
+            sort=False,
+        )
+        self.assertEqual({("mesh", "ncbitaxon"): 3, ("doid", "mesh"): 1}, read_manifest(directory))
+
+    def test_curated_filter(self) -> None:
+        """Test the curated filter has the canonical tuples of all curated mappings."""
+        expected = frozenset(
+            get_canonical_tuple(mapping)
+            for path in [self.positives_path, self.negatives_path, self.unsure_path]
+            for mapping in load_mappings(path=path)
+        )
+        for name, path in [
+            ("POSITIVES_SSSOM_PATH", self.positives_path),
+            ("NEGATIVES_SSSOM_PATH", self.negatives_path),
+            ("UNSURE_SSSOM_PATH", self.unsure_path),
+        ]:
+            patch = mock.patch.object(resources, name, path)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.assertEqual(expected, get_curated_filter())
+
+    def test_filter_predictions(self) -> None:
+        """Test filtering predictions keeps every curated pair for the same source."""
+        predictions = [
+            _mapping(subject, obj).model_copy(
+                update={"author": None, "confidence": 0.5, "mapping_tool": "x"}
+            )
+            for subject, obj in [
+                ("chebi:1", "mesh:C000001"),
+                ("chebi:1", "mesh:C000002"),
+                ("mesh:C000003", "chebi:1"),
+                ("doid:1", "mesh:C000004"),
+            ]
+        ]
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(predictions, path=path)
+        directory = self.directory.joinpath("predictions")
+        shard_predictions(directory, path=path)
+        doid_shard = directory.joinpath("doid", "mesh.sssom.tsv")
+        doid_stat = doid_shard.stat()
+
+        # the old nested filter could only hold one of these, and was directional
+        curated = frozenset(
+            get_canonical_tuple(_mapping(subject, obj))
+            for subject, obj in [("chebi:1", "mesh:C000001"), ("chebi:1", "mesh:C000003")]
+        )
+        self.assertTrue(filter_predictions(curated, path=path))
+        self.assertEqual([predictions[1], predictions[3]], load_predictions(path=path))
+        self.assertFalse(filter_predictions(curated, path=path))
+
+        self.assertTrue(filter_predictions(curated, path=directory))
+        self.assertEqual(load_predictions(path=path), load_predictions(path=directory))
+        self.assertEqual({("chebi", "mesh"): 1, ("doid", "mesh"): 1}, read_manifest(directory))
+        self.assertEqual(doid_stat, doid_shard.stat())
+
+        self.assertTrue(filter_predictions({"doid": {"mesh": {"1": "C000004"}}}, path=path))
+        self.assertEqual([predictions[1]], load_predictions(path=path))
+
+    def test_pending(self) -> None:
+        """Test staging predictions from concurrent jobs, then compacting them."""
+        predictions = [
+            _mapping(f"chebi:{i}", f"mesh:C{i:06}").model_copy(
+                update={"author": None, "confidence": 0.5, "mapping_tool": "x"}
+            )
+            for i in range(1, 13)
+        ]
+        expected_path = self.directory.joinpath("expected.sssom.tsv")
+        write_predictions(predictions, path=expected_path)
+        lint_predictions(path=expected_path, standardize=False)
+
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(predictions[:3], path=path)
+        original = path.read_bytes()
+        with ThreadPoolExecutor(3) as pool:
+            futures = [
+                pool.submit(
+                    append_predictions, predictions[3 * i : 3 * i + 3], path=path, pending=True
+                )
+                for i in range(1, 4)
+            ]
+            for future in futures:
+                future.result()
+        self.assertEqual(original, path.read_bytes())
+        self.assertEqual(9, len(list(iter_pending(path))))
+
+        self.assertEqual(9, compact_predictions(path=path, standardize=False))
+        self.assertEqual(expected_path.read_bytes(), path.read_bytes())
+        self.assertEqual([], list(iter_pending(path)))
+        self.assertEqual(0, compact_predictions(path=path, standardize=False))
+
+    def test_lock(self) -> None:
+        """Test that rewriting the predictions waits for the lock held by another thread."""
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        predictions = [
+            _mapping(f"chebi:{i}", f"mesh:C{i:06}").model_copy(update={"author": None})
+            for i in range(1, 3)
+        ]
+        with ThreadPoolExecutor(1) as pool:
+            with lock(path):
+                # the lock is re-entrant in the same thread
+                write_predictions(predictions[:1], path=path)
+                future = pool.submit(write_predictions, predictions, path=path)
+                with self.assertRaises(futures.TimeoutError):
+                    future.result(timeout=0.2)
+                self.assertEqual(predictions[:1], load_predictions(path=path, cache=False))
+            future.result()
+        self.assertEqual(predictions, load_predictions(path=path, cache=False))
+        # only staging creates the directory of batches
+        self.assertFalse(get_pending_directory(path).exists())
+
+        with lock(path, shared=True), self.assertRaises(RuntimeError):
+            lint_predictions(path=path, standardize=False)
+
+    def test_lint_all(self) -> None:
+        """Test linting everything at once gives the same result as linting each file."""
+        positives = [_mapping("chebi:2", "mesh:C000002"), _mapping("chebi:1", "mesh:C000001")]
+        # a flipped duplicate, which is redundant
+        positives.append(_mapping("mesh:C000001", "chebi:1"))
+        negatives = [_mapping("chebi:3", "mesh:C000003")]
+        unsure = [_mapping("chebi:4", "mesh:C000004")]
+        predictions = [
+            _mapping(subject, obj).model_copy(
+                update={"author": None, "confidence": 0.5, "mapping_tool": "x"}
+            )
+            for subject, obj in [
+                ("chebi:6", "mesh:C000006"),
+                ("mesh:C000003", "chebi:3"),  # already curated
+                ("chebi:5", "mesh:C000005"),
+            ]
+        ]
+        paths = {}
+        for name in ["expected", "actual"]:
+            paths[name] = [
+                self.directory.joinpath(f"{name}-{kind}.sssom.tsv")
+                for kind in ["positive", "negative", "unsure", "predictions"]
+            ]
+            # write the files unsorted and with duplicates, like after appending
+            for path, mappings, t in zip(
+                paths[name],
+                [positives, negatives, unsure, predictions],
+                ["curated", "curated", "curated", "predicted"],
+            ):
+                with path.open("w") as file:
+                    writer = _get_writer(file)
+                    header, to_row = _get_columns(t)
+                    writer.writerow(header)
+                    writer.writerows(map(to_row, mappings))
+
+        expected_paths = paths["expected"]
+        lint_true_mappings(path=expected_paths[0], standardize=False)
+        lint_false_mappings(path=expected_paths[1], standardize=False)
+        lint_unsure_mappings(path=expected_paths[2], standardize=False)
+        lint_predictions(
+            path=expected_paths[3],
+            additional_curated_mappings=[*positives, *negatives, *unsure],
+            standardize=False,
+        )
+
+        kwargs = dict(
+            zip(
+                ["positives_path", "negatives_path", "unsure_path", "predictions_path"],
+                paths["actual"],
+            )
+        )
+        # a copy to lint out-of-core, which doesn't parse the curated files again
+        in_place_kwargs = {}
+        for key, path in kwargs.items():
+            in_place_kwargs[key] = self.directory.joinpath(f"in-place-{path.name}")
+            shutil.copy(path, in_place_kwargs[key])
+        with mock.patch.object(external, "_iter_raw_rows", side_effect=AssertionError):
+            lint_all(standardize=False, memory_budget=1_000, **in_place_kwargs)
+        for expected_path, path in zip(expected_paths, in_place_kwargs.values()):
+            self.assertEqual(expected_path.read_text(), path.read_text())
+
+        before = [path.read_bytes() for path in paths["actual"]]
+        self.assertEqual(
+            [paths["actual"][0], paths["actual"][3]],
+            lint_all(standardize=False, check=True, **kwargs),
+        )
+        # check mode doesn't write anything
+        self.assertEqual(before, [path.read_bytes() for path in paths["actual"]])
+
+        lint_all(standardize=False, **kwargs)
+        for expected_path, path in zip(expected_paths, paths["actual"]):
+            self.assertEqual(expected_path.read_text(), path.read_text())
+        self.assertEqual([], lint_all(standardize=False, check=True, **kwargs))
+
+    def test_lint_changed(self) -> None:
+        """Test linting the rows changed since the last commit gives the same as linting all."""
+        directory = self.directory.joinpath("repository")
+        directory.mkdir()
+        kwargs = {
+            f"{kind}_path": directory.joinpath(f"{kind}.sssom.tsv")
+            for kind in ["positives", "negatives", "unsure", "predictions"]
+        }
+        write_true_mappings(
+            [_mapping("chebi:1", "mesh:C000001"), _mapping("chebi:3", "mesh:C000003")],
+            path=kwargs["positives_path"],
+        )
+        write_false_mappings([_mapping("chebi:4", "mesh:C000004")], path=kwargs["negatives_path"])
+        write_unsure_mappings([_mapping("chebi:5", "mesh:C000005")], path=kwargs["unsure_path"])
+        predictions = [
+            _mapping(subject, obj).model_copy(
+                update={
+                    "author": None,
+                    "confidence": 0.5,
+                    "mapping_tool": "x",
+                    "mapping_justification": LEXICAL_MATCHING_PROCESS,
+                }
+            )
+            for subject, obj in [("chebi:6", "mesh:C000006"), ("chebi:7", "mesh:C000007")]
+        ]
+        write_predictions(predictions, path=kwargs["predictions_path"])
+        for args in [("init", "-q"), ("add", "."), ("commit", "-q", "-m", "initial")]:
+            subprocess.run(  # noqa:S603
+                ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],  # noqa:S607
+                cwd=directory,
+                check=True,
+            )
+
+        # curate a prediction, with a non-standard prefix, and add an unsorted prediction
+        with kwargs["positives_path"].open("a") as file:
+            print(*_mapping("CHEBI:7", "mesh:C000007").as_curated_row(), sep="\t", file=file)
+        with kwargs["predictions_path"].open("a") as file:
+            print(
+                *predictions[0]
+                .model_copy(update={"object": Reference.from_curie("mesh:C000002")})
+                .as_predicted_row(),
+                sep="\t",
+                file=file,
+            )
+        self.assertEqual(
+            [(4, kwargs["positives_path"].read_text().splitlines(keepends=True)[-1])],
+            get_changed_rows(kwargs["positives_path"]),
+        )
+
+        expected_directory = self.directory.joinpath("expected")
+        shutil.copytree(directory, expected_directory, ignore=shutil.ignore_patterns(".git"))
+        expected_kwargs = {
+            key: expected_directory.joinpath(path.name) for key, path in kwargs.items()
+        }
+        lint_all(**expected_kwargs)
+
+        self.assertEqual(
+            [kwargs["positives_path"], kwargs["predictions_path"]], lint_changed(**kwargs)
+        )
+        for key, path in kwargs.items():
+            self.assertEqual(expected_kwargs[key].read_text(), path.read_text())
+
+        # the incremental validation test case passes
+        test_case = type("TestChanged", (testing.ChangedIntegrityTestCase,), kwargs)
+        result = unittest.TestResult()
+        unittest.defaultTestLoader.loadTestsFromTestCase(test_case).run(result)
+        self.assertTrue(result.wasSuccessful(), msg=str(result.errors + result.failures))
+
+
+class TestMappingTable(_TemporaryTestCase):
+    """Test the columnar mapping table."""
+
+    def setUp(self) -> None:
+        """Set up the test case with the fixture mappings."""
+        super().setUp()
+        self.table = MappingTable.from_mappings(self.mappings)
+
+    def test_round_trip(self) -> None:
+        """Test materializing rows gives back the original mappings."""
+        self.assertEqual(len(self.mappings), len(self.table))
+        self.assertEqual(self.mappings, list(self.table))
+        self.assertEqual(self.mappings[-1], self.table[-1])
+        self.assertEqual(self.mappings[3:7], list(self.table[3:7]))
+
+    def test_sort(self) -> None:
+        """Test sorting is consistent with the mapping sort key."""
+        self.assertEqual(sorted(self.mappings, key=mapping_sort_key), list(self.table.sort()))
+        self.assertEqual(
+            sorted(self.mappings, key=mapping_sort_key, reverse=True),
+            list(self.table.sort(reverse=True)),
+        )
+        self.assertEqual(
+            sorted(self.mappings, key=lambda mapping: mapping.object.curie),
+            list(self.table.sort("object")),
+        )
+
+    def test_load(self) -> None:
+        """Test loading predictions as a table."""
+        path = self.directory.joinpath("predictions.sssom.tsv")
+        write_predictions(self.mappings, path=path)
+        predictions = load_predictions(path=path, cache=False)
+        for cache_table in [False, True, True]:
+            with self.subTest(cache=cache_table):
+                table = load_predictions(path=path, cache=cache_table, as_table=True)
+                self.assertIsInstance(table, MappingTable)
+                self.assertEqual(predictions, list(table))
+        self.assertEqual(
+            load_predictions(path=path, cache=False, prefixes={"doid"}),
+            list(load_predictions(path=path, cache=False, prefixes={"doid"}, as_table=True)),
+        )
+
+    def test_deduplicate(self) -> None:
+        """Test deduplication is consistent with linting."""
+        self.assertEqual(
+            [mapping.model_dump() for mapping in _remove_redundant(self.mappings)],
+            [mapping.model_dump() for mapping in self.table.deduplicate()],
+        )
+
+    def test_deduplicate_streaming(self) -> None:
+        """Test streaming deduplication of mappings sorted by canonical tuple."""
+        mappings = sorted(self.mappings, key=get_canonical_tuple)
+        expected = list(_remove_redundant(mappings))
+        self.assertEqual(expected, list(_remove_redundant(mappings, presorted=True)))
+        self.assertEqual(expected, list(_remove_redundant(iter(mappings), presorted=True)))
+        with self.assertRaises(ValueError):
+            list(_remove_redundant(mappings[::-1], presorted=True))
+
+    def test_filter_prefixes(self) -> None:
+        """Test filtering by prefix."""
+        self.assertEqual(
+            [
+                mapping
+                for mapping in self.mappings
+                if mapping.subject.prefix == "chebi" and mapping.object.prefix == "mesh"
+            ],
+            list(self.table.filter_prefixes(subject_prefix="chebi", object_prefix="mesh")),
+        )
+
+
+class TestMappingStore(_TemporaryTestCase):
+    """Test the indexed mapping store."""
+
+    def setUp(self) -> None:
+        """Set up the test case with the fixture mappings."""
+        super().setUp()
+        self.store = MappingStore(mappings={"positive": self.mappings})
+
+    def test_get(self) -> None:
+        """Test lookups give the same results as scanning."""
+        # the first one is a narrow match, which can't be flipped
+        mapping = self.mappings[1]
+        mapping_tool = next(m.mapping_tool for m in self.mappings if m.mapping_tool)
+        self.assertEqual(
+            [m for m in self.mappings if m.subject == mapping.subject],
+            self.store.get(subject=mapping.subject.curie),
+        )
+        self.assertEqual(
+            [m for m in self.mappings if m.object == mapping.object],
+            self.store.get(object=mapping.object.curie),
+        )
+        self.assertEqual(
+            [
+                m
+                for m in self.mappings
+                if m.subject.prefix == "chebi"
+                and m.object.prefix == "mesh"
+                and m.mapping_tool == mapping_tool
+            ],
+            self.store.get(subject_prefix="chebi", object_prefix="mesh", mapping_tool=mapping_tool),
+        )
+        self.assertEqual(
+            [m for m in self.mappings if "mesh" in {m.subject.prefix, m.object.prefix}],
+            self.store.by_prefix("mesh"),
+        )
+        self.assertTrue(self.store.contains(mapping.flip()))
+        self.assertFalse(self.store.contains(_mapping("chebi:1000", "mesh:C001000")))
+
+    def test_subset(self) -> None:
+        """Test prefix-pair subsets include flipped exact matches and follow file changes."""
+        path = self.directory.joinpath("positive.sssom.tsv")
+        store = MappingStore(paths={"positive": path})
+        write_true_mappings(
+            [_mapping("chebi:1", "mesh:C000001"), _mapping("mesh:C000002", "chebi:2")],
+            path=path,
+        )
+        self.assertEqual({"1": "C000001", "2": "C000002"}, dict(store.subset("chebi", "mesh")))
+        self.assertEqual({"C000001": "1", "C000002": "2"}, dict(store.subset("mesh", "chebi")))
+        self.assertEqual({}, dict(store.subset("chebi", "doid")))
+
+        # a mapping in the given direction takes priority over a flipped one
+        write_true_mappings(
+            [_mapping("chebi:1", "mesh:C000001"), _mapping("mesh:C000001", "chebi:10")],
+            path=path,
+        )
+        self.assertEqual({"1": "C000001", "10": "C000001"}, dict(store.subset("chebi", "mesh")))
+        self.assertEqual({"C000001": "10"}, dict(store.subset("mesh", "chebi")))
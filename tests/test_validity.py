@@ -1,18 +1,12 @@
 """Validation tests for :mod:`biomappings`."""
 
-from biomappings import (
-    load_false_mappings,
-    load_mappings,
-    load_predictions,
-    load_unsure,
-    testing,
-)
+from biomappings import load_all, testing
 
 
 class TestIntegrity(testing.IntegrityTestCase):
     """Data integrity tests."""
 
-    mappings = load_mappings()
-    predictions = load_predictions()
-    incorrect = load_false_mappings()
-    unsure = load_unsure()
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the resources once for all of the tests, rather than on import."""
+        cls.mappings, cls.incorrect, cls.unsure, cls.predictions = load_all()
@@ -1,13 +1,23 @@
 """Test the web app."""
 
+import atexit
+import json
+import os
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from unittest import mock
 
 from bioregistry import NormalizedNamableReference as Reference
 
 from biomappings import SemanticMapping
-from biomappings.resources import _write_helper, write_predictions
+from biomappings.resources import (
+    _iter_table,
+    _write_helper,
+    load_predictions,
+    write_predictions,
+)
 from biomappings.wsgi import Controller, State, get_app
 
 TEST_USER = Reference(prefix="orcid", identifier="0000-0000-0000-0000", name="Max Mustermann")
@@ -79,6 +89,7 @@ class TestFull(unittest.TestCase):
             negatives_path=negatives_path,
             unsure_path=unsure_path,
             user=TEST_USER,
+            flush_interval=None,
         )
         self.app = get_app(controller=self.controller)
         self.app.testing = True
@@ -99,6 +110,48 @@ class TestFull(unittest.TestCase):
         self.assertEqual(1, len(self.controller._predictions))
         self.assertEqual(0, len(self.controller._marked))
 
+        for line in [-1, 1]:
+            with self.subTest(line=line), self.assertRaises(IndexError):
+                self.controller.mark(line, "correct")
+        self.assertEqual(0, len(self.controller._marked))
+
+        # the position isn't valid anymore after persisting removes the prediction
+        self.controller.mark(0, "correct")
+        self.controller.persist()
+        with self.assertRaises(IndexError):
+            self.controller.mark(0, "correct")
+
+    def test_sync_journal(self) -> None:
+        """Test the journal is synced to disk without holding the lock other requests need."""
+        held = []
+        fsync = os.fsync
+
+        def _acquire() -> None:
+            acquired = self.controller._lock.acquire(blocking=False)
+            if acquired:
+                self.controller._lock.release()
+            held.append(not acquired)
+
+        def _fsync(fd: int) -> None:
+            # try to take the lock from another thread, like a concurrent request
+            thread = threading.Thread(target=_acquire)
+            thread.start()
+            thread.join()
+            fsync(fd)
+
+        with mock.patch.object(os, "fsync", _fsync):
+            self.controller.mark(0, "correct")
+            self.controller.add_mapping(
+                Reference.from_curie("chebi:131408", name="glyoxime"),
+                Reference.from_curie("mesh:C018305", name="glyoxal dioxime"),
+            )
+            # the second sync already covers the first
+            self.controller._sync_journal(1)
+        self.assertEqual([False, False], held)
+        self.assertEqual(2, len(self.controller.journal_path.read_text().splitlines()))
+        self.controller.flush()
+        self.assertFalse(self.controller.journal_path.exists())
+
     def test_mark_correct(self) -> None:
         """A self-contained scenario for marking an entry correct."""
         self.assertEqual(1, len(self.controller._predictions))
@@ -108,5 +161,277 @@ class TestFull(unittest.TestCase):
             res = client.get("/mark/0/yup", follow_redirects=True)
             self.assertEqual(200, res.status_code, msg=res.text)
 
+        # the mark is only journaled until it's flushed
+        self.assertEqual(1, len(self.controller._predictions))
+        self.assertEqual(0, self.controller.total_predictions)
+        self.assertTrue(self.controller.journal_path.is_file())
+        self.controller.persist()
+        self.assertFalse(self.controller.journal_path.is_file())
+
         # now, we have one less than before~
         self.assertEqual(0, len(self.controller._predictions))
+
+    def test_replay_journal(self) -> None:
+        """Test actions that weren't written before stopping are replayed on startup."""
+        subject = Reference.from_curie("chebi:10001", name="Visnadin")
+        obj = Reference.from_curie("mesh:C067604", name="visnadin")
+        self.controller.mark(0, "correct")
+        self.controller.add_mapping(subject, obj)
+        entries = [
+            json.loads(line) for line in self.controller.journal_path.read_text().splitlines()
+        ]
+        self.assertEqual(["mark", "add"], [entry["action"] for entry in entries])
+        self.assertEqual(self.controller._predictions[0].record_id, entries[0]["record_id"])
+        self.assertEqual(TEST_USER.curie, entries[0]["curator"])
+        # simulate a crash that interrupts writing the last entry, before the marks
+        # are flushed on exit
+        atexit.unregister(self.controller.flush)
+        with self.controller.journal_path.open("a") as file:
+            file.write('{"action": "ma')
+
+        # a new app over the same files picks up where the last one stopped
+        controller = Controller(
+            predictions_path=self.controller.predictions_path,
+            positives_path=self.controller.positives_path,
+            negatives_path=self.controller.negatives_path,
+            unsure_path=self.controller.unsure_path,
+            user=Reference(prefix="orcid", identifier="0000-0000-0000-0001", name="Erika"),
+            flush_interval=None,
+        )
+        self.assertEqual(1, len(controller._predictions))
+        get_app(controller=controller)
+
+        self.assertFalse(controller.journal_path.exists())
+        self.assertEqual([], load_predictions(path=controller.predictions_path, cache=False))
+        positives = list(_iter_table(controller.positives_path, standardize=False))
+        self.assertEqual(2, len(positives))
+        # the curator comes from the journal, not the current user
+        self.assertEqual({TEST_USER.curie}, {mapping.author.curie for mapping in positives})
+        self.assertIn(
+            (subject.curie, obj.curie), {(m.subject.curie, m.object.curie) for m in positives}
+        )
+
+        # replaying again doesn't do anything
+        self.assertEqual(0, controller.replay_journal())
+
+    def test_replay_journal_prefixes(self) -> None:
+        """Test marks on predictions that aren't loaded are kept in the journal."""
+        self.controller.mark(0, "correct")
+        atexit.unregister(self.controller.flush)
+        journal = self.controller.journal_path.read_text()
+
+        def _restart(prefixes: list[str]) -> Controller:
+            controller = Controller(
+                predictions_path=self.controller.predictions_path,
+                positives_path=self.controller.positives_path,
+                negatives_path=self.controller.negatives_path,
+                unsure_path=self.controller.unsure_path,
+                prefixes=prefixes,
+                user=TEST_USER,
+                flush_interval=None,
+            )
+            controller.replay_journal()
+            return controller
+
+        # the chebi-mesh prediction isn't loaded when only curating doid
+        controller = _restart(["doid"])
+        self.assertEqual(0, len(controller._predictions))
+        self.assertEqual(journal, controller.journal_path.read_text())
+        self.assertEqual([], list(_iter_table(controller.positives_path, standardize=False)))
+
+        # a later mark doesn't drop the one that wasn't loaded when it's flushed
+        controller.add_mapping(
+            Reference.from_curie("doid:0050577", name="cranioectodermal dysplasia"),
+            Reference.from_curie("mesh:C562966", name="Cranioectodermal Dysplasia"),
+        )
+        controller.flush()
+        self.assertEqual(journal, controller.journal_path.read_text())
+
+        # curating chebi replays the mark
+        controller = _restart(["chebi"])
+        self.assertFalse(controller.journal_path.exists())
+        self.assertEqual([], load_predictions(path=controller.predictions_path, cache=False))
+        self.assertEqual(2, len(list(_iter_table(controller.positives_path, standardize=False))))
+
+
+class TestSearch(unittest.TestCase):
+    """Test filtering predictions with the text index."""
+
+    def setUp(self) -> None:
+        """Set up the test case with a controller over a few predictions."""
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        directory = Path(self.temporary_directory.name)
+        predictions = [
+            SemanticMapping(
+                subject=Reference.from_curie(f"chebi:{i}", name=name),
+                predicate="skos:exactMatch",
+                object=Reference.from_curie(f"mesh:C{i:06}", name=name.upper()),
+                mapping_justification="semapv:LexicalMatching",
+                confidence=0.5 if i % 2 else 0.9,
+                mapping_tool=tool,
+            )
+            for i, (name, tool) in enumerate(
+                [
+                    ("glyoxime", "gilda"),
+                    ("glyoxal", "gilda"),
+                    ("Straße", "lexical"),
+                    ("oxime", "lexical"),
+                ],
+                start=1,
+            )
+        ]
+        predictions_path = directory.joinpath("predictions.tsv")
+        write_predictions(predictions, path=predictions_path)
+        self.paths = {
+            key: directory.joinpath(f"{key}.tsv")
+            for key in ["positives_path", "negatives_path", "unsure_path"]
+        }
+        for path in self.paths.values():
+            _write_helper([], path=path, mode="w", t="curated")
+        self.controller = Controller(
+            predictions_path=predictions_path, user=TEST_USER, flush_interval=None, **self.paths
+        )
+
+    def tearDown(self) -> None:
+        """Tear down the test case."""
+        self.temporary_directory.cleanup()
+
+    def assert_consistent(self) -> None:
+        """Check the text index gives the same results as scanning each prediction."""
+        for state in [
+            State(query="GLYOX"),
+            State(query="oxime"),
+            State(query="strasse"),
+            State(query="ox"),
+            State(query="oxime", provenance="lexical"),
+            State(source_query="chebi:2"),
+            State(target_query="c00000"),
+            State(prefix="mesh", target_prefix="me"),
+            State(provenance="nope"),
+        ]:
+            with self.subTest(state=state):
+                state.limit = None
+                expected = [
+                    (line, mapping)
+                    for line, mapping in enumerate(self.controller._predictions)
+                    if all(
+                        any(query.casefold() in (value or "").casefold() for value in values)
+                        for query, values in [
+                            (
+                                state.query,
+                                [
+                                    mapping.subject.curie,
+                                    mapping.subject.name,
+                                    mapping.object.curie,
+                                    mapping.object.name,
+                                    mapping.mapping_tool,
+                                ],
+                            ),
+                            (state.source_query, [mapping.subject.curie, mapping.subject.name]),
+                            (state.target_query, [mapping.object.curie, mapping.object.name]),
+                            (state.target_prefix, [mapping.object.curie]),
+                            (state.prefix, [mapping.subject.curie, mapping.object.curie]),
+                            (state.provenance, [mapping.mapping_tool]),
+                        ]
+                        if query is not None
+                    )
+                ]
+                self.assertEqual(expected, list(self.controller.predictions_from_state(state)))
+                self.assertEqual(len(expected), self.controller.count_predictions_from_state(state))
+
+    def test_search(self) -> None:
+        """Test searching, before and after predictions are removed by marking them."""
+        self.assert_consistent()
+        self.controller.mark(1, "correct")
+        self.controller.persist()
+        self.assertEqual(3, len(self.controller._get_text_index()))
+        self.assert_consistent()
+        # several at once, which aren't next to each other anymore
+        self.controller.mark(0, "correct")
+        self.controller.mark(2, "incorrect")
+        self.controller.persist()
+        self.assertEqual(1, len(self.controller._get_text_index()))
+        self.assert_consistent()
+
+    def test_views(self) -> None:
+        """Test paging through a cached view, which is invalidated by marking."""
+        state = State(query="oxime", sort="asc", limit=None)
+        everything = list(self.controller.predictions_from_state(state))
+        self.assertEqual(2, len(everything))
+        self.assertEqual(2, self.controller.count_predictions_from_state(state))
+        for offset in range(3):
+            with self.subTest(offset=offset):
+                state = State(query="oxime", sort="asc", offset=offset, limit=1)
+                self.assertEqual(
+                    everything[offset : offset + 1],
+                    list(self.controller.predictions_from_state(state)),
+                )
+        # the sorted view and the unsorted view that it's based on
+        self.assertEqual(2, len(self.controller._views))
+
+        self.controller.mark(everything[0][0], "incorrect")
+        self.assertEqual(0, len(self.controller._views))
+        state = State(query="oxime", sort="asc", limit=None)
+        self.assertEqual(everything[1:], list(self.controller.predictions_from_state(state)))
+        self.assertEqual(1, self.controller.count_predictions_from_state(state))
+
+    def test_sort(self) -> None:
+        """Test sorting with permutations, which are kept up to date when persisting."""
+        keys = {
+            "desc": (lambda mapping: mapping.confidence or 0.0, True),
+            "asc": (lambda mapping: mapping.confidence or 0.0, False),
+            "subject": (lambda mapping: mapping.subject.curie, False),
+            "object": (lambda mapping: mapping.object.curie, False),
+        }
+        for _ in range(2):
+            for sort, (key, reverse) in keys.items():
+                for query in [None, "oxime"]:
+                    with self.subTest(sort=sort, query=query):
+                        state = State(sort=sort, query=query, limit=None)
+                        expected = sorted(
+                            self.controller.predictions(query=query),
+                            key=lambda pair, key=key: key(pair[1]),
+                            reverse=reverse,
+                        )
+                        self.assertEqual(
+                            expected, list(self.controller.predictions_from_state(state))
+                        )
+            self.controller.mark(0, "correct")
+            self.controller.persist()
+        with self.assertRaises(ValueError):
+            list(self.controller.predictions(sort="nope"))
+
+    def test_flush(self) -> None:
+        """Test marks are written in the background without changing positions."""
+        predictions_path = self.controller.predictions_path
+        self.controller.flush_interval = 60
+        self.controller.mark(1, "correct")
+        self.controller.mark(2, "incorrect")
+        self.assertEqual(2, len(self.controller.journal_path.read_text().splitlines()))
+        timer = self.controller._timer
+        self.assertIsNotNone(timer)
+        self.assertTrue(timer.is_alive())
+
+        # do what the timer would, which cancels it
+        self.controller.flush()
+        self.assertIsNone(self.controller._timer)
+
+        self.assertFalse(self.controller.journal_path.exists())
+        self.assertEqual(4, len(self.controller._predictions))
+        self.assertEqual(
+            [self.controller._predictions[line] for line in [0, 3]],
+            load_predictions(path=predictions_path, cache=False),
+        )
+
+        # marking again from a stale page does nothing
+        app = get_app(controller=self.controller)
+        atexit.unregister(self.controller.flush)
+        with app.test_client() as client:
+            res = client.get("/mark/1/no", follow_redirects=True)
+            self.assertEqual(200, res.status_code, msg=res.text)
+        self.assertEqual("correct", self.controller._marked[1])
+        self.assertFalse(self.controller.journal_path.exists())
+
+        self.controller.persist()
+        self.assertEqual(2, len(self.controller._predictions))
+        self.assertEqual(self.controller._predictions, load_predictions(path=predictions_path))